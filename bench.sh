@@ -0,0 +1,4 @@
+#!/usr/bin/env sh
+set -e
+
+docker-compose run bench bench "$@"
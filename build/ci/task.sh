@@ -14,6 +14,9 @@ lint)
   echo "Running Flake8…"
   flake8 && echo "All good!"
   ;;
+bench)
+  python -m benchmarks.run "${@:2}"
+  ;;
 *)
   echo "ERROR: invalid container runtime task: '${task}'"
   exit 1
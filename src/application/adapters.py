@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence
+
+import websockets
+
+from application.model import TradingPair
+from application.numeric import DECIMAL, NumericBackend
+
+
+class FeedAdapter(ABC):
+    """
+    Protocol of the WebSocket feed of one venue: where to connect, how to subscribe to trading pairs, and how to decode
+    the frames it sends, so that trades can be ingested from any venue by the same event loop and windows.
+
+    Adapters are sent to worker processes, and must then be picklable.
+    """
+
+    @property
+    @abstractmethod
+    def venue(self) -> str:
+        """
+        Short name of the venue, such as `coinbase`, which labels its VWAPs when trades come from several venues.
+        """
+
+    @property
+    @abstractmethod
+    def uri(self) -> str:
+        pass
+
+    def connect(self):
+        """
+        Opens a connection to the feed, as an async context manager of an object that answers `recv` and `send` like
+        a WebSocket connection.
+        """
+        return websockets.connect(self.uri)
+
+    @abstractmethod
+    async def subscribe(self, connection, trading_pairs: Sequence[TradingPair]):
+        pass
+
+    @abstractmethod
+    def decode(self, raw_message: str, backend: NumericBackend = DECIMAL, strict=False) -> Optional[object]:
+        """
+        Decodes a raw frame into a `TradingPoint` for a trade, or into any other message, which is skipped unless it
+        is a `failure`. Frames that do not matter can be decoded into `None`.
+        """
+
+    def failure(self, message: object) -> Optional[str]:
+        """
+        Description of the error sent by the venue when the decoded message is one, after which the connection is
+        opened again, or `None` for any other message.
+        """
+        return None
+
+    def product_id(self, raw_message: str) -> Optional[str]:
+        """
+        Product of a raw frame, found without decoding it, or `None` when the frame has none or the venue cannot tell.
+        """
+        return None
+
+    def sequence(self, raw_message: str) -> Optional[int]:
+        """
+        Sequence of a raw frame within its product, found without decoding it, or `None` when the frame has none or the
+        venue cannot tell.
+        """
+        return None
+
+    def __str__(self) -> str:
+        return f'{type(self).__name__}[{self.venue}]'
@@ -0,0 +1,410 @@
+import re
+from copy import copy
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from application.model import TradingPair, TradingPoint
+from application.numeric import DECIMAL, Number, NumericBackend
+from application.store import from_epoch_nanoseconds, to_epoch_nanoseconds
+
+# Resolution and number of bars kept of each series: an hour of 1s bars, a day and an hour of 1m bars, so that the
+# last 24 hours start on a minute, and a week of 1h bars
+DEFAULT_RESOLUTIONS: Sequence[Tuple[timedelta, int]] = (
+    (timedelta(seconds=1), 3600),
+    (timedelta(minutes=1), 1500),
+    (timedelta(hours=1), 168),
+)
+
+_DURATION = re.compile(r'(\d+)([smhd])')
+
+_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+# Bar, open, high, low, close, volume, price·volume, number of trades, and sequences of the open and close trades of a
+# bar, with prices and sizes scaled to integers
+BarRow = Tuple[int, int, int, int, int, int, int, int, int, int]
+
+
+class Bar(NamedTuple):
+    """
+    Open, high, low and close prices, volume and price·volume of the trades of a pair within one bar, from `start`.
+    """
+
+    start: datetime
+    open: Number
+    high: Number
+    low: Number
+    close: Number
+    volume: Number
+    price_volume: Number
+    trades: int
+
+
+class BarSeries:
+    """
+    Bars of a single resolution, kept in a ring of `capacity` slots: the bar starting at `n * resolution` since the
+    epoch lives in slot `n % capacity`, and is reset when a trade of a newer bar lands in its slot. Each column is a
+    preallocated list of integers, with prices and sizes scaled to the tick sizes of the trading pair.
+
+    Bars within the last `capacity` bars of the newest trade are retained, so a late trade still updates its own bar,
+    and its open and close, which are the prices of the trades with the smallest and largest sequences. Older trades
+    are discarded and counted.
+    """
+
+    def __init__(self, resolution: timedelta, capacity: int):
+        if resolution < timedelta(microseconds=1):
+            raise ValueError(f'Resolution must be at least a microsecond: {resolution}')
+        if capacity < 1:
+            raise ValueError(f'Capacity must be at least 1: {capacity}')
+
+        self._resolution = resolution
+        self._nanoseconds = resolution // timedelta(microseconds=1) * 1000
+        self._capacity = capacity
+        self._bars: List[Optional[int]] = [None] * capacity
+        self._opens = [0] * capacity
+        self._highs = [0] * capacity
+        self._lows = [0] * capacity
+        self._closes = [0] * capacity
+        self._volumes = [0] * capacity
+        self._price_volumes = [0] * capacity
+        self._trades = [0] * capacity
+        self._open_sequences = [0] * capacity
+        self._close_sequences = [0] * capacity
+        self._newest: Optional[int] = None
+        self._discarded = 0
+
+    @property
+    def resolution(self) -> timedelta:
+        return self._resolution
+
+    @property
+    def nanoseconds(self) -> int:
+        return self._nanoseconds
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def discarded(self) -> int:
+        """
+        How many trades were discarded because their bar was older than every retained bar.
+        """
+        return self._discarded
+
+    def add(self, sequence: int, price: int, size: int, time: int):
+        """
+        Adds a trade, with its price and size scaled to integers and its time in nanoseconds since the epoch.
+        """
+        bar = time // self._nanoseconds
+        if self._newest is None or bar > self._newest:
+            self._newest = bar
+        elif bar <= self._newest - self._capacity:
+            self._discarded += 1
+            return
+
+        slot = bar % self._capacity
+        if self._bars[slot] != bar:
+            self._bars[slot] = bar
+            self._opens[slot] = self._highs[slot] = self._lows[slot] = self._closes[slot] = price
+            self._open_sequences[slot] = self._close_sequences[slot] = sequence
+            self._volumes[slot] = size
+            self._price_volumes[slot] = price * size
+            self._trades[slot] = 1
+            return
+
+        if sequence < self._open_sequences[slot]:
+            self._opens[slot] = price
+            self._open_sequences[slot] = sequence
+        if sequence > self._close_sequences[slot]:
+            self._closes[slot] = price
+            self._close_sequences[slot] = sequence
+        if price > self._highs[slot]:
+            self._highs[slot] = price
+        if price < self._lows[slot]:
+            self._lows[slot] = price
+        self._volumes[slot] += size
+        self._price_volumes[slot] += price * size
+        self._trades[slot] += 1
+
+    def rows(self) -> Iterator[BarRow]:
+        """
+        Retained bars with trades, in no particular order.
+        """
+        for slot, bar in enumerate(self._bars):
+            if bar is not None and self.holds(bar):
+                yield (
+                    bar, self._opens[slot], self._highs[slot], self._lows[slot], self._closes[slot],
+                    self._volumes[slot], self._price_volumes[slot], self._trades[slot], self._open_sequences[slot],
+                    self._close_sequences[slot]
+                )
+
+    def load(self, row: BarRow):
+        """
+        Puts back a bar returned by `rows`, in place of the one in its slot.
+        """
+        bar = row[0]
+        slot = bar % self._capacity
+        (
+            self._bars[slot], self._opens[slot], self._highs[slot], self._lows[slot], self._closes[slot],
+            self._volumes[slot], self._price_volumes[slot], self._trades[slot], self._open_sequences[slot],
+            self._close_sequences[slot]
+        ) = row
+        if self._newest is None or bar > self._newest:
+            self._newest = bar
+
+    def copy(self) -> 'BarSeries':
+        series = copy(self)
+        for name in (
+                '_bars', '_opens', '_highs', '_lows', '_closes', '_volumes', '_price_volumes', '_trades',
+                '_open_sequences', '_close_sequences'
+        ):
+            setattr(series, name, list(getattr(self, name)))
+        return series
+
+    def holds(self, bar: int) -> bool:
+        """
+        Whether the bar is recent enough to be retained, even if it has no trades.
+        """
+        return self._newest is not None and bar > self._newest - self._capacity
+
+    def sums(self, bar: int) -> Tuple[int, int]:
+        """
+        Volume and price·volume of a retained bar, scaled to integers.
+        """
+        slot = bar % self._capacity
+        if self._bars[slot] != bar:
+            return 0, 0
+        return self._volumes[slot], self._price_volumes[slot]
+
+    def get(self, bar: int) -> Optional[Tuple[int, int, int, int, int, int, int]]:
+        """
+        Open, high, low, close, volume, price·volume and number of trades of a bar, or `None` when it has no trades.
+        """
+        slot = bar % self._capacity
+        if self._bars[slot] != bar:
+            return None
+        return (
+            self._opens[slot], self._highs[slot], self._lows[slot], self._closes[slot], self._volumes[slot],
+            self._price_volumes[slot], self._trades[slot]
+        )
+
+
+class BarRollup:
+    """
+    Rolls up the trades of a trading pair into OHLCV bars of several resolutions, such as 1s, 1m and 1h, so that the
+    VWAP of any horizon, such as the session, the last 24 hours or an arbitrary interval, combines a few bars instead
+    of millions of trades, within a fixed amount of memory.
+
+    Every resolution must be a multiple of the previous one. An interval is walked from its start, taking at each step
+    the coarsest bar that starts there, fits within the interval and is still retained, so that the last 24 hours take
+    at most 59 minutes, 23 hours and 59 more minutes at the edges. Its bounds are rounded outwards to the finest bars
+    retained at each end.
+    """
+
+    def __init__(
+            self,
+            trading_pair: TradingPair,
+            resolutions: Sequence[Tuple[timedelta, int]] = DEFAULT_RESOLUTIONS,
+            backend: NumericBackend = DECIMAL
+    ):
+        if not resolutions:
+            raise ValueError('At least one resolution is required')
+        for (finer, _), (coarser, _) in zip(resolutions, resolutions[1:]):
+            if coarser <= finer or coarser % finer:
+                raise ValueError(f'Resolutions must be increasing multiples of each other: {finer}, {coarser}')
+
+        self._trading_pair = trading_pair
+        self._backend = backend
+        self._series = tuple(BarSeries(resolution, capacity) for resolution, capacity in resolutions)
+        self._newest_time: Optional[datetime] = None
+
+    @property
+    def trading_pair(self) -> TradingPair:
+        return self._trading_pair
+
+    @property
+    def horizon(self) -> timedelta:
+        """
+        How far back from the newest trade bars are retained, by the resolution that retains them the longest.
+        """
+        return max(i.resolution * i.capacity for i in self._series)
+
+    @property
+    def newest_time(self) -> Optional[datetime]:
+        return self._newest_time
+
+    @property
+    def oldest_time(self) -> Optional[datetime]:
+        """
+        Start of the oldest bar retained by the resolution that retains bars the longest, from which an interval can
+        start at the earliest.
+        """
+        if self._newest_time is None:
+            return None
+        series = max(self._series, key=lambda i: i.resolution * i.capacity)
+        newest = to_epoch_nanoseconds(self._newest_time) // series.nanoseconds
+        return from_epoch_nanoseconds((newest - series.capacity + 1) * series.nanoseconds)
+
+    @property
+    def discarded(self) -> int:
+        """
+        How many trades were discarded because they were older than every bar retained by the resolution with the
+        longest horizon.
+        """
+        return max(self._series, key=lambda i: i.resolution * i.capacity).discarded
+
+    def supports(self, point: TradingPoint) -> bool:
+        return self._trading_pair == point.pair
+
+    def add(self, point: TradingPoint):
+        self.add_many((point,))
+
+    def add_many(self, points: Iterable[TradingPoint]):
+        price_decimals = self._trading_pair.price_decimals
+        size_decimals = self._trading_pair.size_decimals
+        for point in points:
+            if point.pair != self._trading_pair:
+                raise ValueError(f'Unsupported trading pair: {point.pair}')
+
+            price = self._backend.to_fixed_point(point.price, price_decimals)
+            size = self._backend.to_fixed_point(point.quantity, size_decimals)
+            time = to_epoch_nanoseconds(point.time)
+            for series in self._series:
+                series.add(point.sequence, price, size, time)
+            if self._newest_time is None or point.time > self._newest_time:
+                self._newest_time = point.time
+
+    def rows(self) -> Iterator[Tuple[int, BarRow]]:
+        """
+        Retained bars with trades of every resolution, along with the resolution in nanoseconds, so that they can be
+        kept on disk and loaded back into an empty rollup.
+        """
+        for series in self._series:
+            for row in series.rows():
+                yield series.nanoseconds, row
+
+    def load(self, newest_time: datetime, rows: Iterable[Tuple[int, BarRow]]):
+        """
+        Puts back the bars returned by `rows`, skipping those of resolutions the rollup does not have, and the time of
+        the newest trade then.
+        """
+        series_by_nanoseconds = {i.nanoseconds: i for i in self._series}
+        for nanoseconds, row in rows:
+            series = series_by_nanoseconds.get(nanoseconds)
+            if series is not None:
+                series.load(row)
+        if self._newest_time is None or newest_time > self._newest_time:
+            self._newest_time = newest_time
+
+    def copy(self) -> 'BarRollup':
+        """
+        Copy of the rollup and its bars, which can be read or updated from another thread.
+        """
+        rollup = copy(self)
+        rollup._series = tuple(i.copy() for i in self._series)
+        return rollup
+
+    def bars(self, resolution: timedelta, start: datetime, end: Optional[datetime] = None) -> List[Bar]:
+        """
+        Retained bars of a resolution with trades, from the one that contains `start` to the last one that starts
+        before `end`, or to the newest one.
+        """
+        series = next((i for i in self._series if i.resolution == resolution), None)
+        if series is None:
+            raise ValueError(f'Unknown resolution: {resolution}')
+        if self._newest_time is None:
+            return []
+
+        first = to_epoch_nanoseconds(start) // series.nanoseconds
+        last = -(-self._end(end) // series.nanoseconds)
+        price_decimals = self._trading_pair.price_decimals
+        size_decimals = self._trading_pair.size_decimals
+        from_fixed_point = self._backend.from_fixed_point
+
+        bars = []
+        for bar in range(max(first, last - series.capacity), last):
+            values = series.get(bar) if series.holds(bar) else None
+            if values is None:
+                continue
+            open_, high, low, close, volume, price_volume, trades = values
+            bars.append(Bar(
+                start=from_epoch_nanoseconds(bar * series.nanoseconds),
+                open=from_fixed_point(open_, price_decimals),
+                high=from_fixed_point(high, price_decimals),
+                low=from_fixed_point(low, price_decimals),
+                close=from_fixed_point(close, price_decimals),
+                volume=from_fixed_point(volume, size_decimals),
+                price_volume=from_fixed_point(price_volume, price_decimals + size_decimals),
+                trades=trades,
+            ))
+        return bars
+
+    def vwap(self, start: datetime, end: Optional[datetime] = None) -> Number:
+        """
+        VWAP of the trades from `start` to `end`, or to the newest trade, with both bounds rounded outwards to the
+        finest bars retained there.
+        """
+        if self._newest_time is None:
+            return self._backend.zero
+
+        start_time = self._round(to_epoch_nanoseconds(start), up=False)
+        if start_time is None:
+            raise ValueError(f'Interval starts before the oldest bar retained: {start}')
+        end_time = self._round(self._end(end), up=True)
+
+        volume_sum = price_volume_sum = 0
+        time = start_time
+        while time < end_time:
+            series = self._next_series(time, end_time)
+            volume, price_volume = series.sums(time // series.nanoseconds)
+            volume_sum += volume
+            price_volume_sum += price_volume
+            time += series.nanoseconds
+
+        price_decimals = self._trading_pair.price_decimals
+        size_decimals = self._trading_pair.size_decimals
+        return self._backend.vwap(
+            self._backend.from_fixed_point(price_volume_sum, price_decimals + size_decimals),
+            self._backend.from_fixed_point(volume_sum, size_decimals),
+            price_decimals
+        )
+
+    def _end(self, end: Optional[datetime]) -> int:
+        if end is not None:
+            return to_epoch_nanoseconds(end)
+        finest = self._series[0].nanoseconds
+        return (to_epoch_nanoseconds(self._newest_time) // finest + 1) * finest
+
+    def _round(self, time: int, up: bool) -> Optional[int]:
+        """
+        Rounds a time to the bounds of the finest bar retained there, or returns `None` when no bar is.
+        """
+        for series in self._series:
+            bar = (time - 1 if up else time) // series.nanoseconds
+            if series.holds(bar):
+                return (bar + 1 if up else bar) * series.nanoseconds
+        return None
+
+    def _next_series(self, time: int, end_time: int) -> BarSeries:
+        """
+        Series of the coarsest retained bar that starts at `time` and fits before `end_time`, or of the finest bar
+        retained there when none fits, which may then go past the end.
+        """
+        for series in reversed(self._series):
+            fits = not time % series.nanoseconds and time + series.nanoseconds <= end_time
+            if fits and series.holds(time // series.nanoseconds):
+                return series
+        return next(i for i in self._series if i.holds(time // i.nanoseconds))
+
+    def __str__(self) -> str:
+        return f'BarRollup[{self._trading_pair}]'
+
+
+def parse_duration(text: str) -> timedelta:
+    """
+    Parses a duration such as `90s`, `30m`, `24h` or `7d`.
+    """
+    match = _DURATION.fullmatch(text.strip())
+    if not match:
+        raise ValueError(f'Invalid duration: {text}')
+    return timedelta(**{_UNITS[match.group(2)]: int(match.group(1))})
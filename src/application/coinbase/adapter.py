@@ -0,0 +1,58 @@
+import json
+from logging import getLogger
+from typing import Collection, Optional, Sequence
+
+from application.adapters import FeedAdapter
+from application.coinbase.decoder import decode_message, peek_product_id, peek_sequence
+from application.coinbase.model import Channel, Error, Message, Subscribe
+from application.coinbase.schema import serialize_message
+from application.model import TradingPair
+from application.numeric import DECIMAL, NumericBackend
+
+logger = getLogger(__name__)
+
+WEBSOCKET_URI = 'wss://ws-feed.pro.coinbase.com'
+
+CHANNELS = (Channel.MATCHES,)
+
+
+class CoinbaseAdapter(FeedAdapter):
+    """
+    Coinbase WebSocket feed, or any server that speaks its protocol at `uri`: a `subscribe` message with the product
+    ids and channels, answered with `match` frames, and `error` frames for subscriptions it rejects.
+    """
+
+    def __init__(self, uri=WEBSOCKET_URI, venue='coinbase', channels: Collection[Channel] = CHANNELS):
+        self._uri = uri
+        self._venue = venue
+        self._channels = tuple(channels)
+
+    @property
+    def venue(self) -> str:
+        return self._venue
+
+    @property
+    def uri(self) -> str:
+        return self._uri
+
+    async def subscribe(self, connection, trading_pairs: Sequence[TradingPair]):
+        logger.info(f'Subscribing to channels {self._channels} and trading pairs {trading_pairs} on {self._uri}…')
+        await connection.send(json.dumps(
+            serialize_message(
+                Subscribe(product_ids=trading_pairs, channels=self._channels)
+            )
+        ))
+
+    def decode(self, raw_message: str, backend: NumericBackend = DECIMAL, strict=False) -> Optional[Message]:
+        return decode_message(raw_message, backend, strict=strict)
+
+    def failure(self, message: object) -> Optional[str]:
+        if isinstance(message, Error):
+            return f'Coinbase sent an error: {message.message} ({message.reason})'
+        return None
+
+    def product_id(self, raw_message: str) -> Optional[str]:
+        return peek_product_id(raw_message)
+
+    def sequence(self, raw_message: str) -> Optional[int]:
+        return peek_sequence(raw_message)
@@ -0,0 +1,172 @@
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from application.coinbase.model import Match, Message
+from application.coinbase.schema import UNKNOWN_PRODUCT, deserialize_message
+from application.errors import SchemaValidationError
+from application.model import TradingPair
+from application.numeric import DECIMAL, NumericBackend, Number
+
+# Top-level fields of a match frame that the VWAP needs. Values are either plain strings (without escapes) or JSON
+# literals, such as numbers and null. Anything else is left to the strict decoder.
+_FIELD = re.compile(r'"(type|product_id|sequence|price|size|time)"\s*:\s*(?:"([^"\\]*)"|(null|[-+.\w]+))')
+
+_PRODUCT_ID = re.compile(r'"product_id"\s*:\s*"([^"\\]*)"')
+
+_SEQUENCE = re.compile(r'"sequence"\s*:\s*(\d+)')
+
+_NUMBER = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$')
+
+_INTEGER = re.compile(r'-?\d+$')
+
+_TIME = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d)(?::(\d\d)(?:\.\d+)?)?(?:Z|[-+](\d\d):?(\d\d))?$'
+)
+
+_MATCH_TYPES = ('match', 'last_match')
+
+_MISSING = 'Missing data for required field.'
+
+_NULL = 'Field may not be null.'
+
+_Values = Dict[str, Tuple[str, str]]
+
+
+def decode_message(raw_message: str, backend: NumericBackend = DECIMAL, strict=False) -> Optional[Message]:
+    """
+    Decodes a raw frame from the Coinbase WebSocket feed.
+
+    Match frames are decoded by scanning the raw text for the handful of fields the VWAP needs, without building a
+    dict or a marshmallow schema, and their time is only parsed when it is read, once its fields are known to make a
+    valid date. They are rejected with the same `SchemaValidationError` failures as `deserialize_message`. Every
+    other frame, and every frame when `strict` is set, goes through `json.loads` and `deserialize_message`.
+    """
+    if not strict:
+        values = {key: (text, literal) for key, text, literal in _FIELD.findall(raw_message)}
+        if values.get('type', ('', ''))[0] in _MATCH_TYPES:
+            return _decode_match(values, backend)
+
+    return deserialize_message(json.loads(raw_message), backend)
+
+
+def peek_product_id(raw_message: str) -> Optional[str]:
+    """
+    Product of a raw frame, found without decoding it, or `None` for frames without any.
+    """
+    match = _PRODUCT_ID.search(raw_message)
+    return match.group(1) if match else None
+
+
+def peek_sequence(raw_message: str) -> Optional[int]:
+    """
+    Sequence of a raw frame, found without decoding it, or `None` for frames without any.
+    """
+    match = _SEQUENCE.search(raw_message)
+    return int(match.group(1)) if match else None
+
+
+def _decode_match(values: _Values, backend: NumericBackend) -> Match:
+    failures: Dict[str, List[str]] = {}
+
+    product_id = _product_id(values, failures)
+    size = _number(values, 'size', product_id.size_decimals if product_id else None, backend, failures)
+    price = _number(values, 'price', product_id.price_decimals if product_id else None, backend, failures)
+    sequence = _integer(values, 'sequence', failures)
+    time = _time(values, failures)
+
+    if failures:
+        raise SchemaValidationError('Invalid message payload', failures=failures)
+
+    return Match(size=size, price=price, product_id=product_id, sequence=sequence, time=time)
+
+
+def _value(values: _Values, field: str, failures: Dict[str, List[str]]) -> Optional[str]:
+    if field not in values:
+        failures[field] = [_MISSING]
+        return None
+
+    text, literal = values[field]
+    if literal == 'null':
+        failures[field] = [_NULL]
+        return None
+
+    return literal or text
+
+
+def _product_id(values: _Values, failures: Dict[str, List[str]]) -> Optional[TradingPair]:
+    value = _value(values, 'product_id', failures)
+    if value is None:
+        return None
+
+    product_id = TradingPair.get(value)
+    if product_id is None:
+        failures['product_id'] = [UNKNOWN_PRODUCT]
+    return product_id
+
+
+def _number(
+        values: _Values,
+        field: str,
+        decimals: Optional[int],
+        backend: NumericBackend,
+        failures: Dict[str, List[str]]
+) -> Optional[Number]:
+    value = _value(values, field, failures)
+    if value is None:
+        return None
+
+    if not _NUMBER.match(value):
+        failures[field] = ['Not a valid number.']
+        return None
+
+    # Without a valid product, the number of decimal places is unknown
+    if decimals is None:
+        return None
+
+    try:
+        return backend.parse(value, decimals)
+    except ValueError as e:
+        failures[field] = [str(e)]
+        return None
+
+
+def _integer(values: _Values, field: str, failures: Dict[str, List[str]]) -> Optional[int]:
+    value = _value(values, field, failures)
+    if value is None:
+        return None
+
+    if not _INTEGER.match(value):
+        failures[field] = ['Not a valid integer.']
+        return None
+
+    return int(value)
+
+
+def _time(values: _Values, failures: Dict[str, List[str]]) -> Optional[str]:
+    value = _value(values, 'time', failures)
+    if value is None:
+        return None
+
+    match = _TIME.match(value)
+    if not match or not _valid_time(match):
+        failures['time'] = ['Not a valid datetime.']
+        return None
+
+    return value
+
+
+def _valid_time(match: re.Match) -> bool:
+    """
+    Whether the fields of a time make a valid date, so that parsing it later cannot fail, such as on the 45th of the
+    13th month.
+    """
+    year, month, day, hour, minute, second, offset_hours, offset_minutes = match.groups('0')
+    if int(offset_hours) > 23 or int(offset_minutes) > 59:
+        return False
+    try:
+        datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    except ValueError:
+        return False
+    return True
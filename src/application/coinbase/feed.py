@@ -1,23 +1,48 @@
+import argparse
 import asyncio
-import json
 import logging
+import os
 import sys
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
 from logging import getLogger
 
-import websockets
+from websockets.exceptions import ConnectionClosed, ConnectionClosedOK
 
-from application.coinbase.model import Subscribe, Channel
-from application.coinbase.schema import deserialize_message, serialize_message
+from application.adapters import FeedAdapter
+from application.bars import DEFAULT_RESOLUTIONS, BarRollup, parse_duration
+from application.coinbase import telemetry
+from application.coinbase.adapter import CoinbaseAdapter
+from application.coinbase.model import Message
+from application.coinbase.parallel import ParallelDecoder
+from application.coinbase.hedging import HedgedFeed
+from application.coinbase.products import load_products, parse_products
+from application.coinbase.recording import Recorder
+from application.connections import keep_connected
+from application.errors import FeedError, SchemaValidationError
+from application.gaps import SequenceGaps
+from application.metrics import serve_metrics
 from application.model import TradingPair, TradingPoint
-from application.vwap import VWAP
+from application.numeric import FIXED_POINT, NumericBackend
+from application.output import Emit, OutputFormat, OutputSink, Update, broadcast
+from application.pipeline import FrameQueue, OverflowPolicy
+from application.publisher import Publisher
+from application.redis_store import RedisPointStore, add_batches, read_vwaps
+from application.reorder import ReorderBuffer
+from application.snapshot import SequenceFilter, Snapshots
+from application.store import PointStore
+from application.vectorized import ArrayPointStore, np
+from application.vwap import TimeWindowVWAP
 
 logger = getLogger()
 logger.setLevel(logging.INFO)
 logger.addHandler(logging.StreamHandler(sys.stdout))
 
-WEBSOCKET_URI = 'wss://ws-feed.pro.coinbase.com'
-
-CHANNELS = (Channel.MATCHES,)
+# Venue whose feed is listened to, which tells where to connect, how to subscribe and how to decode frames
+adapter: FeedAdapter = CoinbaseAdapter()
 
 TRADING_PAIRS = (
     TradingPair.BTC_USD,
@@ -25,38 +50,738 @@ TRADING_PAIRS = (
     TradingPair.ETH_BTC
 )
 
-VWAPS = tuple(VWAP(i) for i in TRADING_PAIRS)
+NUMERIC_BACKEND = FIXED_POINT
+
+STRICT_DECODING = False
+
+# How long to wait before reconnecting after the connection drops, in seconds, doubled after every connection that
+# dropped sooner than the maximum delay, with jitter
+RECONNECT_DELAY = 0.1
+
+MAX_RECONNECT_DELAY = 10.0
+
+# Connections subscribed to the same products at once, whose frames are merged, so that a frame delayed or dropped on
+# one of them can still arrive on time on another
+CONNECTIONS = 1
+
+# Frames remembered to drop their later copies when there are several connections
+DEDUPE_CAPACITY = 10000
+
+# Connections of the feed, when there are several
+hedge: Optional[HedgedFeed] = None
+
+# Every frame already received is processed in one batch, up to this many frames
+MAX_BATCH_SIZE = 1000
+
+# How long to wait for more frames before processing a batch, in seconds
+MAX_BATCH_LATENCY = 0.001
+
+# Frames read but not processed yet, up to this many, after which the overflow policy applies
+QUEUE_CAPACITY = 10000
+
+OVERFLOW_POLICY = OverflowPolicy.BLOCK
+
+# When set, batches are processed on this executor instead of on the event loop. A process pool must have a single
+# worker, which then holds the windows.
+executor: Optional[Executor] = None
+
+# When set, batches of frames are decoded by a pool of worker processes before they are processed
+decoder: Optional[ParallelDecoder] = None
+
+# Queue of the current connection
+frame_queue: Optional[FrameQueue] = None
+
+# How often the feed catches up with the wall clock, in seconds, so that a pair that went quiet still gets the trades
+# its reorder buffer held released, and its time windows rid of the trades older than them
+TIMER_INTERVAL = 1.0
+
+# How often the windows are written into a snapshot, in seconds, when a state directory is given
+SNAPSHOT_INTERVAL = 60.0
+
+# When set, every batch of points is journaled, and the windows are periodically written into a snapshot
+snapshots: Optional[Snapshots] = None
+
+# When set, drops the points that were restored from a snapshot
+sequence_filter: Optional[SequenceFilter] = None
+
+# Sequences received of every trading pair, so that the trades sent again after a reconnection are dropped, and the
+# sequences missed while disconnected are counted
+sequence_gaps = SequenceGaps()
+
+# How many times the feed reconnected, after the connection dropped or could not be opened
+reconnects = 0
+
+# When the last connection dropped, until the VWAPs are updated again
+disconnected_at: Optional[float] = None
+
+# How long the VWAPs took to be updated again after the last connection dropped, in seconds
+recovery_seconds: Optional[float] = None
+
+# Frames skipped because they failed to decode, such as a price finer than the tick size of its product
+invalid_frames = 0
+
+# When set, the trades of every pair are held until a trade this much newer arrives, or for this long at most, and
+# passed on to the windows in sequence order, so that they only ever append; trades that arrive later are discarded
+REORDER_DELAY: Optional[timedelta] = None
+
+# Trades held per pair at most, beyond which the oldest ones are passed on before the delay is over
+REORDER_CAPACITY = 10000
+
+# Reorder buffer of every trading pair, when there is a reorder delay
+reorder_buffers: Dict[TradingPair, ReorderBuffer] = {}
+
+# Horizons whose VWAPs are published from 1s, 1m and 1h bars of every pair, such as the last 24 hours, when set
+ROLLUP_WINDOWS: Sequence[timedelta] = ()
+
+# Bars of every trading pair, when there are rollup windows
+rollups: Dict[TradingPair, BarRollup] = {}
+
+# When set, every raw frame received is recorded, so that it can be replayed later
+recorder: Optional[Recorder] = None
+
+WINDOW_SIZES = (50, 200, 1000, 10000)
+
+# Store of the points of each trading pair, in memory, either `PointStore` or the NumPy `ArrayPointStore`
+STORE_CLASS: Callable[..., PointStore] = PointStore
+
+STORES = tuple(STORE_CLASS(i, capacity=max(WINDOW_SIZES), backend=NUMERIC_BACKEND) for i in TRADING_PAIRS)
+
+TIME_WINDOWS = (timedelta(minutes=1), timedelta(minutes=5), timedelta(hours=1))
+
+TIME_WINDOW_VWAPS = tuple(
+    TimeWindowVWAP(i, duration, backend=NUMERIC_BACKEND) for i in TRADING_PAIRS for duration in TIME_WINDOWS
+)
+
+# Windows of every trading pair, so that a batch finds its windows with a single lookup however many pairs there are
+STORES_BY_PAIR: Dict[TradingPair, PointStore] = {}
+
+TIME_WINDOW_VWAPS_BY_PAIR: Dict[TradingPair, Sequence[TimeWindowVWAP]] = {}
+
+
+def index_windows():
+    """
+    Indexes `STORES` and `TIME_WINDOW_VWAPS` by trading pair, which must be done whenever they are replaced.
+    """
+    global STORES_BY_PAIR, TIME_WINDOW_VWAPS_BY_PAIR
+
+    STORES_BY_PAIR = {i.trading_pair: i for i in STORES}
+    time_window_vwaps: Dict[TradingPair, List[TimeWindowVWAP]] = defaultdict(list)
+    for vwap in TIME_WINDOW_VWAPS:
+        time_window_vwaps[vwap.trading_pair].append(vwap)
+    TIME_WINDOW_VWAPS_BY_PAIR = {k: tuple(v) for k, v in time_window_vwaps.items()}
+
+
+index_windows()
+
+
+async def run(metrics_port: Optional[int] = None):
+    if metrics_port:
+        # The windows, and the metrics collected from them, are read where the consumer updates them
+        await serve_metrics(
+            telemetry.REGISTRY, port=metrics_port, render=lambda: run_consumer(telemetry.REGISTRY.render)
+        )
+    if publisher:
+        await publisher.start()
+    try:
+        await event_loop()
+    finally:
+        if publisher:
+            await publisher.close()
 
 
 async def event_loop():
-    async with websockets.connect(WEBSOCKET_URI, ssl=True) as websocket:
+    """
+    Listens to the feed, while it catches up with the wall clock every `TIMER_INTERVAL`.
+    """
+    timer = asyncio.ensure_future(run_timer())
+    try:
+        await run_connections()
+    finally:
+        timer.cancel()
+
+
+async def run_connections():
+    """
+    Listens to the feed, and opens the connection again whenever it drops or the venue sends an error, after a delay
+    with jitter that grows while connections keep dropping. The windows are kept across connections.
+
+    With several `CONNECTIONS`, each of them reconnects on its own, and the feed listens to their merged frames, which
+    are deduplicated by their Coinbase product and sequence. The others keep receiving trades while one of them
+    reconnects, so the feed does not start following a new connection as it does with a single one, which would drop
+    the late trades still arriving on the others: the trades sent again on a new connection are left to the hedge.
+    """
+    global hedge
+
+    if CONNECTIONS > 1:
+        hedge = HedgedFeed(
+            adapter, CONNECTIONS, subscribe, dedupe_capacity=DEDUPE_CAPACITY, reconnect_delay=RECONNECT_DELAY,
+            max_reconnect_delay=MAX_RECONNECT_DELAY
+        )
+        async with hedge:
+            await listen(hedge)
+        return
+
+    async def follow(websocket, dropped_at: Optional[float]):
+        await run_consumer(resume, dropped_at)
         await subscribe(websocket)
         await listen(websocket)
 
+    def count_reconnect():
+        global reconnects
+        reconnects += 1
+
+    await keep_connected(
+        adapter.connect, follow, adapter.venue, RECONNECT_DELAY, MAX_RECONNECT_DELAY, on_reconnect=count_reconnect
+    )
 
-async def subscribe(websocket):
-    logger.info(f'Subscribing to channels {CHANNELS} and trading pairs {TRADING_PAIRS}…')
-    await websocket.send(json.dumps(
-        serialize_message(
-            Subscribe(product_ids=TRADING_PAIRS, channels=CHANNELS)
-        )
-    ))
+
+async def run_timer():
+    while True:
+        await asyncio.sleep(TIMER_INTERVAL)
+        await run_consumer(tick, datetime.now(timezone.utc))
+
+
+async def subscribe(websocket, trading_pairs: Optional[Sequence[TradingPair]] = None):
+    await adapter.subscribe(websocket, trading_pairs or TRADING_PAIRS)
 
 
 async def listen(websocket):
+    """
+    Reads frames into a bounded queue in one task, while another task takes them out in batches and processes them,
+    so that a slow batch does not hold up reads and keepalive pings.
+    """
+    global frame_queue
+
     logger.info('Listening to messages…')
-    async for raw_message in websocket:
-        message = deserialize_message(json.loads(raw_message))
+    frame_queue = FrameQueue(QUEUE_CAPACITY, OVERFLOW_POLICY, key=adapter.product_id)
+    reader = asyncio.ensure_future(read(websocket, frame_queue))
+    consumer = asyncio.ensure_future(consume_queue(frame_queue))
+    await asyncio.wait((reader, consumer), return_when=asyncio.FIRST_COMPLETED)
+
+    if consumer.done():
+        reader.cancel()
+        consumer.result()
+    else:
+        frame_queue.close()
+        try:
+            reader.result()
+        finally:
+            await consumer
+
+
+async def read(websocket, queue: FrameQueue):
+    while True:
+        try:
+            raw_messages = await receive_batch(websocket)
+        except ConnectionClosedOK:
+            return
+        for raw_message in raw_messages:
+            await queue.put(raw_message)
+
+
+async def consume_queue(queue: FrameQueue):
+    """
+    Processes the batches taken out of the queue, on `executor` when set, until the queue is closed and empty. With a
+    `decoder`, batches are decoded by its workers first, and the consumer only processes the messages, while batches
+    too small for the workers are decoded by the consumer, as they are without a decoder.
+    """
+    while True:
+        raw_messages = await queue.get_batch(MAX_BATCH_SIZE)
+        if not raw_messages:
+            return
+        if decoder and len(raw_messages) >= decoder.min_batch_size:
+            await run_consumer(consume_messages, await decode_batch(raw_messages))
+        else:
+            await run_consumer(consume, raw_messages)
+
+
+async def run_consumer(function: Callable, *args) -> Any:
+    """
+    Calls a function of the feed where the windows are, which is on `executor` when set.
+    """
+    if executor:
+        return await asyncio.get_event_loop().run_in_executor(executor, function, *args)
+    return function(*args)
+
+
+async def receive_batch(websocket) -> List[str]:
+    """
+    Waits for the next frame, and then drains the frames that are already buffered or that arrive within
+    `MAX_BATCH_LATENCY`, up to `MAX_BATCH_SIZE` frames.
+    """
+    raw_messages = [await websocket.recv()]
+    if recorder:
+        recorder.record(raw_messages[-1])
+    deadline = time.monotonic() + MAX_BATCH_LATENCY
+
+    while len(raw_messages) < MAX_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            raw_messages.append(await asyncio.wait_for(websocket.recv(), timeout))
+        except (asyncio.TimeoutError, ConnectionClosed):
+            # A closed connection is raised again on the next call, once this batch has been processed
+            break
+        if recorder:
+            recorder.record(raw_messages[-1])
+
+    return raw_messages
+
+
+def consume(raw_messages: Sequence[str]) -> int:
+    """
+    Decodes a batch of raw frames and processes the trading points among them, returning how many there were.
+    """
+    return consume_messages([decode_frame(i) for i in raw_messages])
+
+
+def decode_frame(raw_message: str) -> Optional[Message]:
+    """
+    Decodes a raw frame, or skips it as `None` when it fails to decode, so that one invalid frame does not fail the
+    batch and the connection with it.
+    """
+    global invalid_frames
+
+    try:
+        return decode_message(raw_message, NUMERIC_BACKEND, strict=STRICT_DECODING)
+    except (SchemaValidationError, ValueError) as e:
+        invalid_frames += 1
+        logger.warning(f'Skipped an invalid frame: {e}: {raw_message}')
+        return None
+
+
+def decode_message(raw_message: str, backend: NumericBackend, strict=False) -> Optional[Message]:
+    return adapter.decode(raw_message, backend, strict=strict)
+
+
+async def decode_batch(raw_messages: Sequence[str]) -> List[Optional[Message]]:
+    """
+    Decodes a batch of raw frames on the workers of `decoder`, skipping the frames that fail to decode as `None`.
+    """
+    return await decoder.decode(raw_messages)
+
+
+def consume_messages(messages: Sequence[Optional[Message]]) -> int:
+    """
+    Processes the trading points among a batch of decoded messages, returning how many there were. An error sent by
+    the venue is raised as a `FeedError` once the trading points are processed.
+    """
+    points = []
+    failure: Optional[str] = None
+    for message in messages:
         if message and isinstance(message, TradingPoint):
-            process(message)
+            points.append(message)
+        elif message is not None:
+            failure = adapter.failure(message) or failure
+    process_batch(points)
+    if failure:
+        raise FeedError(failure)
+    return len(points)
 
 
 def process(point: TradingPoint):
-    for vwap in VWAPS:
-        if vwap.supports(point):
-            vwap.add(point)
-            logging.info(f'{vwap}: {vwap.current_value()}')
+    process_batch((point,))
+
+
+def process_batch(points: Sequence[TradingPoint]):
+    """
+    Adds every point of the batch to the windows of its trading pair with a single merge, and then computes the VWAP of
+    each window that changed once.
+    """
+    if sequence_filter:
+        points = sequence_filter.filter(points)
+    points = sequence_gaps.filter(points)
+    if snapshots and points:
+        # Trades are journaled before the reorder buffers, so that those still held survive a restart too
+        snapshots.journal(points)
+
+    points_by_pair: Dict[TradingPair, List[TradingPoint]] = defaultdict(list)
+    for point in points:
+        points_by_pair[point.pair].append(point)
+
+    if REORDER_DELAY is not None:
+        points_by_pair = reorder(points_by_pair, datetime.now(timezone.utc))
+
+    apply(points_by_pair)
+
+
+def apply(points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+    """
+    Adds the points of every trading pair to its windows, and publishes the VWAPs of the windows that changed.
+    """
+    global sequence_filter, disconnected_at, recovery_seconds
+
+    update_windows(points_by_pair)
+
+    if snapshots and snapshots.due():
+        snapshots.take(STORES, TIME_WINDOW_VWAPS, tuple(reorder_buffers.values()), tuple(rollups.values()))
+        # Points restored before this snapshot are long gone from the feed by now
+        sequence_filter = None
+
+    publish(points_by_pair)
+
+    if disconnected_at is not None and points_by_pair:
+        recovery_seconds = time.monotonic() - disconnected_at
+        disconnected_at = None
+        logger.info(f'VWAPs updated again {recovery_seconds:.3f}s after the connection dropped')
+
+
+def resume(dropped_at: Optional[float] = None):
+    """
+    Starts following a new connection, which drops the trades received before it that Coinbase sends again, and
+    measures how long the VWAPs take to be updated again since the previous one dropped, at `dropped_at`.
+    """
+    global disconnected_at
+
+    sequence_gaps.reconnect()
+    disconnected_at = dropped_at
+
+
+def tick(now: datetime):
+    """
+    Catches up with the wall clock `now`: passes on the trades held by the reorder buffers that the watermark passed
+    since the last batch, and expires the time windows.
+    """
+    if any(i.held for i in reorder_buffers.values()):
+        apply(reorder({}, now))
+    expire(now)
+
+
+def expire(now: datetime):
+    """
+    Evicts the trades older than its duration relative to `now` from every time window, and publishes the VWAPs of the
+    windows that changed, which only ever move forward with the trades otherwise.
+    """
+    updates: List[Update] = []
+    for vwap in TIME_WINDOW_VWAPS:
+        if vwap.expire(now):
+            updates.append(Update(vwap.trading_pair, f'{int(vwap.duration.total_seconds())}s', vwap.current_value()))
+    if updates:
+        emit(updates)
+
+
+def reorder(
+        points_by_pair: Dict[TradingPair, List[TradingPoint]],
+        now: datetime
+) -> Dict[TradingPair, List[TradingPoint]]:
+    """
+    Holds the points of every pair in its reorder buffer, and returns those the watermark passed, in sequence order,
+    including points held from previous batches.
+    """
+    for pair in points_by_pair:
+        if pair not in reorder_buffers:
+            reorder_buffers[pair] = ReorderBuffer(pair, REORDER_DELAY, capacity=REORDER_CAPACITY)
+
+    released: Dict[TradingPair, List[TradingPoint]] = {}
+    for pair, buffer in reorder_buffers.items():
+        buffer.add_many(points_by_pair.get(pair, ()))
+        pair_points = buffer.release(now)
+        if pair_points:
+            released[pair] = pair_points
+    return released
+
+
+def update_windows(points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+    batches = [(STORES_BY_PAIR[i], pair_points) for i, pair_points in points_by_pair.items() if i in STORES_BY_PAIR]
+    if batches and isinstance(batches[0][0], RedisPointStore):
+        # The stores of every pair are added to in one round trip
+        add_batches(batches)
+    else:
+        for store, pair_points in batches:
+            store.add_many(pair_points)
+
+    for pair, pair_points in points_by_pair.items():
+        for vwap in TIME_WINDOW_VWAPS_BY_PAIR.get(pair, ()):
+            vwap.add_many(pair_points)
+
+        rollup = rollups.get(pair)
+        if rollup is not None:
+            rollup.add_many(pair_points)
+
+
+def publish(points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+    stores = [STORES_BY_PAIR[i] for i in points_by_pair if i in STORES_BY_PAIR]
+    if stores and isinstance(stores[0], RedisPointStore):
+        # The stores of every pair are read in one round trip
+        store_vwaps = dict(zip((i.trading_pair for i in stores), read_vwaps(stores, WINDOW_SIZES)))
+    else:
+        store_vwaps = {i.trading_pair: i.vwaps(WINDOW_SIZES) for i in stores}
+
+    updates: List[Update] = []
+    for pair in points_by_pair:
+        if pair in store_vwaps:
+            for size, value in zip(WINDOW_SIZES, store_vwaps[pair]):
+                updates.append(Update(pair, str(size), value))
+
+        for vwap in TIME_WINDOW_VWAPS_BY_PAIR.get(pair, ()):
+            updates.append(Update(pair, f'{int(vwap.duration.total_seconds())}s', vwap.current_value()))
+
+        rollup = rollups.get(pair)
+        if rollup is not None:
+            for window in ROLLUP_WINDOWS:
+                # A window as long as the horizon starts within the oldest bar, which is the earliest start retained
+                value = rollup.vwap(max(rollup.newest_time - window, rollup.oldest_time))
+                updates.append(Update(pair, f'{int(window.total_seconds())}s', value))
+    emit(updates)
+
+
+def log_updates(updates: Sequence[Update]):
+    for update in updates:
+        logging.info(update)
+
+
+# Receives the VWAP updates of every batch
+emit: Emit = log_updates
+
+# Writes the VWAP updates from a background thread, once started
+output: Optional[OutputSink] = None
+
+# Pushes the VWAP updates to subscribers on the event loop, when set
+publisher: Optional[Publisher] = None
+
+
+def start_output(output_format=OutputFormat.TEXT, interval=0.0, threshold: Optional[float] = None):
+    """
+    Sends the VWAP updates to an `OutputSink` writing into the standard output, instead of logging every one of them.
+    """
+    global emit, output
+
+    output = OutputSink(sys.stdout, output_format, interval=interval, threshold=threshold)
+    emit = output.emit
+
+
+def start_rollups(windows: Sequence[timedelta]):
+    """
+    Rolls up the trades of every pair into bars, from which the VWAP of each of these horizons is published.
+    """
+    global ROLLUP_WINDOWS, rollups
+
+    ROLLUP_WINDOWS = tuple(windows)
+    rollups = {i: BarRollup(i, backend=NUMERIC_BACKEND) for i in TRADING_PAIRS} if ROLLUP_WINDOWS else {}
+
+
+def restore(directory: str):
+    """
+    Restores the windows from the snapshot and journals kept in `directory`, and keeps them there from now on.
+    """
+    global snapshots, sequence_filter
+
+    started = time.perf_counter()
+    snapshots = Snapshots(directory, NUMERIC_BACKEND, interval=SNAPSHOT_INTERVAL)
+    points_by_pair = {k: v for k, v in snapshots.restore().items() if k in TRADING_PAIRS}
+    update_windows(points_by_pair)
+    # The windows only hold the latest points, while the bars go back much further
+    start_rollups(ROLLUP_WINDOWS)
+    snapshots.restore_rollups(tuple(rollups.values()))
+    sequence_filter = SequenceFilter(points_by_pair)
+
+    logger.info(
+        f'Restored {sum(len(i) for i in points_by_pair.values())} points from {directory} in '
+        f'{time.perf_counter() - started:.3f}s'
+    )
+
+
+def configure(trading_pairs: Sequence[TradingPair], backend: Optional[NumericBackend] = None):
+    """
+    Replaces the windows of the feed with empty ones for these trading pairs.
+    """
+    global TRADING_PAIRS, NUMERIC_BACKEND, STORES, TIME_WINDOW_VWAPS, sequence_gaps, reorder_buffers
+
+    TRADING_PAIRS = tuple(trading_pairs)
+    NUMERIC_BACKEND = backend or NUMERIC_BACKEND
+    STORES = tuple(STORE_CLASS(i, capacity=max(WINDOW_SIZES), backend=NUMERIC_BACKEND) for i in TRADING_PAIRS)
+    TIME_WINDOW_VWAPS = tuple(
+        TimeWindowVWAP(i, duration, backend=NUMERIC_BACKEND) for i in TRADING_PAIRS for duration in TIME_WINDOWS
+    )
+    sequence_gaps = SequenceGaps()
+    reorder_buffers = {}
+    index_windows()
+    start_rollups(ROLLUP_WINDOWS)
+
+
+def main():
+    global recorder, QUEUE_CAPACITY, OVERFLOW_POLICY, SNAPSHOT_INTERVAL, CONNECTIONS, STORES, executor, publisher, emit
+    global REORDER_DELAY, STORE_CLASS, decoder, adapter
+
+    parser = argparse.ArgumentParser(description='Real-time VWAP feed of Coinbase trading pairs')
+    parser.add_argument(
+        '--products-file', metavar='PATH',
+        help='register the products of this file, saved from the Coinbase products endpoint, and subscribe to them'
+    )
+    parser.add_argument(
+        '--products', metavar='LIST',
+        help='subscribe to these products, e.g. BTC-USD,DOGE-USD:4:1 with the decimal places of new ones, or all'
+    )
+    parser.add_argument(
+        '--uri', default=adapter.uri,
+        help='listen to the feed at this URI, such as a local server speaking the Coinbase protocol'
+    )
+    parser.add_argument('--record', metavar='PATH', help='record every raw frame received into this file')
+    parser.add_argument('--compress', action='store_true', help='compress the recording with gzip')
+    parser.add_argument(
+        '--metrics-port', type=int, metavar='PORT',
+        help='serve hot path metrics at http://127.0.0.1:PORT/metrics; without it, nothing is instrumented'
+    )
+    parser.add_argument(
+        '--connections', type=int, default=CONNECTIONS,
+        help='subscribe on this many connections at once and keep the first copy of every frame, to cut tail latency'
+    )
+    parser.add_argument('--queue-size', type=int, default=QUEUE_CAPACITY, help='frames read but not processed yet')
+    parser.add_argument(
+        '--overflow', choices=OverflowPolicy.values(), default=OVERFLOW_POLICY.value,
+        help='what to do with a new frame when the queue is full'
+    )
+    parser.add_argument(
+        '--consumer', choices=('inline', 'thread', 'process'), default='inline',
+        help='where to process batches: on the event loop, on a thread or on a worker process'
+    )
+    parser.add_argument(
+        '--reorder-delay', type=float, metavar='SECONDS',
+        help='hold trades for up to this long to pass them on in order, and discard those that arrive later'
+    )
+    parser.add_argument(
+        '--rollup-windows', metavar='LIST',
+        help='also publish the VWAP of these horizons from 1s, 1m and 1h bars, e.g. 24h,7d'
+    )
+    parser.add_argument(
+        '--decode-workers', type=int, default=0, metavar='N',
+        help='decode batches of frames on this many worker processes, in arrival order, instead of on the event loop'
+    )
+    parser.add_argument(
+        '--decode-chunk-size', type=int, default=250, metavar='FRAMES', help='frames sent to a decode worker at once'
+    )
+    parser.add_argument(
+        '--decode-min-batch', type=int, default=500, metavar='FRAMES',
+        help='decode smaller batches inline, since sending them to the workers would take longer'
+    )
+    parser.add_argument('--output-format', choices=OutputFormat.values(), default=OutputFormat.TEXT.value)
+    parser.add_argument(
+        '--output-interval', type=float, default=0.0, metavar='SECONDS',
+        help='write the VWAP of each window at most once per interval'
+    )
+    parser.add_argument(
+        '--output-threshold', type=float, metavar='RATIO',
+        help='only write the VWAP of a window when it moved by more than this ratio, e.g. 0.0001'
+    )
+    parser.add_argument(
+        '--publish-port', type=int, metavar='PORT',
+        help='push the VWAP updates to the clients subscribed at tcp://127.0.0.1:PORT, as length-prefixed JSON frames'
+    )
+    parser.add_argument(
+        '--state-dir', metavar='PATH',
+        help='restore the windows from this directory on startup, and keep snapshots and journals of them there'
+    )
+    parser.add_argument('--snapshot-interval', type=float, default=SNAPSHOT_INTERVAL, metavar='SECONDS')
+    parser.add_argument(
+        '--store', choices=('python', 'numpy'), default='python',
+        help='keep the points of the windows in Python arrays, or in NumPy arrays for very large windows'
+    )
+    parser.add_argument(
+        '--redis-url', metavar='URL',
+        help='keep the points of the windows in Redis, shared with other replicas, e.g. redis://localhost:6379/0'
+    )
+    args = parser.parse_args()
+
+    trading_pairs = None
+    try:
+        if args.products_file:
+            trading_pairs = load_products(args.products_file)
+        if args.products:
+            trading_pairs = parse_products(args.products)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f'invalid products: {e}')
+
+    rollup_windows = ()
+    try:
+        if args.rollup_windows:
+            rollup_windows = tuple(parse_duration(i) for i in args.rollup_windows.split(','))
+    except ValueError as e:
+        parser.error(f'invalid rollup windows: {e}')
+    horizon = max(resolution * capacity for resolution, capacity in DEFAULT_RESOLUTIONS)
+    if any(i > horizon or i in TIME_WINDOWS for i in rollup_windows):
+        parser.error(f'rollup windows must be at most {horizon} and differ from the time windows {TIME_WINDOWS}')
+
+    if args.state_dir and args.redis_url:
+        parser.error('--state-dir cannot be used with --redis-url, which already keeps the windows out of the process')
+
+    if args.store == 'numpy' and args.redis_url:
+        parser.error('--store numpy cannot be used with --redis-url, which keeps the windows in Redis')
+
+    if args.store == 'numpy' and np is None:
+        parser.error('--store numpy requires the numpy package: pip install numpy')
+
+    if args.state_dir and args.consumer == 'process':
+        parser.error('--state-dir cannot be used with --consumer process, which holds the windows in another process')
+
+    if args.publish_port and args.consumer == 'process':
+        parser.error('--publish-port cannot be used with --consumer process, which publishes from another process')
+
+    if args.metrics_port and args.consumer == 'process':
+        parser.error('--metrics-port cannot be used with --consumer process, whose metrics are in another process')
+
+    output_settings = (OutputFormat(args.output_format), args.output_interval, args.output_threshold)
+    start_output(*output_settings)
+
+    if args.publish_port:
+        publisher = Publisher(port=args.publish_port)
+        emit = broadcast(emit, publisher.emit)
+
+    if args.uri != adapter.uri:
+        adapter = CoinbaseAdapter(args.uri)
+    CONNECTIONS = args.connections
+    if args.reorder_delay is not None:
+        REORDER_DELAY = timedelta(seconds=args.reorder_delay)
+    QUEUE_CAPACITY = args.queue_size
+    OVERFLOW_POLICY = OverflowPolicy(args.overflow)
+    if args.consumer == 'thread':
+        executor = ThreadPoolExecutor(max_workers=1)
+    elif args.consumer == 'process':
+        executor = ProcessPoolExecutor(max_workers=1, initializer=start_output, initargs=output_settings)
+
+    if args.store == 'numpy':
+        STORE_CLASS = ArrayPointStore
+    configure(trading_pairs or TRADING_PAIRS)
+    start_rollups(rollup_windows)
+
+    if args.decode_workers:
+        decoder = ParallelDecoder(
+            args.decode_workers, chunk_size=args.decode_chunk_size, min_batch_size=args.decode_min_batch,
+            backend=NUMERIC_BACKEND, strict=STRICT_DECODING
+        )
+
+    if args.record:
+        recorder = Recorder(args.record, compress=args.compress)
+        logger.info(f'Recording raw frames into {args.record}…')
+
+    if args.metrics_port:
+        telemetry.instrument()
+
+    if args.redis_url:
+        client = RedisPointStore.connect(args.redis_url)
+        STORES = tuple(
+            RedisPointStore(i, client, capacity=max(WINDOW_SIZES), backend=NUMERIC_BACKEND) for i in TRADING_PAIRS
+        )
+        index_windows()
+
+    if args.state_dir:
+        SNAPSHOT_INTERVAL = args.snapshot_interval
+        os.makedirs(args.state_dir, exist_ok=True)
+        restore(args.state_dir)
+
+    try:
+        asyncio.run(run(args.metrics_port))
+    finally:
+        if recorder:
+            recorder.close()
+        if executor:
+            executor.shutdown()
+        if decoder:
+            decoder.close()
+        if snapshots:
+            snapshots.close()
+        output.close()
 
 
 if __name__ == '__main__':
-    asyncio.run(event_loop())
+    main()
@@ -0,0 +1,139 @@
+import asyncio
+from logging import getLogger
+from typing import Any, Awaitable, Callable, List, Optional
+
+from application.adapters import FeedAdapter
+from application.connections import keep_connected
+from application.dedupe import DedupeIndex
+from application.errors import FeedError, SchemaValidationError
+
+logger = getLogger(__name__)
+
+
+class HedgedFeed:
+    """
+    Subscribes to the same products on several connections at once and merges their frames, so that a frame delayed or
+    dropped on one connection can still arrive on time on another.
+
+    Connections are opened by the `adapter` of the venue. The first copy of every frame is passed on and the later ones
+    are dropped, by product and sequence as the adapter finds them, using a `DedupeIndex` of the last `dedupe_capacity`
+    frames. Frames without a sequence, such as subscriptions, are passed on from every connection, and every frame is
+    passed on when the adapter cannot tell sequences. Each connection reconnects on its own when it drops or the venue
+    sends an error on it, so that the others keep the feed going meanwhile.
+
+    It answers `recv` like a WebSocket connection, and must be used as an async context manager from within a running
+    event loop.
+    """
+
+    def __init__(
+            self,
+            adapter: FeedAdapter,
+            connections: int,
+            subscribe: Callable[[Any], Awaitable],
+            dedupe_capacity=10000,
+            reconnect_delay=0.1,
+            max_reconnect_delay=10.0,
+            max_size=1000
+    ):
+        if connections < 1:
+            raise ValueError(f'Connections must be at least 1: {connections}')
+
+        self._adapter = adapter
+        self._subscribe = subscribe
+        self._index = DedupeIndex(dedupe_capacity)
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._frames: asyncio.Queue = asyncio.Queue(max_size)
+        self._wins = [0] * connections
+        self._reconnects = [0] * connections
+        self._duplicates = 0
+        self._tasks: List[asyncio.Future] = []
+        self._failure: Optional[BaseException] = None
+
+    @property
+    def connections(self) -> int:
+        return len(self._wins)
+
+    @property
+    def wins(self) -> List[int]:
+        """
+        How many frames arrived first on each connection.
+        """
+        return list(self._wins)
+
+    @property
+    def reconnects(self) -> List[int]:
+        return list(self._reconnects)
+
+    @property
+    def duplicates(self) -> int:
+        """
+        How many later copies of frames were dropped.
+        """
+        return self._duplicates
+
+    async def recv(self) -> str:
+        frame = await self._frames.get()
+        if frame is None:
+            raise self._failure
+        return frame
+
+    async def __aenter__(self) -> 'HedgedFeed':
+        for index in range(self.connections):
+            task = asyncio.ensure_future(self._connect(index))
+            task.add_done_callback(self._check)
+            self._tasks.append(task)
+        return self
+
+    async def __aexit__(self, *_):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _connect(self, index: int):
+        async def listen(connection, _dropped_at: Optional[float]):
+            await self._subscribe(connection)
+            while True:
+                raw_message = await connection.recv()
+                if self._accept(index, raw_message):
+                    await self._frames.put(raw_message)
+
+        def count_reconnect():
+            self._reconnects[index] += 1
+
+        await keep_connected(
+            self._adapter.connect, listen, f'{self._adapter.venue} connection {index}', self._reconnect_delay,
+            self._max_reconnect_delay, on_reconnect=count_reconnect
+        )
+
+    def _accept(self, index: int, raw_message: str) -> bool:
+        adapter = self._adapter
+        sequence = adapter.sequence(raw_message)
+        if sequence is None:
+            # Frames without a sequence are few, and decoded to tell errors, while invalid ones are left to the feed
+            try:
+                failure = adapter.failure(adapter.decode(raw_message))
+            except (SchemaValidationError, ValueError):
+                return True
+            if failure:
+                raise FeedError(failure)
+            return True
+
+        if not self._index.add((adapter.product_id(raw_message), sequence)):
+            self._duplicates += 1
+            return False
+
+        self._wins[index] += 1
+        return True
+
+    def _check(self, task: asyncio.Future):
+        """
+        Wakes up `recv` with the failure of a connection that stopped for any reason other than being cancelled.
+        """
+        if task.cancelled() or task.exception() is None:
+            return
+
+        self._failure = task.exception()
+        if self._frames.full():
+            self._frames.get_nowait()
+        self._frames.put_nowait(None)
@@ -1,11 +1,13 @@
 from abc import ABC
 from dataclasses import dataclass
 from datetime import datetime
-from decimal import Decimal
-from typing import Collection
+from typing import Collection, Optional, Union
+
+import dateutil.parser
 
 from application.enum import TextEnum
 from application.model import TradingPoint, TradingPair
+from application.numeric import Number
 
 
 class Channel(TextEnum):
@@ -22,9 +24,25 @@ class Subscribe(Message):
     channels: Collection[Channel]
 
 
+@dataclass
+class Error(Message):
+    message: str
+    reason: Optional[str] = None
+
+
 class Match(Message, TradingPoint):
+    """
+    The time can be given as an ISO 8601 string, in which case it is only parsed the first time it is read.
+    """
 
-    def __init__(self, size: Decimal, price: Decimal, product_id: TradingPair, sequence: int, time: datetime):
+    def __init__(
+            self,
+            size: Number,
+            price: Number,
+            product_id: TradingPair,
+            sequence: int,
+            time: Union[datetime, str]
+    ):
         self._size = size
         self._price = price
         self._product_id = product_id
@@ -32,11 +50,11 @@ class Match(Message, TradingPoint):
         self._time = time
 
     @property
-    def price(self) -> Decimal:
+    def price(self) -> Number:
         return self._price
 
     @property
-    def quantity(self) -> Decimal:
+    def quantity(self) -> Number:
         return self._size
 
     @property
@@ -45,8 +63,10 @@ class Match(Message, TradingPoint):
 
     @property
     def pair(self) -> TradingPair:
-        return TradingPair(self._product_id)
+        return self._product_id
 
     @property
     def time(self) -> datetime:
+        if isinstance(self._time, str):
+            self._time = dateutil.parser.isoparse(self._time)
         return self._time
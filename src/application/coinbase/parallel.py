@@ -0,0 +1,122 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from typing import List, Optional, Sequence, Tuple
+
+from application.coinbase.decoder import decode_message
+from application.coinbase.model import Message
+from application.errors import SchemaValidationError
+from application.numeric import DECIMAL, NumericBackend
+
+logger = getLogger(__name__)
+
+
+def decode_batch(
+        raw_messages: Sequence[str],
+        backend: NumericBackend = DECIMAL,
+        strict=False
+) -> Tuple[List[Optional[Message]], int]:
+    """
+    Decodes raw frames in order, which is what every worker of a `ParallelDecoder` runs, and returns the messages along
+    with how many frames failed to decode, which are skipped as `None`.
+    """
+    messages: List[Optional[Message]] = []
+    invalid = 0
+    for raw_message in raw_messages:
+        try:
+            messages.append(decode_message(raw_message, backend, strict=strict))
+        except (SchemaValidationError, ValueError) as e:
+            logger.warning(f'Skipped an invalid frame: {e}: {raw_message}')
+            messages.append(None)
+            invalid += 1
+    return messages, invalid
+
+
+class ParallelDecoder:
+    """
+    Decodes batches of raw frames on a pool of `workers` processes, so that decoding scales with cores and no longer
+    runs on the event loop thread, while the windows are still only ever updated by the consumer.
+
+    A batch is split into chunks of `chunk_size` consecutive frames, which are decoded by the workers at once, and the
+    messages are put back together in the order the frames arrived, which keeps the order of every trading pair too.
+    A batch smaller than `min_batch_size` is decoded inline, since sending it to a worker and back would take longer
+    than decoding it. A frame that fails to decode is skipped as `None` and counted, as it is inline.
+
+    Workers are started on the first batch, and decode frames with the trading pairs registered by then.
+    """
+
+    def __init__(
+            self,
+            workers: int,
+            chunk_size=250,
+            min_batch_size=500,
+            backend: NumericBackend = DECIMAL,
+            strict=False
+    ):
+        if workers < 1:
+            raise ValueError(f'Workers must be at least 1: {workers}')
+        if chunk_size < 1:
+            raise ValueError(f'Chunk size must be at least 1: {chunk_size}')
+
+        self._workers = workers
+        self._chunk_size = chunk_size
+        self._min_batch_size = min_batch_size
+        self._backend = backend
+        self._strict = strict
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._parallel_batches = 0
+        self._inline_batches = 0
+        self._invalid_frames = 0
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    @property
+    def min_batch_size(self) -> int:
+        """
+        How many frames a batch needs to be sent to the workers, below which `decode` decodes it on the calling thread.
+        """
+        return self._min_batch_size
+
+    @property
+    def parallel_batches(self) -> int:
+        """
+        How many batches were decoded by the workers.
+        """
+        return self._parallel_batches
+
+    @property
+    def inline_batches(self) -> int:
+        """
+        How many batches were too small to be worth sending to the workers, and were decoded inline.
+        """
+        return self._inline_batches
+
+    @property
+    def invalid_frames(self) -> int:
+        """
+        How many frames failed to decode, and were skipped.
+        """
+        return self._invalid_frames
+
+    async def decode(self, raw_messages: Sequence[str]) -> List[Optional[Message]]:
+        if len(raw_messages) < self._min_batch_size:
+            self._inline_batches += 1
+            messages, invalid = decode_batch(raw_messages, self._backend, self._strict)
+            self._invalid_frames += invalid
+            return messages
+
+        self._parallel_batches += 1
+        loop = asyncio.get_event_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(
+                self._executor, decode_batch, raw_messages[i:i + self._chunk_size], self._backend, self._strict
+            )
+            for i in range(0, len(raw_messages), self._chunk_size)
+        ))
+        self._invalid_frames += sum(invalid for _, invalid in chunks)
+        return [message for messages, _ in chunks for message in messages]
+
+    def close(self):
+        self._executor.shutdown()
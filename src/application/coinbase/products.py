@@ -0,0 +1,43 @@
+import json
+from decimal import Decimal
+from typing import List
+
+from application.model import TradingPair
+
+
+def load_products(path: str) -> List[TradingPair]:
+    """
+    Registers the products of a file, in the format of the Coinbase products endpoint (`GET /products`): a JSON list of
+    objects with an `id`, a `quote_increment` and a `base_increment`, such as `"0.01"`. Returns them in file order.
+    """
+    with open(path) as file:
+        products = json.load(file)
+
+    return [
+        TradingPair.register(i['id'], _decimals(i['quote_increment']), _decimals(i['base_increment']))
+        for i in products
+    ]
+
+
+def parse_products(text: str) -> List[TradingPair]:
+    """
+    Trading pairs of a comma-separated list of products, either registered ones, such as `BTC-USD`, or new ones along
+    with the decimal places of their price and size, such as `DOGE-USD:4:1`. `all` stands for every registered one.
+    """
+    if text.strip() == 'all':
+        return list(TradingPair)
+
+    pairs = []
+    for product in filter(None, (i.strip() for i in text.split(','))):
+        product_id, *decimals = product.split(':')
+        if not decimals:
+            pairs.append(TradingPair(product_id))
+        elif len(decimals) == 2 and all(i.isdigit() for i in decimals):
+            pairs.append(TradingPair.register(product_id, int(decimals[0]), int(decimals[1])))
+        else:
+            raise ValueError(f'Product must be PRODUCT or PRODUCT:PRICE_DECIMALS:SIZE_DECIMALS: {product}')
+    return pairs
+
+
+def _decimals(increment: str) -> int:
+    return max(0, -Decimal(increment).normalize().as_tuple().exponent)
@@ -0,0 +1,77 @@
+import gzip
+import struct
+import time
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# Every record is the time the frame was received, in nanoseconds since the epoch, and the length of the frame in
+# bytes, followed by the frame encoded in UTF-8.
+_HEADER = struct.Struct('<qI')
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+RecordedFrame = Tuple[int, str]
+
+
+class Recorder:
+    """
+    Appends raw frames received from the Coinbase WebSocket feed to a compact binary file, optionally compressed with
+    gzip. Recording into an existing file appends to it, so a feed can be restarted without losing what was recorded.
+
+    Frames are flushed to the file every `flush_interval` seconds, so that a recording can be read while the feed is
+    running, and keeps what was flushed if the feed crashes. Compressed frames would otherwise stay in memory until the
+    recording is closed; every flush ends a deflate block, which costs some compression when too frequent.
+    """
+
+    def __init__(self, path: str, compress=False, flush_interval=1.0):
+        self._path = path
+        self._file: BinaryIO = gzip.open(path, 'ab') if compress else open(path, 'ab')
+        self._flush_interval = flush_interval
+        self._flushed_at = time.monotonic()
+
+    def record(self, raw_message: str, received_at: Optional[int] = None):
+        data = raw_message.encode('utf-8')
+        self._file.write(_HEADER.pack(time.time_ns() if received_at is None else received_at, len(data)))
+        self._file.write(data)
+        if time.monotonic() - self._flushed_at >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __str__(self) -> str:
+        return f'Recorder[{self._path}]'
+
+
+def read_recording(path: str) -> Iterator[RecordedFrame]:
+    """
+    Reads the frames of a recording, with the time they were received in nanoseconds since the epoch. Compressed
+    recordings are detected automatically, and read up to where they were last flushed when they were not closed.
+    """
+    with open(path, 'rb') as file:
+        compressed = file.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC
+
+    with (gzip.open(path, 'rb') if compressed else open(path, 'rb')) as file:
+        while True:
+            try:
+                header = file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                received_at, length = _HEADER.unpack(header)
+                data = file.read(length)
+            except EOFError:
+                # The compressed stream ends before its end marker, e.g. the feed crashed or is still recording
+                return
+            if len(data) < length:
+                # The last frame was not completely written, e.g. the feed crashed while recording
+                return
+            yield received_at, data.decode('utf-8')
@@ -0,0 +1,123 @@
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from itertools import islice
+from logging import getLogger
+from typing import Iterable, Iterator, List, Optional
+
+from application.coinbase import feed
+from application.coinbase.recording import RecordedFrame, read_recording
+from application.model import TradingPoint
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class ReplayReport:
+    frames: int
+    trades: int
+    seconds: float
+    errors: int = 0
+
+    @property
+    def frames_per_second(self) -> float:
+        return (self.frames / self.seconds) if self.seconds else 0.0
+
+    @property
+    def trades_per_second(self) -> float:
+        return (self.trades / self.seconds) if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f'Replayed {self.frames} frames ({self.trades} trades) in {self.seconds:.3f}s => '
+            f'{self.frames_per_second:.0f} frames/s, {self.trades_per_second:.0f} trades/s'
+            + (f', skipping {self.errors} errors' if self.errors else '')
+        )
+
+
+def replay(frames: Iterable[RecordedFrame], speed: Optional[float] = 1.0) -> ReplayReport:
+    """
+    Pushes recorded frames through the same decode and process pipeline as `feed.listen`.
+
+    With a `speed`, frames are delivered at the pace they were originally received, sped up by that factor, and the
+    frames that are due at the same time are processed in one batch, as the feed would have drained them from the
+    WebSocket. Without a `speed`, frames are processed as fast as possible in batches of `feed.MAX_BATCH_SIZE`.
+
+    Errors that the venue sent while the feed was recorded are counted and logged, and the replay goes on with the
+    frames that follow them, which the feed received on its next connection.
+    """
+    frame_count = 0
+    trade_count = 0
+    error_count = 0
+    started = time.perf_counter()
+
+    for batch in (_paced_batches(frames, speed) if speed else _batches(frames)):
+        frame_count += len(batch)
+        messages = []
+        for message in (feed.decode_frame(i) for i in batch):
+            failure = None if isinstance(message, TradingPoint) or message is None else feed.adapter.failure(message)
+            if failure:
+                error_count += 1
+                logger.warning(f'Skipped a recorded error: {failure}')
+            else:
+                messages.append(message)
+        trade_count += feed.consume_messages(messages)
+
+    return ReplayReport(
+        frames=frame_count, trades=trade_count, seconds=time.perf_counter() - started, errors=error_count
+    )
+
+
+def _batches(frames: Iterable[RecordedFrame]) -> Iterator[List[str]]:
+    raw_messages = (raw_message for _, raw_message in frames)
+    while True:
+        batch = list(islice(raw_messages, feed.MAX_BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+def _paced_batches(frames: Iterable[RecordedFrame], speed: float) -> Iterator[List[str]]:
+    frames = iter(frames)
+    pending = next(frames, None)
+    if pending is None:
+        return
+
+    first_received_at = pending[0]
+    started = time.perf_counter()
+
+    def due_at(received_at: int) -> float:
+        return started + (received_at - first_received_at) / 1e9 / speed
+
+    while pending is not None:
+        delay = due_at(pending[0]) - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        deadline = time.perf_counter() + feed.MAX_BATCH_LATENCY
+        batch = []
+        while pending is not None and len(batch) < feed.MAX_BATCH_SIZE and due_at(pending[0]) <= deadline:
+            batch.append(pending[1])
+            pending = next(frames, None)
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recording of the Coinbase feed through the VWAP pipeline')
+    parser.add_argument('path', help='recording made with `application.coinbase.feed --record`')
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument('--speed', type=float, default=1.0, help='replay N times faster than recorded (default: 1)')
+    speed.add_argument('--max-speed', action='store_true', help='replay as fast as possible')
+    parser.add_argument('--verbose', action='store_true', help='log every VWAP update')
+    args = parser.parse_args()
+
+    feed.logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    report = replay(read_recording(args.path), speed=None if args.max_speed else args.speed)
+    feed.logger.setLevel(logging.INFO)
+
+    logger.info(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,18 @@
 from logging import getLogger
-from typing import Optional, Type
+from typing import Optional
 
 import marshmallow
-from marshmallow import Schema, EXCLUDE, post_load, fields
-from marshmallow.validate import OneOf
+from marshmallow import Schema, EXCLUDE, ValidationError, post_load, fields, validates
 
-from application.coinbase.model import Match, Message, Subscribe
+from application.coinbase.model import Error, Match, Message, Subscribe
 from application.errors import SchemaValidationError
 from application.model import TradingPair
+from application.numeric import DECIMAL, NumericBackend
 
 logger = getLogger(__name__)
 
+UNKNOWN_PRODUCT = 'Unknown trading pair.'
+
 
 class SubscribeSchema(Schema):
     type = fields.Constant('subscribe')
@@ -18,30 +20,63 @@ class SubscribeSchema(Schema):
     channels = fields.List(fields.String())
 
 
+class ErrorSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    message = fields.String(required=True, allow_none=False)
+    reason = fields.String(missing=None)
+
+    @post_load
+    def build_object(self, data, **_) -> Error:
+        return Error(**data)
+
+
 class MatchSchema(Schema):
+    """
+    Prices and sizes are validated as decimals, and then converted to the numeric backend the schema was created with.
+    """
+
     class Meta:
         unknown = EXCLUDE
 
     size = fields.Decimal(required=True, allow_none=False)
     price = fields.Decimal(required=True, allow_none=False)
-    product_id = fields.String(required=True, allow_none=False, validate=OneOf(TradingPair.values()))
+    product_id = fields.String(required=True, allow_none=False)
     sequence = fields.Integer(required=True, allow_none=False)
     time = fields.DateTime(required=True, allow_none=False, format='iso')
 
+    def __init__(self, backend: NumericBackend = DECIMAL, **kwargs):
+        super().__init__(**kwargs)
+        self._backend = backend
+
+    @validates('product_id')
+    def validate_product_id(self, value: str):
+        if TradingPair.get(value) is None:
+            raise ValidationError(UNKNOWN_PRODUCT)
+
     @post_load
     def build_object(self, data, **_) -> Match:
         product_id = TradingPair(data.pop('product_id'))
+        for field, decimals in (('price', product_id.price_decimals), ('size', product_id.size_decimals)):
+            try:
+                data[field] = self._backend.from_decimal(data[field], decimals)
+            except ValueError as e:
+                raise ValidationError({field: [str(e)]})
         return Match(product_id=product_id, **data)
 
 
-def deserialize_message(payload: dict) -> Optional[Message]:
+def deserialize_message(payload: dict, backend: NumericBackend = DECIMAL) -> Optional[Message]:
     message_type = payload.get('type')
     if not message_type:
         logger.warning(f'Ignoring message without "type" => {payload}')
         return None
 
     if message_type in ('match', 'last_match'):
-        return _deserialize(MatchSchema, payload)
+        return _deserialize(MatchSchema(backend), payload)
+
+    if message_type == 'error':
+        return _deserialize(ErrorSchema(), payload)
 
     logger.info(f'Ignoring message with type "{message_type}"')
     return None
@@ -49,16 +84,16 @@ def deserialize_message(payload: dict) -> Optional[Message]:
 
 def serialize_message(message: Message) -> dict:
     if isinstance(message, Subscribe):
-        return _serialize(SubscribeSchema, message)
+        return _serialize(SubscribeSchema(), message)
     raise Exception(f'Message with type "{type(message).__name__}" cannot be serialized')
 
 
-def _serialize(schema: Type[Schema], message: Message) -> dict:
-    return schema().dump(message)
+def _serialize(schema: Schema, message: Message) -> dict:
+    return schema.dump(message)
 
 
-def _deserialize(schema: Type[Schema], payload: dict) -> Message:
+def _deserialize(schema: Schema, payload: dict) -> Message:
     try:
-        return schema().load(payload)
+        return schema.load(payload)
     except marshmallow.exceptions.ValidationError as e:
         raise SchemaValidationError('Invalid message payload', failures=e.normalized_messages())
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from collections import defaultdict
+from logging import getLogger
+from multiprocessing.process import BaseProcess
+from typing import Callable, Dict, List, Optional, Sequence
+
+from application.coinbase import feed
+from application.coinbase.products import load_products, parse_products
+from application.connections import keep_connected
+from application.model import TradingPair
+from application.output import OutputFormat, Update
+from application.sharding import HashRing
+
+logger = getLogger(__name__)
+
+# How long the supervisor waits for output before checking that its workers are still alive, in seconds
+WATCH_INTERVAL = 1.0
+
+# How long a stopping worker has to exit before it is terminated, in seconds
+STOP_TIMEOUT = 5.0
+
+
+def run_worker(trading_pairs: Sequence[TradingPair], output, frames=None):
+    """
+    Entry point of a worker process, which computes the VWAPs of its trading pairs and puts every batch of updates
+    into the `output` queue. Without a `frames` queue, the worker subscribes to its trading pairs on its own
+    connection. Otherwise it consumes the batches of raw frames put into that queue until it gets `None`.
+    """
+    feed.configure(trading_pairs)
+    feed.emit = output.put
+
+    if frames is None:
+        asyncio.run(feed.event_loop())
+    else:
+        for raw_messages in iter(frames.get, None):
+            feed.consume(raw_messages)
+
+
+def route(
+        raw_messages: Sequence[str],
+        worker_of: Dict[str, str],
+        product_id: Callable[[str], Optional[str]]
+) -> Dict[str, List[str]]:
+    """
+    Splits a batch of raw frames by the worker of their product, as told by `product_id`. Frames of other products, or
+    without any, are dropped.
+    """
+    batches: Dict[str, List[str]] = defaultdict(list)
+    for raw_message in raw_messages:
+        worker = worker_of.get(product_id(raw_message))
+        if worker is not None:
+            batches[worker].append(raw_message)
+    return batches
+
+
+class Supervisor:
+    """
+    Shards trading pairs across worker processes by consistent hashing, and writes the VWAP updates of every worker
+    into a single output stream. Workers that exit are restarted with the same trading pairs, and empty windows.
+
+    Each worker either subscribes to its own trading pairs, so that the workers share nothing and scale with the
+    number of cores, or, with `shared_ingest`, gets the frames of its trading pairs from the one connection of the
+    supervisor, which then bounds the throughput to how fast a single process can receive and route frames.
+    """
+
+    def __init__(self, trading_pairs: Sequence[TradingPair], workers: int, shared_ingest=False, context=None):
+        if workers < 1:
+            raise ValueError(f'Workers must be at least 1: {workers}')
+
+        self._trading_pairs = tuple(trading_pairs)
+        self._assignments: Dict[str, List[TradingPair]] = HashRing(
+            f'worker-{i}' for i in range(workers)
+        ).assign(self._trading_pairs)
+        self._worker_of = {pair.value: worker for worker, pairs in self._assignments.items() for pair in pairs}
+
+        self._context = context or multiprocessing.get_context()
+        self._output = self._context.Queue()
+        self._frames = {i: self._context.Queue() for i in self._assignments} if shared_ingest else {}
+        self._processes: Dict[str, BaseProcess] = {}
+
+    @property
+    def assignments(self) -> Dict[str, List[TradingPair]]:
+        return dict(self._assignments)
+
+    def start(self):
+        for worker in self._assignments:
+            self._start(worker)
+
+    def stop(self):
+        for frames in self._frames.values():
+            frames.put(None)
+        for process in self._processes.values():
+            process.join(STOP_TIMEOUT if self._frames else 0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def dispatch(self, raw_messages: Sequence[str]):
+        for worker, batch in route(raw_messages, self._worker_of, feed.adapter.product_id).items():
+            self._frames[worker].put(batch)
+
+    def receive(self, timeout=WATCH_INTERVAL) -> Optional[Sequence[Update]]:
+        """
+        Next batch of updates from any worker, or `None` if there was none within `timeout` seconds.
+        """
+        try:
+            return self._output.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def watch(self):
+        for worker, process in list(self._processes.items()):
+            if not process.is_alive():
+                logger.warning(f'{worker} exited with code {process.exitcode}, restarting it…')
+                self._start(worker)
+
+    def run(self):
+        self.start()
+        output = threading.Thread(target=self._write_output, name='output', daemon=True)
+        output.start()
+        try:
+            if self._frames:
+                asyncio.run(self._ingest())
+            else:
+                output.join()
+        finally:
+            self.stop()
+
+    def _start(self, worker: str):
+        pairs = self._assignments[worker]
+        process = self._context.Process(
+            target=run_worker,
+            args=(pairs, self._output, self._frames.get(worker)),
+            name=worker,
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker] = process
+        logger.info(f'Started {worker} (pid {process.pid}) for trading pairs {pairs}')
+
+    def _write_output(self):
+        while True:
+            updates = self.receive()
+            if updates:
+                feed.emit(updates)
+            self.watch()
+
+    async def _ingest(self):
+        """
+        Routes the frames of the connection of the supervisor to the workers, and opens it again whenever it drops, like
+        the feed. The workers drop the trades sent again on a new connection by their sequence.
+        """
+        async def listen(connection, _dropped_at: Optional[float]):
+            await feed.subscribe(connection, self._trading_pairs)
+            while True:
+                self.dispatch(await feed.receive_batch(connection))
+
+        await keep_connected(
+            feed.adapter.connect, listen, feed.adapter.venue, feed.RECONNECT_DELAY, feed.MAX_RECONNECT_DELAY
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Real-time VWAP feed of Coinbase trading pairs, sharded by process')
+    parser.add_argument(
+        '--products-file', metavar='PATH',
+        help='register the products of this file, saved from the Coinbase products endpoint, and subscribe to them'
+    )
+    parser.add_argument(
+        '--products', metavar='LIST',
+        help='subscribe to these products, e.g. BTC-USD,DOGE-USD:4:1 with the decimal places of new ones, or all'
+    )
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument(
+        '--shared-ingest', action='store_true',
+        help='receive every frame on one connection and route it to the workers, instead of one connection per worker'
+    )
+    parser.add_argument('--output-format', choices=OutputFormat.values(), default=OutputFormat.TEXT.value)
+    parser.add_argument(
+        '--output-interval', type=float, default=0.0, metavar='SECONDS',
+        help='write the VWAP of each window at most once per interval'
+    )
+    args = parser.parse_args()
+
+    trading_pairs = None
+    try:
+        if args.products_file:
+            trading_pairs = load_products(args.products_file)
+        if args.products:
+            trading_pairs = parse_products(args.products)
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f'invalid products: {e}')
+
+    supervisor = Supervisor(trading_pairs or feed.TRADING_PAIRS, workers=args.workers, shared_ingest=args.shared_ingest)
+    feed.start_output(OutputFormat(args.output_format), args.output_interval)
+    try:
+        supervisor.run()
+    finally:
+        feed.output.close()
+
+
+if __name__ == '__main__':
+    main()
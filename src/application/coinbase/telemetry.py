@@ -0,0 +1,331 @@
+import re
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence
+
+from application.coinbase.model import Match, Message
+from application.errors import SchemaValidationError
+from application.gaps import SequenceGaps
+from application.metrics import Counter, Gauge, Histogram, Labels, Registry
+from application.model import TradingPair, TradingPoint
+
+_TYPE = re.compile(r'"type"\s*:\s*"([^"\\]*)"')
+
+# Frames drained per wake-up of the feed
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'vwap_feed_stage_seconds',
+    'Time spent in each stage of the hot path: receive (including the wait for the first frame), decode (per '
+    'frame), insert and publish (per batch)',
+    ('stage',)
+))
+
+MESSAGES = REGISTRY.register(Counter('vwap_feed_messages_total', 'Frames received by message type', ('type',)))
+
+TRADES = REGISTRY.register(Counter('vwap_feed_trades_total', 'Trades added to the windows by trading pair', ('pair',)))
+
+BATCH_FRAMES = REGISTRY.register(Histogram(
+    'vwap_feed_batch_frames', 'Frames drained from the WebSocket per wake-up', buckets=BATCH_BUCKETS
+))
+
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'vwap_feed_queue_depth', 'Frames buffered by the WebSocket client and not received yet, after the last batch'
+))
+
+
+def _collect(attribute: str, windows: Callable[[], tuple]) -> Callable[[], Dict[Labels, float]]:
+    def collect() -> Dict[Labels, float]:
+        values: Dict[Labels, float] = {}
+        for window in windows():
+            labels = (str(window.trading_pair),)
+            values[labels] = values.get(labels, 0) + getattr(window, attribute, 0)
+        return values
+    return collect
+
+
+def _stores() -> tuple:
+    from application.coinbase import feed
+    return feed.STORES
+
+
+def _time_windows() -> tuple:
+    from application.coinbase import feed
+    return feed.TIME_WINDOW_VWAPS
+
+
+def _rollups() -> tuple:
+    from application.coinbase import feed
+    return tuple(feed.rollups.values())
+
+
+LATE_POINTS = REGISTRY.register(Counter(
+    'vwap_feed_late_points_total', 'Trades inserted before a newer trade of the same pair', ('pair',),
+    collect=_collect('late', _stores)
+))
+
+EVICTED_POINTS = REGISTRY.register(Counter(
+    'vwap_feed_evicted_points_total', 'Trades evicted from the stores to make room for newer ones', ('pair',),
+    collect=_collect('evicted', _stores)
+))
+
+DUPLICATE_POINTS = REGISTRY.register(Counter(
+    'vwap_feed_duplicate_points_total', 'Trades dropped because a trade with the same sequence was retained',
+    ('pair',), collect=_collect('duplicates', _stores)
+))
+
+DISCARDED_POINTS = REGISTRY.register(Counter(
+    'vwap_feed_discarded_points_total', 'Trades too old to enter a store, a time window or the bars', ('pair',),
+    collect=_collect('discarded', lambda: _stores() + _time_windows() + _rollups())
+))
+
+
+def _reorder_buffers() -> tuple:
+    from application.coinbase import feed
+    return tuple(feed.reorder_buffers.values())
+
+
+REORDER_HELD = REGISTRY.register(Gauge(
+    'vwap_feed_reorder_held_points', 'Trades held until the watermark passes them, with a reorder delay', ('pair',),
+    collect=_collect('held', _reorder_buffers)
+))
+
+REORDER_DISCARDED = REGISTRY.register(Counter(
+    'vwap_feed_reorder_discarded_points_total',
+    'Trades that arrived after a newer trade of the same pair was passed on, with a reorder delay', ('pair',),
+    collect=_collect('discarded', _reorder_buffers)
+))
+
+
+def _frame_queue(attribute: str) -> Callable[[], Dict[Labels, float]]:
+    def collect() -> Dict[Labels, float]:
+        from application.coinbase import feed
+        return {(): getattr(feed.frame_queue, attribute)} if feed.frame_queue else {}
+    return collect
+
+
+FRAME_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'vwap_feed_frame_queue_depth', 'Frames read and waiting to be processed', collect=_frame_queue('depth')
+))
+
+FRAME_QUEUE_LAG = REGISTRY.register(Gauge(
+    'vwap_feed_frame_queue_lag_seconds', 'How long the oldest frame of the last batch waited to be processed',
+    collect=_frame_queue('lag')
+))
+
+FRAME_QUEUE_DROPPED = REGISTRY.register(Counter(
+    'vwap_feed_frame_queue_dropped_total', 'Frames dropped by the overflow policy of the queue',
+    collect=_frame_queue('dropped')
+))
+
+
+def _sequence_gaps(measure: Callable[[SequenceGaps, TradingPair], float]) -> Callable[[], Dict[Labels, float]]:
+    def collect() -> Dict[Labels, float]:
+        from application.coinbase import feed
+        return {(str(pair),): measure(feed.sequence_gaps, pair) for pair in feed.sequence_gaps.trading_pairs}
+    return collect
+
+
+SEQUENCE_GAPS = REGISTRY.register(Counter(
+    'vwap_feed_sequence_gaps_total', 'Ranges of sequences missed while disconnected', ('pair',),
+    collect=_sequence_gaps(lambda gaps, pair: len(gaps.gaps(pair)))
+))
+
+MISSING_SEQUENCES = REGISTRY.register(Counter(
+    'vwap_feed_missing_sequences_total',
+    'Sequences missed while disconnected, which number every message of a product and not only its trades', ('pair',),
+    collect=_sequence_gaps(SequenceGaps.missing)
+))
+
+
+def _feed(attribute: str) -> Callable[[], Dict[Labels, float]]:
+    def collect() -> Dict[Labels, float]:
+        from application.coinbase import feed
+        value = getattr(feed, attribute)
+        return {(): value} if value is not None else {}
+    return collect
+
+
+RECONNECTS = REGISTRY.register(Counter(
+    'vwap_feed_reconnects_total', 'Reconnections after the connection dropped or could not be opened',
+    collect=_feed('reconnects')
+))
+
+RECOVERY_SECONDS = REGISTRY.register(Gauge(
+    'vwap_feed_recovery_seconds', 'How long the VWAPs took to be updated again after the last connection dropped',
+    collect=_feed('recovery_seconds')
+))
+
+
+def _invalid_frames() -> Dict[Labels, float]:
+    from application.coinbase import feed
+    return {(): feed.invalid_frames + (feed.decoder.invalid_frames if feed.decoder else 0)}
+
+
+INVALID_FRAMES = REGISTRY.register(Counter(
+    'vwap_feed_invalid_frames_total', 'Frames skipped because they failed to decode', collect=_invalid_frames
+))
+
+
+def _hedge_wins() -> Dict[Labels, float]:
+    from application.coinbase import feed
+    return {(str(i),): wins for i, wins in enumerate(feed.hedge.wins)} if feed.hedge else {}
+
+
+def _hedge_duplicates() -> Dict[Labels, float]:
+    from application.coinbase import feed
+    return {(): feed.hedge.duplicates} if feed.hedge else {}
+
+
+HEDGE_WINS = REGISTRY.register(Counter(
+    'vwap_feed_connection_wins_total', 'Frames that arrived first on each connection, when there are several',
+    ('connection',), collect=_hedge_wins
+))
+
+HEDGE_DUPLICATES = REGISTRY.register(Counter(
+    'vwap_feed_duplicate_frames_total', 'Later copies of frames dropped, when there are several connections',
+    collect=_hedge_duplicates
+))
+
+
+def _publisher(attribute: str) -> Callable[[], Dict[Labels, float]]:
+    def collect() -> Dict[Labels, float]:
+        from application.coinbase import feed
+        return {(): getattr(feed.publisher, attribute)} if feed.publisher else {}
+    return collect
+
+
+PUBLISHER_CLIENTS = REGISTRY.register(Gauge(
+    'vwap_feed_publisher_clients', 'Clients connected to the publisher', collect=_publisher('clients')
+))
+
+PUBLISHER_CONFLATED = REGISTRY.register(Counter(
+    'vwap_feed_publisher_conflated_total',
+    'Frames replaced by a newer one of the same window before a slow client could take them',
+    collect=_publisher('conflated')
+))
+
+
+# Functions of the feed replaced by `instrument`, so that `uninstrument` can put them back
+_originals: Dict[str, Callable] = {}
+
+
+def instrument():
+    """
+    Replaces the stage functions of the feed with wrappers that time them and count what goes through them.
+
+    Nothing is instrumented unless this is called, so that the hot path does not pay for metrics nobody collects.
+    """
+    from application.coinbase import feed
+
+    if _originals:
+        return
+
+    for name, wrapper in (
+            ('receive_batch', _timed_receive_batch),
+            ('decode_message', _timed_decode_message),
+            ('decode_batch', _timed_decode_batch),
+            ('update_windows', _timed_update_windows),
+            ('publish', _timed_publish),
+    ):
+        original = getattr(feed, name)
+        _originals[name] = original
+        setattr(feed, name, wraps(original)(wrapper(original)))
+
+
+def uninstrument():
+    from application.coinbase import feed
+
+    for name, original in _originals.items():
+        setattr(feed, name, original)
+    _originals.clear()
+
+
+def _timed_receive_batch(receive_batch):
+    async def wrapper(websocket) -> List[str]:
+        started = time.perf_counter()
+        raw_messages = await receive_batch(websocket)
+        STAGE_SECONDS.observe(time.perf_counter() - started, 'receive')
+        BATCH_FRAMES.observe(len(raw_messages))
+        QUEUE_DEPTH.set(len(getattr(websocket, 'messages', ())))
+        return raw_messages
+    return wrapper
+
+
+def _timed_decode_message(decode_message):
+    def wrapper(raw_message: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            message = decode_message(raw_message, *args, **kwargs)
+        except (SchemaValidationError, ValueError):
+            MESSAGES.inc('invalid')
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, 'decode')
+
+        _count_message(raw_message, message)
+        return message
+    return wrapper
+
+
+def _timed_decode_batch(decode_batch):
+    """
+    Times the batches decoded by the workers of the parallel decoder, as the time of the batch spread over its frames,
+    including the round trip to the workers, and counts their messages by type. The frames that failed to decode are
+    only told apart from the other frames skipped as `None` when the batch had some, by decoding those again.
+    """
+    async def wrapper(raw_messages: Sequence[str]) -> List[Optional[Message]]:
+        from application.coinbase import feed
+
+        invalid_frames = feed.decoder.invalid_frames
+        started = time.perf_counter()
+        messages = await decode_batch(raw_messages)
+        seconds = (time.perf_counter() - started) / max(1, len(raw_messages))
+        failed = feed.decoder.invalid_frames > invalid_frames
+
+        for raw_message, message in zip(raw_messages, messages):
+            STAGE_SECONDS.observe(seconds, 'decode')
+            if message is None and failed and not _decodes(raw_message):
+                MESSAGES.inc('invalid')
+            else:
+                _count_message(raw_message, message)
+        return messages
+    return wrapper
+
+
+def _decodes(raw_message: str) -> bool:
+    from application.coinbase import feed
+
+    try:
+        _originals['decode_message'](raw_message, feed.NUMERIC_BACKEND, strict=feed.STRICT_DECODING)
+    except (SchemaValidationError, ValueError):
+        return False
+    return True
+
+
+def _count_message(raw_message: str, message: Optional[Message]):
+    if isinstance(message, Match):
+        MESSAGES.inc('match')
+    else:
+        match = _TYPE.search(raw_message)
+        MESSAGES.inc(match.group(1) if match else 'unknown')
+
+
+def _timed_update_windows(update_windows):
+    def wrapper(points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+        started = time.perf_counter()
+        update_windows(points_by_pair)
+        STAGE_SECONDS.observe(time.perf_counter() - started, 'insert')
+        for pair, points in points_by_pair.items():
+            TRADES.inc(str(pair), amount=len(points))
+    return wrapper
+
+
+def _timed_publish(publish):
+    def wrapper(points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+        started = time.perf_counter()
+        publish(points_by_pair)
+        STAGE_SECONDS.observe(time.perf_counter() - started, 'publish')
+    return wrapper
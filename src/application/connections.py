@@ -0,0 +1,63 @@
+import asyncio
+import random
+import time
+from logging import getLogger
+from typing import Any, AsyncContextManager, Awaitable, Callable, Optional
+
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from application.errors import FeedError
+
+logger = getLogger(__name__)
+
+# Failures after which a connection is opened again
+RECONNECTABLE = (ConnectionClosed, InvalidHandshake, FeedError, OSError, asyncio.TimeoutError)
+
+
+def backoff_delay(attempt: int, delay: float, max_delay: float) -> float:
+    """
+    How long to wait before the given reconnection attempt, counted from zero: `delay` doubled after every attempt up
+    to `max_delay`, with jitter, so that connections dropped at once do not all come back at once.
+    """
+    delay = min(max_delay, delay * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+async def keep_connected(
+        connect: Callable[[], AsyncContextManager],
+        listen: Callable[[Any, Optional[float]], Awaitable],
+        name: str,
+        reconnect_delay=0.1,
+        max_reconnect_delay=10.0,
+        on_reconnect: Optional[Callable[[], Any]] = None
+):
+    """
+    Opens a connection with `connect` and listens to it, and opens it again whenever it is closed, it drops or `listen`
+    fails with one of the `RECONNECTABLE` failures, such as a `FeedError` for an error sent by the venue. Reconnections
+    wait for a delay with jitter, which doubles while connections keep dropping sooner than the maximum delay.
+
+    `listen` gets the connection, along with the monotonic time the previous one dropped at, if any, and `on_reconnect`
+    is called before every new attempt. Any other failure is raised, and it runs until cancelled otherwise.
+    """
+    attempt = 0
+    dropped_at: Optional[float] = None
+    while True:
+        connected_at: Optional[float] = None
+        try:
+            async with connect() as connection:
+                connected_at = time.monotonic()
+                await listen(connection, dropped_at)
+            logger.warning(f'{name}: connection closed')
+        except RECONNECTABLE as e:
+            logger.warning(
+                f'{name}: connection dropped: {e!r}' if connected_at else f'{name}: could not connect: {e!r}'
+            )
+
+        if connected_at is not None:
+            dropped_at = time.monotonic()
+            if dropped_at - connected_at > max_reconnect_delay:
+                attempt = 0
+        await asyncio.sleep(backoff_delay(attempt, reconnect_delay, max_reconnect_delay))
+        attempt += 1
+        if on_reconnect:
+            on_reconnect()
@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from typing import Hashable
+
+
+class DedupeIndex:
+    """
+    Remembers the last `capacity` keys added, such as the product and sequence of every frame, so that later copies of
+    a recent frame can be told apart from the first one in O(1), within a bounded amount of memory.
+
+    Keys are kept in an ordered dict, so that the oldest one is evicted first, in O(1).
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f'Capacity must be at least 1: {capacity}')
+
+        self._capacity = capacity
+        self._keys: 'OrderedDict[Hashable, None]' = OrderedDict()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def add(self, key: Hashable) -> bool:
+        """
+        Adds a key, returning whether it is the first copy of it still remembered.
+        """
+        keys = self._keys
+        if key in keys:
+            return False
+
+        if len(keys) >= self._capacity:
+            keys.popitem(last=False)
+        keys[key] = None
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -8,3 +8,9 @@ class ApplicationError(Exception):
 class SchemaValidationError(ApplicationError):
     def __init__(self, message: str, failures: Optional[Dict[str, List[str]]] = None):
         super().__init__(f'{message} => {failures}' if failures else message)
+
+
+class FeedError(ApplicationError):
+    """
+    Raised when the exchange reports an error on the feed, such as a subscription it rejected.
+    """
@@ -0,0 +1,114 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from application.model import TradingPair, TradingPoint
+
+Range = Tuple[int, int]
+
+
+class Ranges:
+    """
+    Set of integers kept as a sorted list of disjoint inclusive ranges, which are merged as soon as they overlap or
+    touch, so that a run of consecutive integers takes as much room as a single one.
+    """
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+
+    def add(self, start: int, end: int):
+        if start > end:
+            raise ValueError(f'Range start must not be greater than its end: {start} > {end}')
+
+        starts, ends = self._starts, self._ends
+        # Ranges from `first` to `last` (excluded) overlap or touch the new one
+        first = bisect_left(ends, start - 1)
+        last = bisect_right(starts, end + 1)
+        if first < last:
+            start, end = min(start, starts[first]), max(end, ends[last - 1])
+        starts[first:last] = [start]
+        ends[first:last] = [end]
+
+    @property
+    def gaps(self) -> List[Range]:
+        """
+        Ranges missing between the first and the last integer of the set.
+        """
+        return [(end + 1, start - 1) for end, start in zip(self._ends, self._starts[1:])]
+
+    def __contains__(self, value: int) -> bool:
+        index = bisect_right(self._starts, value) - 1
+        return index >= 0 and value <= self._ends[index]
+
+    def __iter__(self) -> Iterator[Range]:
+        return zip(self._starts, self._ends)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+
+class SequenceGaps:
+    """
+    Sequences of the trades received for every trading pair, across connections, to drop the trades sent again after
+    a reconnection and to count the sequences missed while disconnected.
+
+    The sequence of a product also numbers its other messages, so the sequences skipped between two trades of the same
+    connection are not missing. Each connection then covers a single range per trading pair, from its first to its last
+    trade, and the gaps are the ranges between connections, counted in sequences rather than trades.
+    """
+
+    def __init__(self):
+        self._covered: Dict[TradingPair, Ranges] = {}
+        self._current: Dict[TradingPair, List[int]] = {}
+
+    def reconnect(self):
+        """
+        Closes the ranges of the current connection, so that the trades received on the next one are checked against
+        them.
+        """
+        for pair, (first, last) in self._current.items():
+            self._covered.setdefault(pair, Ranges()).add(first, last)
+        self._current = {}
+
+    def filter(self, points: Iterable[TradingPoint]) -> List[TradingPoint]:
+        """
+        Drops the points whose sequence was received on a previous connection, and extends the ranges of the current
+        one with the others.
+        """
+        covered, current = self._covered, self._current
+        filtered = []
+        for point in points:
+            pair, sequence = point.pair, point.sequence
+            if pair in covered and sequence in covered[pair]:
+                continue
+
+            bounds = current.get(pair)
+            if bounds is None:
+                current[pair] = [sequence, sequence]
+            elif sequence < bounds[0]:
+                bounds[0] = sequence
+            elif sequence > bounds[1]:
+                bounds[1] = sequence
+            filtered.append(point)
+        return filtered
+
+    def ranges(self, pair: TradingPair) -> Ranges:
+        ranges = Ranges()
+        for start, end in self._covered.get(pair, ()):
+            ranges.add(start, end)
+        if pair in self._current:
+            ranges.add(*self._current[pair])
+        return ranges
+
+    def gaps(self, pair: TradingPair) -> List[Range]:
+        return self.ranges(pair).gaps
+
+    def missing(self, pair: TradingPair) -> int:
+        """
+        How many sequences of the trading pair were missed between connections.
+        """
+        return sum(end - start + 1 for start, end in self.gaps(pair))
+
+    @property
+    def trading_pairs(self) -> List[TradingPair]:
+        return sorted(set(self._covered) | set(self._current), key=str)
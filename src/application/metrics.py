@@ -0,0 +1,182 @@
+import asyncio
+import bisect
+from abc import ABC, abstractmethod
+from logging import getLogger
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+# Collects the current values of a metric when it is rendered, instead of updating them on the hot path
+Collector = Callable[[], Dict[Labels, float]]
+
+# Latency buckets in seconds, from 1µs to 1s
+LATENCY_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric(ABC):
+    """
+    A metric in the Prometheus text exposition format
+    See → https://prometheus.io/docs/instrumenting/exposition_formats/
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> Iterable[str]:
+        pass
+
+    def _format(self, name: str, labels: Labels, value: float, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, labels))
+        if extra:
+            pairs.append(extra)
+        rendered_labels = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return f'{name}{{{rendered_labels}}} {value:g}' if rendered_labels else f'{name} {value:g}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(
+            self,
+            name: str,
+            description: str,
+            label_names: Sequence[str] = (),
+            collect: Optional[Collector] = None
+    ):
+        super().__init__(name, description, label_names)
+        self._values: Dict[Labels, float] = {}
+        self._collect = collect
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._current().get(labels, 0)
+
+    def _current(self) -> Dict[Labels, float]:
+        return self._collect() if self._collect else self._values
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in sorted(tuple(self._current().items())):
+            yield self._format(self.name, labels, value)
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            description: str,
+            label_names: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, description, label_names)
+        self._buckets = tuple(sorted(buckets))
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self._buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def _samples(self) -> Iterable[str]:
+        # Copies of the counts, which may be observed on another thread meanwhile
+        snapshot = sorted(
+            (labels, tuple(counts), self._sums.get(labels, 0.0)) for labels, counts in tuple(self._counts.items())
+        )
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self._buckets, counts):
+                cumulative += count
+                yield self._format(f'{self.name}_bucket', labels, cumulative, ('le', f'{bound:g}'))
+            cumulative += counts[-1]
+            yield self._format(f'{self.name}_bucket', labels, cumulative, ('le', '+Inf'))
+            yield self._format(f'{self.name}_sum', labels, total)
+            yield self._format(f'{self.name}_count', labels, cumulative)
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return ''.join(f'{line}\n' for metric in self._metrics for line in metric.render())
+
+
+async def serve_metrics(
+        registry: Registry,
+        host='127.0.0.1',
+        port=9100,
+        render: Optional[Callable[[], Awaitable[str]]] = None
+) -> asyncio.AbstractServer:
+    """
+    Serves the metrics of the registry over HTTP at `/metrics`, on the running event loop. They are rendered by `render`
+    when given, such as on the thread that updates them, or by the registry on the event loop otherwise.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            if len(request_line) >= 2 and request_line[0] == 'GET' and request_line[1].split('?')[0] == '/metrics':
+                text = await render() if render else registry.render()
+                status, content_type, body = '200 OK', CONTENT_TYPE, text.encode('utf-8')
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain', b'Not Found\n'
+
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except ConnectionError as e:
+            logger.warning(f'Metrics request failed => {e}')
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f'Serving metrics at http://{host}:{port}/metrics')
+    return server
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
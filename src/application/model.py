@@ -1,14 +1,113 @@
 from abc import ABC, abstractmethod
-from decimal import Decimal
+from datetime import datetime
 from functools import total_ordering
+from typing import Collection, Dict, Iterator, Optional, Union
 
-from application.enum import TextEnum
+from application.numeric import Number
 
 
-class TradingPair(TextEnum):
-    BTC_USD = 'BTC-USD'
-    ETH_USD = 'ETH-USD'
-    ETH_BTC = 'ETH-BTC'
+class _Registry(type):
+    """
+    Makes the registered trading pairs iterable from their class, like the members of an enum.
+    """
+
+    def __iter__(cls) -> Iterator['TradingPair']:
+        return iter(tuple(cls._registry.values()))
+
+    def __len__(cls) -> int:
+        return len(cls._registry)
+
+
+class TradingPair(metaclass=_Registry):
+    """
+    Product traded on Coinbase, such as `BTC-USD`, along with the decimal places of its increments.
+
+    Trading pairs are registered at runtime, such as from a file of products or from the command line, on top of the
+    ones defined below. They are interned: `TradingPair(product_id)` always returns the same instance for the same
+    product, so that pairs are compared and hashed by identity, and found with a single dict lookup however many there
+    are. An unknown product raises a `ValueError`.
+    """
+
+    __slots__ = ('_value', '_price_decimals', '_size_decimals')
+
+    _registry: Dict[str, 'TradingPair'] = {}
+
+    BTC_USD: 'TradingPair'
+    ETH_USD: 'TradingPair'
+    ETH_BTC: 'TradingPair'
+
+    def __new__(cls, product_id: Union[str, 'TradingPair']) -> 'TradingPair':
+        if isinstance(product_id, TradingPair):
+            return product_id
+        try:
+            return cls._registry[product_id]
+        except KeyError:
+            raise ValueError(f'Unknown trading pair: {product_id}') from None
+
+    @classmethod
+    def register(cls, product_id: str, price_decimals: int, size_decimals: int) -> 'TradingPair':
+        """
+        Registers a product, or returns the registered one if it has the same increments.
+        """
+        pair = cls._registry.get(product_id)
+        if pair is not None:
+            if (pair.price_decimals, pair.size_decimals) != (price_decimals, size_decimals):
+                raise ValueError(f'Trading pair already registered with other increments: {product_id}')
+            return pair
+
+        pair = object.__new__(cls)
+        pair._value = product_id
+        pair._price_decimals = price_decimals
+        pair._size_decimals = size_decimals
+        cls._registry[product_id] = pair
+        return pair
+
+    @classmethod
+    def get(cls, product_id: str) -> Optional['TradingPair']:
+        return cls._registry.get(product_id)
+
+    @classmethod
+    def values(cls) -> Collection[str]:
+        return tuple(cls._registry)
+
+    @property
+    def value(self) -> str:
+        return self._value
+
+    @property
+    def price_decimals(self) -> int:
+        """
+        Number of decimal places of the quote increment, i.e. the tick size of the price on Coinbase.
+        """
+        return self._price_decimals
+
+    @property
+    def size_decimals(self) -> int:
+        """
+        Number of decimal places of the base increment, i.e. the smallest size that can be traded on Coinbase.
+        """
+        return self._size_decimals
+
+    def __reduce__(self):
+        # Registers the product in the process it is sent to, such as a worker process
+        return TradingPair.register, (self._value, self._price_decimals, self._size_decimals)
+
+    def __copy__(self) -> 'TradingPair':
+        return self
+
+    def __deepcopy__(self, memo) -> 'TradingPair':
+        return self
+
+    def __str__(self) -> str:
+        return self._value
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+TradingPair.BTC_USD = TradingPair.register('BTC-USD', price_decimals=2, size_decimals=8)
+TradingPair.ETH_USD = TradingPair.register('ETH-USD', price_decimals=2, size_decimals=8)
+TradingPair.ETH_BTC = TradingPair.register('ETH-BTC', price_decimals=5, size_decimals=8)
 
 
 @total_ordering
@@ -21,12 +120,12 @@ class TradingPoint(ABC):
 
     @property
     @abstractmethod
-    def quantity(self) -> Decimal:
+    def quantity(self) -> Number:
         pass
 
     @property
     @abstractmethod
-    def price(self) -> Decimal:
+    def price(self) -> Number:
         pass
 
     @property
@@ -34,5 +133,40 @@ class TradingPoint(ABC):
     def sequence(self) -> int:
         pass
 
+    @property
+    @abstractmethod
+    def time(self) -> datetime:
+        pass
+
     def __lt__(self, other: 'TradingPoint') -> bool:
         return self.sequence < other.sequence
+
+
+class Point(TradingPoint):
+
+    def __init__(self, pair: TradingPair, quantity: Number, price: Number, sequence: int, time: datetime):
+        self._pair = pair
+        self._quantity = quantity
+        self._price = price
+        self._sequence = sequence
+        self._time = time
+
+    @property
+    def pair(self) -> TradingPair:
+        return self._pair
+
+    @property
+    def quantity(self) -> Number:
+        return self._quantity
+
+    @property
+    def price(self) -> Number:
+        return self._price
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    @property
+    def time(self) -> datetime:
+        return self._time
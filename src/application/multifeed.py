@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import queue
+import sys
+from datetime import datetime, timezone
+from logging import getLogger
+from multiprocessing.process import BaseProcess
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from application.adapters import FeedAdapter
+from application.coinbase.adapter import WEBSOCKET_URI, CoinbaseAdapter
+from application.coinbase.products import parse_products
+from application.connections import keep_connected
+from application.errors import FeedError, SchemaValidationError
+from application.model import TradingPair, TradingPoint
+from application.numeric import DECIMAL, FIXED_POINT, NumericBackend
+from application.output import Emit, OutputFormat, OutputSink, Update
+from application.venues import VenueWindows
+
+logger = getLogger(__name__)
+
+# Trades of a venue, or `None` when it opened a new connection
+Entry = Tuple[str, Optional[List[TradingPoint]]]
+
+Put = Callable[[str, Optional[List[TradingPoint]]], Awaitable]
+
+# How long the reader of the source processes waits for trades before checking that they are still alive, in seconds
+WATCH_INTERVAL = 1.0
+
+# How often the time windows are rid of the trades older than them, in seconds, so that those of a pair or a venue
+# that went quiet do not hold on to stale trades
+TIMER_INTERVAL = 1.0
+
+# How long a stopping source process has to exit before it is terminated, in seconds
+STOP_TIMEOUT = 5.0
+
+
+async def run_adapter(
+        adapter: FeedAdapter,
+        trading_pairs: Sequence[TradingPair],
+        put: Put,
+        backend: NumericBackend = DECIMAL,
+        reconnect_delay=0.1,
+        max_reconnect_delay=10.0
+):
+    """
+    Listens to the feed of a venue and puts the trades of every frame, along with the venue, after putting `None`
+    whenever a connection is opened. Like the feed, it opens the connection again whenever it drops or the venue sends
+    an error, after a delay with jitter that grows while connections keep dropping. Frames that fail to decode are
+    skipped.
+    """
+    async def listen(connection, _dropped_at: Optional[float]):
+        await put(adapter.venue, None)
+        await adapter.subscribe(connection, trading_pairs)
+        while True:
+            raw_message = await connection.recv()
+            try:
+                message = adapter.decode(raw_message, backend)
+            except (SchemaValidationError, ValueError) as e:
+                logger.warning(f'{adapter.venue}: skipped an invalid frame: {e}: {raw_message}')
+                continue
+            if isinstance(message, TradingPoint):
+                await put(adapter.venue, [message])
+            elif message is not None:
+                failure = adapter.failure(message)
+                if failure:
+                    raise FeedError(failure)
+
+    await keep_connected(adapter.connect, listen, adapter.venue, reconnect_delay, max_reconnect_delay)
+
+
+def run_source(
+        adapter: FeedAdapter,
+        trading_pairs: Sequence[TradingPair],
+        output,
+        backend: NumericBackend = DECIMAL,
+        reconnect_delay=0.1,
+        max_reconnect_delay=10.0
+):
+    """
+    Entry point of a source process, which listens to the feed of a venue and puts its trades into the `output` queue,
+    in lists of the entries decoded while the previous list was being sent.
+    """
+    async def forward():
+        entries: asyncio.Queue = asyncio.Queue()
+        source = asyncio.ensure_future(run_adapter(
+            adapter, trading_pairs, lambda venue, points: entries.put((venue, points)), backend, reconnect_delay,
+            max_reconnect_delay
+        ))
+        try:
+            while True:
+                output.put(await _drain(entries))
+        finally:
+            source.cancel()
+
+    asyncio.run(forward())
+
+
+async def _drain(entries: asyncio.Queue) -> List[Entry]:
+    """
+    Waits for the next entry, and then takes out every entry already queued.
+    """
+    batch = [await entries.get()]
+    while not entries.empty():
+        batch.append(entries.get_nowait())
+    return batch
+
+
+class MultiFeed:
+    """
+    Ingests the trades of several venues at once into `VenueWindows`, and emits their per-venue and consolidated VWAPs.
+
+    Every adapter listens to its venue in a task of its own on the event loop, or, with `processes`, in a process of
+    its own, which then also decodes its frames, so that decoding scales with cores. Either way, trades are merged
+    through a single queue, from which one consumer takes batches of whatever arrived meanwhile, so that the windows
+    are only ever updated from one place and adding a venue adds no work per trade. Source processes that exit are
+    restarted. Every `timer_interval`, the time windows are expired against the wall clock on the event loop too.
+    """
+
+    def __init__(
+            self,
+            adapters: Sequence[FeedAdapter],
+            trading_pairs: Sequence[TradingPair],
+            windows: VenueWindows,
+            emit: Emit,
+            backend: NumericBackend = DECIMAL,
+            processes=False,
+            reconnect_delay=0.1,
+            max_reconnect_delay=10.0,
+            timer_interval=TIMER_INTERVAL,
+            context=None
+    ):
+        venues = [i.venue for i in adapters]
+        if not venues:
+            raise ValueError('At least one adapter is required')
+        if len(set(venues)) < len(venues):
+            raise ValueError(f'Venues must be unique: {venues}')
+
+        self._adapters = tuple(adapters)
+        self._trading_pairs = tuple(trading_pairs)
+        self._windows = windows
+        self._emit = emit
+        self._backend = backend
+        self._processes = processes
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._timer_interval = timer_interval
+        self._context = context or multiprocessing.get_context()
+        self._output = self._context.Queue() if processes else None
+        self._sources: Dict[str, BaseProcess] = {}
+
+    @property
+    def windows(self) -> VenueWindows:
+        return self._windows
+
+    async def run(self):
+        entries: asyncio.Queue = asyncio.Queue()
+        if self._processes:
+            for adapter in self._adapters:
+                self._start(adapter)
+            sources = [asyncio.ensure_future(self._read(entries))]
+        else:
+            sources = [
+                asyncio.ensure_future(run_adapter(
+                    i, self._trading_pairs, lambda venue, points: entries.put((venue, points)), self._backend,
+                    self._reconnect_delay, self._max_reconnect_delay
+                ))
+                for i in self._adapters
+            ]
+        consumer = asyncio.ensure_future(self._consume(entries))
+        timer = asyncio.ensure_future(self._run_timer())
+
+        tasks = [consumer, timer, *sources]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._stop()
+
+    def merge(self, entries: Sequence[Entry]) -> List[Update]:
+        """
+        Processes the trades of a batch of entries, one batch per venue, and returns the updates of every window that
+        changed. A venue that opened a new connection has the trades it sent before processed first.
+        """
+        updates: List[Update] = []
+        pending: Dict[str, List[TradingPoint]] = {}
+        for venue, points in entries:
+            if points is None:
+                if venue in pending:
+                    updates.extend(self._windows.process(venue, pending.pop(venue)))
+                self._windows.reconnect(venue)
+            else:
+                pending.setdefault(venue, []).extend(points)
+
+        for venue, points in pending.items():
+            updates.extend(self._windows.process(venue, points))
+        return updates
+
+    async def _consume(self, entries: asyncio.Queue):
+        while True:
+            updates = self.merge(await _drain(entries))
+            if updates:
+                self._emit(updates)
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self._timer_interval)
+            updates = self._windows.expire(datetime.now(timezone.utc))
+            if updates:
+                self._emit(updates)
+
+    async def _read(self, entries: asyncio.Queue):
+        """
+        Moves the entries of the source processes into the queue of the consumer, and restarts the processes that
+        exited whenever none arrived for a while.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                batch = await loop.run_in_executor(None, self._output.get, True, WATCH_INTERVAL)
+            except queue.Empty:
+                self._watch()
+                continue
+            for entry in batch:
+                entries.put_nowait(entry)
+
+    def _start(self, adapter: FeedAdapter):
+        process = self._context.Process(
+            target=run_source,
+            args=(
+                adapter, self._trading_pairs, self._output, self._backend, self._reconnect_delay,
+                self._max_reconnect_delay
+            ),
+            name=adapter.venue,
+            daemon=True,
+        )
+        process.start()
+        self._sources[adapter.venue] = process
+        logger.info(f'Started the source of {adapter.venue} (pid {process.pid})')
+
+    def _watch(self):
+        for adapter in self._adapters:
+            process = self._sources[adapter.venue]
+            if not process.is_alive():
+                logger.warning(f'The source of {adapter.venue} exited with code {process.exitcode}, restarting it…')
+                self._start(adapter)
+
+    def _stop(self):
+        for process in self._sources.values():
+            process.terminate()
+            process.join(STOP_TIMEOUT)
+        self._sources = {}
+
+
+def parse_source(text: str) -> CoinbaseAdapter:
+    """
+    Adapter of a source given as a venue name, optionally followed by the URI of a server that speaks the Coinbase
+    protocol, such as `sandbox=wss://ws-feed-public.sandbox.exchange.coinbase.com`.
+    """
+    venue, _, uri = text.partition('=')
+    if not venue:
+        raise ValueError(f'Invalid source: {text}')
+    return CoinbaseAdapter(uri or WEBSOCKET_URI, venue=venue)
+
+
+def main():
+    logging.getLogger().setLevel(logging.INFO)
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stderr))
+
+    parser = argparse.ArgumentParser(description='Real-time per-venue and consolidated VWAPs from several feeds')
+    parser.add_argument(
+        '--source', action='append', metavar='VENUE[=URI]',
+        help='listen to this venue, at a URI speaking the Coinbase protocol if given; repeat it for every venue'
+    )
+    parser.add_argument(
+        '--products', metavar='LIST', default='BTC-USD,ETH-USD,ETH-BTC',
+        help='subscribe to these products, e.g. BTC-USD,DOGE-USD:4:1 with the decimal places of new ones, or all'
+    )
+    parser.add_argument(
+        '--processes', action='store_true',
+        help='listen to and decode every venue on a process of its own, instead of on the event loop'
+    )
+    parser.add_argument('--output-format', choices=OutputFormat.values(), default=OutputFormat.TEXT.value)
+    parser.add_argument(
+        '--output-interval', type=float, default=0.0, metavar='SECONDS',
+        help='write the VWAP of each window at most once per interval'
+    )
+    args = parser.parse_args()
+
+    try:
+        adapters = [parse_source(i) for i in args.source or ('coinbase',)]
+        trading_pairs = parse_products(args.products)
+    except (ValueError, KeyError) as e:
+        parser.error(str(e))
+
+    output = OutputSink(sys.stdout, OutputFormat(args.output_format), interval=args.output_interval)
+    try:
+        multifeed = MultiFeed(
+            adapters, trading_pairs, VenueWindows(trading_pairs, backend=FIXED_POINT), output.emit,
+            backend=FIXED_POINT, processes=args.processes
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        asyncio.run(multifeed.run())
+    finally:
+        output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+from application.enum import TextEnum
+from application.model import TradingPair
+from application.numeric import Number
+
+
+class Update(NamedTuple):
+    """
+    New VWAP of a window of a trading pair, such as the last `200` points or the last `300s`.
+    """
+
+    pair: TradingPair
+    window: str
+    value: Number
+
+    @property
+    def name(self) -> str:
+        return f'VWAP[{self.pair}/{self.window}]'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.value}'
+
+    def to_record(self) -> dict:
+        """
+        JSON record of the update, stamped with the current time, with the VWAP as a string so as not to lose precision.
+        """
+        return {
+            'pair': self.pair.value,
+            'window': self.window,
+            'vwap': str(self.value),
+            'time': datetime.now(timezone.utc).isoformat(),
+        }
+
+
+Emit = Callable[[Sequence[Update]], None]
+
+
+def broadcast(*emitters: Emit) -> Emit:
+    """
+    Sends every batch of updates to each of the emitters, in order.
+    """
+    def emit(updates: Sequence[Update]):
+        for emitter in emitters:
+            emitter(updates)
+    return emit
+
+
+class OutputFormat(TextEnum):
+    TEXT = 'text'
+    NDJSON = 'ndjson'
+
+
+class OutputSink:
+    """
+    Writes VWAP updates from a background thread, so that the hot path only records the latest value of each window.
+
+    Updates are conflated per window: the writer wakes up at most once per `interval` seconds, and writes the latest
+    value of each window that changed since, if it moved by more than `threshold` (relative to the last value written)
+    when set. Whatever the trade rate, it then writes at most one line per window per interval.
+    """
+
+    def __init__(
+            self,
+            stream: TextIO,
+            output_format: OutputFormat = OutputFormat.TEXT,
+            interval: float = 0.0,
+            threshold: Optional[float] = None
+    ):
+        if interval < 0:
+            raise ValueError(f'Interval must not be negative: {interval}')
+        if threshold is not None and threshold < 0:
+            raise ValueError(f'Threshold must not be negative: {threshold}')
+
+        self._stream = stream
+        self._format = output_format
+        self._interval = interval
+        self._threshold = threshold
+        self._pending: Dict[Tuple[TradingPair, str], Update] = {}
+        self._written: Dict[Tuple[TradingPair, str], Number] = {}
+        self._condition = threading.Condition()
+        self._writing = False
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_forever, name='output', daemon=True)
+        self._writer.start()
+
+    def emit(self, updates: Sequence[Update]):
+        with self._condition:
+            for update in updates:
+                self._pending[update.pair, update.window] = update
+            if not self._interval:
+                self._condition.notify()
+
+    def flush(self):
+        """
+        Waits until the pending updates are written.
+        """
+        with self._condition:
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: not (self._pending or self._writing) or not self._writer.is_alive())
+
+    def close(self):
+        """
+        Writes the pending updates and stops the writer.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer.join()
+
+    def _write_forever(self):
+        while True:
+            with self._condition:
+                if not self._closed:
+                    if self._interval:
+                        self._condition.wait(self._interval)
+                    else:
+                        self._condition.wait_for(lambda: self._pending or self._closed)
+                pending, self._pending = self._pending, {}
+                closed = self._closed
+                self._writing = True
+
+            try:
+                self._write(pending.values())
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+            if closed:
+                return
+
+    def _write(self, updates):
+        lines = []
+        for update in updates:
+            key = update.pair, update.window
+            if key in self._written and not self._moved(self._written[key], update.value):
+                continue
+            self._written[key] = update.value
+            lines.append(self._format_update(update))
+
+        if lines:
+            self._stream.write(''.join(lines))
+            self._stream.flush()
+
+    def _moved(self, previous: Number, current: Number) -> bool:
+        if self._threshold is None:
+            return current != previous
+        return abs(float(current) - float(previous)) > self._threshold * abs(float(previous))
+
+    def _format_update(self, update: Update) -> str:
+        if self._format == OutputFormat.NDJSON:
+            return json.dumps(update.to_record()) + '\n'
+        return f'{update}\n'
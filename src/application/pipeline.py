@@ -0,0 +1,180 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+from application.enum import TextEnum
+
+
+class OverflowPolicy(TextEnum):
+    """
+    What a full `FrameQueue` does with a new frame.
+
+    - `block`: the producer waits until there is room, which pushes back on the connection.
+    - `drop-oldest`: the oldest queued frame of the same key is dropped to make room.
+    - `conflate`: every queued frame of the same key is dropped, so that only the newest one is left.
+
+    When no frame of the same key is queued, both lossy policies drop the oldest frame of the queue.
+    """
+
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop-oldest'
+    CONFLATE = 'conflate'
+
+
+class _Entry:
+    __slots__ = ('key', 'frame', 'received_at', 'dropped')
+
+    def __init__(self, key: Hashable, frame: str, received_at: float):
+        self.key = key
+        self.frame = frame
+        self.received_at = received_at
+        self.dropped = False
+
+
+class FrameQueue:
+    """
+    Bounded FIFO queue of raw frames between the task that reads them from a connection and the task that processes
+    them, so that a slow computation does not stall reads.
+
+    Frames are grouped by `key` (such as their trading pair) for the lossy overflow policies. A dropped frame is only
+    marked as such, and skipped when it reaches the head of the queue or when dropped frames take as much room as the
+    queued ones, so that dropping is O(1) amortized.
+
+    It must be created and used from within the same running event loop.
+    """
+
+    def __init__(
+            self,
+            capacity: int,
+            policy: OverflowPolicy = OverflowPolicy.BLOCK,
+            key: Callable[[str], Hashable] = lambda frame: None
+    ):
+        if capacity < 1:
+            raise ValueError(f'Capacity must be at least 1: {capacity}')
+
+        self._capacity = capacity
+        self._policy = policy
+        self._key = key
+        self._entries: Deque[_Entry] = deque()
+        self._entries_by_key: Dict[Hashable, Deque[_Entry]] = defaultdict(deque)
+        self._depth = 0
+        self._dropped = 0
+        self._lag = 0.0
+        self._closed = False
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def policy(self) -> OverflowPolicy:
+        return self._policy
+
+    @property
+    def depth(self) -> int:
+        """
+        How many frames are queued.
+        """
+        return self._depth
+
+    @property
+    def dropped(self) -> int:
+        """
+        How many frames were dropped by the overflow policy.
+        """
+        return self._dropped
+
+    @property
+    def lag(self) -> float:
+        """
+        How long the oldest frame of the last batch taken waited in the queue, in seconds.
+        """
+        return self._lag
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def put(self, frame: str):
+        if self._closed:
+            raise RuntimeError('Queue is closed')
+
+        key = self._key(frame)
+        if self._depth >= self._capacity:
+            if self._policy == OverflowPolicy.BLOCK:
+                while self._depth >= self._capacity:
+                    self._not_full.clear()
+                    await self._not_full.wait()
+            elif self._policy == OverflowPolicy.CONFLATE and self._entries_by_key.get(key):
+                while self._entries_by_key[key]:
+                    self._drop(self._entries_by_key[key].popleft())
+            else:
+                self._drop_oldest(key)
+
+        if len(self._entries) >= 2 * self._capacity:
+            self._entries = deque(i for i in self._entries if not i.dropped)
+
+        entry = _Entry(key, frame, time.monotonic())
+        self._entries.append(entry)
+        self._entries_by_key[key].append(entry)
+        self._depth += 1
+        self._not_empty.set()
+
+    async def get_batch(self, max_size: int) -> List[str]:
+        """
+        Waits until there is a frame, and then takes up to `max_size` queued frames, oldest first. Returns an empty
+        batch once the queue is closed and empty.
+        """
+        while not self._depth:
+            if self._closed:
+                return []
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        batch = []
+        entries = self._entries
+        oldest: Optional[_Entry] = None
+        while entries and len(batch) < max_size:
+            entry = entries.popleft()
+            if entry.dropped:
+                continue
+            self._entries_by_key[entry.key].popleft()
+            batch.append(entry.frame)
+            oldest = oldest or entry
+
+        self._depth -= len(batch)
+        self._lag = time.monotonic() - oldest.received_at
+        self._not_full.set()
+        return batch
+
+    def close(self):
+        """
+        Stops accepting frames. The frames already queued can still be taken.
+        """
+        self._closed = True
+        self._not_empty.set()
+
+    def _drop_oldest(self, key: Hashable):
+        entries = self._entries_by_key.get(key)
+        if entries:
+            self._drop(entries.popleft())
+            return
+
+        while self._entries[0].dropped:
+            self._entries.popleft()
+        entry = self._entries[0]
+        self._entries_by_key[entry.key].popleft()
+        self._drop(entry)
+
+    def _drop(self, entry: _Entry):
+        entry.dropped = True
+        entry.frame = ''
+        self._depth -= 1
+        self._dropped += 1
+
+    def __len__(self) -> int:
+        return self._depth
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import struct
+import threading
+from logging import getLogger
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+from application.output import Update
+
+logger = getLogger(__name__)
+
+# Every frame is a JSON object prefixed with its length in bytes, as an unsigned 32-bit big-endian integer
+FRAME_HEADER = struct.Struct('>I')
+
+# Frames sent by clients longer than this are rejected, and the client disconnected
+MAX_CLIENT_FRAME = 64 * 1024
+
+# Subscribes to every trading pair
+ALL_PAIRS = '*'
+
+_Key = Tuple[str, str]
+
+# Key of the acknowledgement of the subscriptions of a client in its queue
+_SUBSCRIPTIONS: _Key = ('', 'subscriptions')
+
+
+def encode_frame(payload: dict) -> bytes:
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader, max_size: Optional[int] = None) -> dict:
+    """
+    Reads the next frame, raising `asyncio.IncompleteReadError` once the connection is closed.
+    """
+    (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if max_size is not None and size > max_size:
+        raise ValueError(f'Frame too long: {size} bytes')
+    return json.loads(await reader.readexactly(size))
+
+
+class _Client:
+    __slots__ = ('writer', 'pairs', 'pending', 'ready', 'sender', 'conflated')
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.pairs: Set[str] = set()
+        self.pending: Dict[_Key, bytes] = {}
+        self.ready = asyncio.Event()
+        self.sender: Optional[asyncio.Future] = None
+        self.conflated = 0
+
+    def enqueue(self, key: _Key, frame: bytes):
+        if key in self.pending:
+            self.conflated += 1
+        self.pending[key] = frame
+        self.ready.set()
+
+
+class Publisher:
+    """
+    Pushes the VWAP updates to the clients of a TCP server, as length-prefixed JSON frames, on the event loop of the
+    feed.
+
+    A client subscribes to trading pairs by sending `{"type": "subscribe", "product_ids": ["BTC-USD"]}`, or `["*"]`
+    for all of them, and unsubscribes likewise with `"type": "unsubscribe"`. It then gets its current subscriptions,
+    as `{"type": "subscriptions", "product_ids": [...]}`, the latest value of every window of the new pairs, and every
+    update from then on.
+
+    Every update is serialized once, and the same bytes are queued for each subscriber of its trading pair. Each client
+    has its own sender task, and its queue only keeps the latest frame of each window, so that a slow client gets the
+    latest values whenever it catches up, rather than a growing backlog, without holding up the others.
+    """
+
+    def __init__(self, host='127.0.0.1', port=9200):
+        self._host = host
+        self._port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[int] = None
+        self._clients: Set[_Client] = set()
+        self._subscribers: Dict[str, Set[_Client]] = {}
+        self._latest: Dict[_Key, bytes] = {}
+        self._published = 0
+        self._conflated = 0
+
+    @property
+    def port(self) -> int:
+        """
+        Port the server listens to, which is chosen by the system when started with port `0`.
+        """
+        if self._server:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    @property
+    def published(self) -> int:
+        """
+        How many updates were published, each of them once whatever the number of subscribers.
+        """
+        return self._published
+
+    @property
+    def conflated(self) -> int:
+        """
+        How many frames were replaced by a newer one of the same window before a client could take them.
+        """
+        return self._conflated + sum(i.conflated for i in self._clients)
+
+    async def start(self):
+        self._loop = asyncio.get_event_loop()
+        self._thread = threading.get_ident()
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        logger.info(f'Publishing VWAP updates at tcp://{self._host}:{self.port}')
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for client in list(self._clients):
+            client.writer.close()
+            if client.sender:
+                client.sender.cancel()
+
+    def emit(self, updates: Sequence[Update]):
+        """
+        Publishes a batch of updates, from any thread.
+        """
+        if self._loop is None:
+            return
+        if threading.get_ident() == self._thread:
+            self.publish(updates)
+        else:
+            self._loop.call_soon_threadsafe(self.publish, updates)
+
+    def publish(self, updates: Sequence[Update]):
+        """
+        Publishes a batch of updates, from the event loop.
+        """
+        subscribers = self._subscribers
+        everyone = subscribers.get(ALL_PAIRS, ())
+        for update in updates:
+            pair = update.pair.value
+            key = pair, update.window
+            frame = encode_frame(update.to_record())
+            self._latest[key] = frame
+            self._published += 1
+
+            for client in subscribers.get(pair, ()):
+                client.enqueue(key, frame)
+            for client in everyone:
+                if pair not in client.pairs:
+                    client.enqueue(key, frame)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(writer)
+        client.sender = asyncio.ensure_future(self._send(client))
+        self._clients.add(client)
+        try:
+            while True:
+                self._receive(client, await read_frame(reader, MAX_CLIENT_FRAME))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f'Disconnecting a publisher client after an invalid frame => {e!r}')
+        finally:
+            self._disconnect(client)
+
+    def _receive(self, client: _Client, message: dict):
+        product_ids = [str(i) for i in message['product_ids']]
+        if message['type'] == 'subscribe':
+            for pair in product_ids:
+                client.pairs.add(pair)
+                self._subscribers.setdefault(pair, set()).add(client)
+        elif message['type'] == 'unsubscribe':
+            for pair in product_ids:
+                client.pairs.discard(pair)
+                self._subscribers.get(pair, set()).discard(client)
+        else:
+            raise ValueError(f'Unknown message type: {message["type"]}')
+
+        client.enqueue(_SUBSCRIPTIONS, encode_frame({'type': 'subscriptions', 'product_ids': sorted(client.pairs)}))
+        if message['type'] == 'subscribe':
+            for key, frame in self._latest.items():
+                if key[0] in product_ids or ALL_PAIRS in product_ids:
+                    client.enqueue(key, frame)
+
+    async def _send(self, client: _Client):
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                frames, client.pending = client.pending, {}
+                client.writer.write(b''.join(frames.values()))
+                await client.writer.drain()
+        except ConnectionError:
+            client.writer.close()
+
+    def _disconnect(self, client: _Client):
+        self._clients.discard(client)
+        self._conflated += client.conflated
+        for pair in client.pairs:
+            self._subscribers.get(pair, set()).discard(client)
+        client.sender.cancel()
+        client.writer.close()
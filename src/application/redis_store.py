@@ -0,0 +1,263 @@
+from typing import Collection, Iterable, List, Sequence, Tuple
+
+from application.model import Point, TradingPair, TradingPoint
+from application.numeric import DECIMAL, Number, NumericBackend
+from application.store import from_epoch_nanoseconds, to_epoch_nanoseconds
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+# Products of a price and a size can outgrow the 64-bit integers of Redis, and so can the sum of their high bits, so
+# their sum is kept in three fields: the low, middle and high 32 bits of every product. Each field stays well within
+# 64 bits for any window size, as long as products fit in 96 bits. The sum of the sizes fits in a single field, up to
+# 2^63 units of the base increment, such as 92 billion BTC.
+_LIMB_BITS = 32
+
+_LIMB_MASK = (1 << _LIMB_BITS) - 1
+
+_PRICE_SIZE_FIELDS = ('price_size_low', 'price_size_mid', 'price_size_high')
+
+# Adds a batch of points to the sorted set, skipping the sequences it already holds, as scores, whatever the rest of
+# their members, evicts the oldest points beyond the capacity, and updates the sums by what was added and evicted,
+# atomically. Members are `sequence:price:size:time:price_size_low:price_size_mid:price_size_high`, and the sums are
+# only ever changed by the integers they carry as strings, because Lua numbers are doubles. Sequences are far below
+# 2^53, so their scores are exact.
+ADD_POINTS = '''
+local points, sums = KEYS[1], KEYS[2]
+local capacity = tonumber(ARGV[1])
+local added = 0
+
+for i = 2, #ARGV, 6 do
+    if redis.call('ZCOUNT', points, ARGV[i], ARGV[i]) == 0 then
+        redis.call('ZADD', points, ARGV[i], ARGV[i + 1])
+        added = added + 1
+        redis.call('HINCRBY', sums, 'size', ARGV[i + 2])
+        redis.call('HINCRBY', sums, 'price_size_low', ARGV[i + 3])
+        redis.call('HINCRBY', sums, 'price_size_mid', ARGV[i + 4])
+        redis.call('HINCRBY', sums, 'price_size_high', ARGV[i + 5])
+    end
+end
+
+local evicted = 0
+local excess = redis.call('ZCARD', points) - capacity
+if excess > 0 then
+    local popped = redis.call('ZPOPMIN', points, excess)
+    for i = 1, #popped, 2 do
+        local size, low, mid, high = string.match(popped[i], '^[^:]*:[^:]*:([^:]*):[^:]*:([^:]*):([^:]*):([^:]*)$')
+        local fields = {size = size, price_size_low = low, price_size_mid = mid, price_size_high = high}
+        for field, value in pairs(fields) do
+            if value ~= '0' then
+                redis.call('HINCRBY', sums, field, '-' .. value)
+            end
+        end
+        evicted = evicted + 1
+    end
+end
+
+return {added, evicted}
+'''
+
+
+class RedisPointStore:
+    """
+    Retains the latest `capacity` points of a trading pair in a Redis sorted set scored by sequence, along with the
+    sums of their sizes and price·sizes in a hash, so that several stateless feed replicas can share the same windows.
+
+    A batch of points is added, trimmed and summed by one Lua script, in one round trip and atomically, so that
+    replicas adding the same trades concurrently count each of them once. The VWAP of all retained points comes from
+    the sums, and the VWAP of a shorter window from the newest points of the sorted set. Prices and sizes are scaled to
+    integers using the tick sizes of the trading pair, as in `PointStore`. The stores of several trading pairs that
+    share a client are added to, and read, in one round trip for all of them with `add_batches` and `read_vwaps`.
+
+    It answers the same calls as `PointStore`, which remains the default store.
+    """
+
+    def __init__(
+            self,
+            trading_pair: TradingPair,
+            client,
+            capacity=10000,
+            backend: NumericBackend = DECIMAL,
+            prefix='vwap'
+    ):
+        self._trading_pair = trading_pair
+        self._client = client
+        self._capacity = capacity
+        self._backend = backend
+        self._points_key = f'{prefix}:{trading_pair}:points'
+        self._sums_key = f'{prefix}:{trading_pair}:sums'
+        self._add_points = client.register_script(ADD_POINTS)
+        self._evicted = 0
+
+    @classmethod
+    def connect(cls, url: str, max_connections=4):
+        """
+        Redis client with a connection pool, shared by the stores of every trading pair.
+        """
+        if redis is None:
+            raise ImportError('The Redis store requires the redis package: pip install redis')
+        return redis.Redis(connection_pool=redis.ConnectionPool.from_url(url, max_connections=max_connections))
+
+    @property
+    def trading_pair(self) -> TradingPair:
+        return self._trading_pair
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def evicted(self) -> int:
+        """
+        How many points this replica evicted to make room for newer ones.
+        """
+        return self._evicted
+
+    def supports(self, point: TradingPoint) -> bool:
+        return self._trading_pair == point.pair
+
+    def add(self, point: TradingPoint):
+        self.add_many((point,))
+
+    def add_many(self, points: Iterable[TradingPoint]):
+        add_batches(((self, points),))
+
+    def _arguments(self, points: Iterable[TradingPoint]) -> List:
+        arguments: List = [self._capacity]
+        for point in points:
+            if point.pair != self._trading_pair:
+                raise ValueError(f'Unsupported trading pair: {point.pair}')
+
+            sequence = point.sequence
+            price = self._backend.to_fixed_point(point.price, self._trading_pair.price_decimals)
+            size = self._backend.to_fixed_point(point.quantity, self._trading_pair.size_decimals)
+            limbs = _limbs(price * size)
+            member = ':'.join(str(i) for i in (sequence, price, size, to_epoch_nanoseconds(point.time), *limbs))
+            arguments.extend((sequence, member, size, *limbs))
+        return arguments
+
+    def vwap(self, size: int) -> Number:
+        """
+        VWAP of the last `size` points, or of all retained points if there are fewer than `size`.
+        """
+        return self.vwaps((size,))[0]
+
+    def vwaps(self, sizes: Sequence[int]) -> List[Number]:
+        """
+        VWAPs of the last `size` points for every size, in one round trip.
+        """
+        return read_vwaps((self,), sizes)[0]
+
+    def _queue_vwaps(self, pipeline, sizes: Sequence[int]) -> int:
+        """
+        Queues the reads of the VWAPs into a pipeline, and returns how many replies they take.
+        """
+        for size in sizes:
+            if not 0 < size <= self._capacity:
+                raise ValueError(f'Window size must be between 1 and {self._capacity}: {size}')
+
+        longest_partial = max((i for i in sizes if i < self._capacity), default=0)
+        pipeline.zcard(self._points_key)
+        pipeline.hmget(self._sums_key, 'size', *_PRICE_SIZE_FIELDS)
+        if longest_partial:
+            pipeline.zrange(self._points_key, -longest_partial, -1)
+            return 3
+        return 2
+
+    def _vwaps(self, replies: Sequence, sizes: Sequence[int]) -> List[Number]:
+        count, sums, *newest = replies
+        size_sum, *limbs = (int(i or 0) for i in sums)
+        total = (size_sum, sum(limb << (_LIMB_BITS * i) for i, limb in enumerate(limbs)))
+
+        # Sums of the newest points, from the newest one backwards
+        partial: List[Tuple[int, int]] = []
+        if newest:
+            size_sum = price_size_sum = 0
+            for member in reversed(newest[0]):
+                _, price, size, *_ = _fields(member)
+                size_sum += size
+                price_size_sum += price * size
+                partial.append((size_sum, price_size_sum))
+
+        return [self._vwap(*(total if size >= int(count) else partial[size - 1])) for size in sizes]
+
+    @property
+    def points(self) -> Collection[TradingPoint]:
+        return tuple(self._point(i) for i in self._client.zrange(self._points_key, 0, -1))
+
+    def clear(self):
+        self._client.delete(self._points_key, self._sums_key)
+
+    def _vwap(self, size_sum: int, price_size_sum: int) -> Number:
+        price_decimals = self._trading_pair.price_decimals
+        size_decimals = self._trading_pair.size_decimals
+        return self._backend.vwap(
+            self._backend.from_fixed_point(price_size_sum, price_decimals + size_decimals),
+            self._backend.from_fixed_point(size_sum, size_decimals),
+            price_decimals
+        )
+
+    def _point(self, member) -> TradingPoint:
+        sequence, price, size, time, *_ = _fields(member)
+        return Point(
+            pair=self._trading_pair,
+            quantity=self._backend.from_fixed_point(size, self._trading_pair.size_decimals),
+            price=self._backend.from_fixed_point(price, self._trading_pair.price_decimals),
+            sequence=sequence,
+            time=from_epoch_nanoseconds(time),
+        )
+
+    def __len__(self) -> int:
+        return int(self._client.zcard(self._points_key))
+
+    def __str__(self) -> str:
+        return f'RedisPointStore[{self._trading_pair}]'
+
+
+def add_batches(batches: Iterable[Tuple[RedisPointStore, Iterable[TradingPoint]]]):
+    """
+    Adds a batch of points to each store, where the stores share a client, with the scripts of every store run in one
+    pipelined round trip.
+    """
+    calls = [(store, store._arguments(points)) for store, points in batches]
+    calls = [(store, arguments) for store, arguments in calls if len(arguments) > 1]
+    if not calls:
+        return
+
+    pipeline = calls[0][0]._client.pipeline(transaction=False)
+    for store, arguments in calls:
+        store._add_points(keys=(store._points_key, store._sums_key), args=arguments, client=pipeline)
+    for (store, _), (_, evicted) in zip(calls, pipeline.execute()):
+        store._evicted += int(evicted)
+
+
+def read_vwaps(stores: Sequence[RedisPointStore], sizes: Sequence[int]) -> List[List[Number]]:
+    """
+    VWAPs of the last `size` points for every size of each store, where the stores share a client, in one round trip
+    for all of them.
+    """
+    if not stores:
+        return []
+
+    pipeline = stores[0]._client.pipeline(transaction=True)
+    counts = [store._queue_vwaps(pipeline, sizes) for store in stores]
+    replies = pipeline.execute()
+
+    vwaps = []
+    start = 0
+    for store, count in zip(stores, counts):
+        vwaps.append(store._vwaps(replies[start:start + count], sizes))
+        start += count
+    return vwaps
+
+
+def _limbs(price_size: int) -> Tuple[int, int, int]:
+    return price_size & _LIMB_MASK, (price_size >> _LIMB_BITS) & _LIMB_MASK, price_size >> (2 * _LIMB_BITS)
+
+
+def _fields(member) -> Tuple[int, ...]:
+    if isinstance(member, bytes):
+        member = member.decode('ascii')
+    return tuple(int(i) for i in member.split(':'))
@@ -0,0 +1,96 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Collection, Iterable, List, Optional
+
+from application.model import TradingPair, TradingPoint
+
+
+class ReorderBuffer:
+    """
+    Holds the points of a trading pair until a watermark passes them, and then releases them in sequence order, so that
+    the windows behind it only ever append a point and evict their oldest one.
+
+    The watermark is `delay` before the time of the newest point added, or before `now` when later: a point is held
+    until then, which bounds its latency to `delay` even when the pair goes quiet, provided `release` is called
+    periodically with `now` meanwhile. When more than `capacity` points are held, the oldest ones are released
+    regardless. A point whose sequence is not newer than the last point released is too late to be put in order, and is
+    discarded and counted. The delay trades latency for lateness: the longer it is, the later a point can arrive and
+    still be put in order.
+
+    Points are kept in a min-heap ordered by sequence, so that adding and releasing a point are O(log n).
+    """
+
+    def __init__(self, trading_pair: TradingPair, delay: timedelta, capacity=10000):
+        if capacity < 1:
+            raise ValueError(f'Capacity must be at least 1: {capacity}')
+
+        self._trading_pair = trading_pair
+        self._delay = delay
+        self._capacity = capacity
+        self._points: List[TradingPoint] = []
+        self._newest_time: Optional[datetime] = None
+        self._released_sequence: Optional[int] = None
+        self._discarded = 0
+
+    @property
+    def trading_pair(self) -> TradingPair:
+        return self._trading_pair
+
+    @property
+    def delay(self) -> timedelta:
+        return self._delay
+
+    @property
+    def held(self) -> int:
+        """
+        How many points are held until the watermark passes them.
+        """
+        return len(self._points)
+
+    @property
+    def discarded(self) -> int:
+        """
+        How many points were discarded because a point with the same or a newer sequence had already been released.
+        """
+        return self._discarded
+
+    @property
+    def points(self) -> Collection[TradingPoint]:
+        """
+        Points held, in no particular order.
+        """
+        return tuple(self._points)
+
+    def add_many(self, points: Iterable[TradingPoint]):
+        for point in points:
+            if point.pair != self._trading_pair:
+                raise ValueError(f'Unsupported trading pair: {point.pair}')
+
+            if self._released_sequence is not None and point.sequence <= self._released_sequence:
+                self._discarded += 1
+                continue
+
+            heapq.heappush(self._points, point)
+            if self._newest_time is None or point.time > self._newest_time:
+                self._newest_time = point.time
+
+    def release(self, now: Optional[datetime] = None) -> List[TradingPoint]:
+        """
+        Takes out the points the watermark passed, and the oldest points beyond the capacity, in sequence order.
+        """
+        points = self._points
+        if not points:
+            return []
+
+        watermark = self._newest_time if now is None or now < self._newest_time else now
+        watermark -= self._delay
+
+        released = []
+        while points and (points[0].time <= watermark or len(points) > self._capacity):
+            released.append(heapq.heappop(points))
+        if released:
+            self._released_sequence = released[-1].sequence
+        return released
+
+    def __str__(self) -> str:
+        return f'ReorderBuffer[{self._trading_pair}]'
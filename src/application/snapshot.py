@@ -0,0 +1,300 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import defaultdict
+from logging import getLogger
+from typing import BinaryIO, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from application.bars import BarRollup, BarRow
+from application.buffer import BufferedPoint
+from application.model import Point, TradingPair, TradingPoint
+from application.numeric import NumericBackend
+from application.reorder import ReorderBuffer
+from application.store import PointStore, from_epoch_nanoseconds, to_epoch_nanoseconds
+from application.vwap import TimeWindowVWAP
+
+logger = getLogger(__name__)
+
+# Product, sequence, scaled price, scaled size and trade time in nanoseconds since the epoch. Records have a fixed size,
+# so that a file of them can be memory-mapped and unpacked in one go.
+RECORD = struct.Struct('<16sqqqq')
+
+Record = Tuple[bytes, int, int, int, int]
+
+BarRecord = Tuple[bytes, int, int, int, int, int, int, int, int, int, int, int, int, int]
+
+SNAPSHOT_FILE = 'snapshot.bin'
+
+# Product, time of the newest trade of the rollup, resolution in nanoseconds, bar, scaled open, high, low, close and
+# volume, scaled price·volume split into its low and high 64 bits, since it can outgrow them, number of trades, and
+# sequences of the open and close trades
+BAR_RECORD = struct.Struct('<16sqqqqqqqqQqqqq')
+
+# Generation of the first journal written after the bars of a rollups file, which precedes its records
+GENERATION = struct.Struct('<q')
+
+ROLLUPS_FILE = 'rollups.bin'
+
+_JOURNAL_FILE = re.compile(r'journal\.(\d+)\.bin$')
+
+
+def read_records(path: str) -> List[Record]:
+    """
+    Reads every complete record of a file, ignoring a record that was only partially written.
+    """
+    with open(path, 'rb') as file:
+        length = os.fstat(file.fileno()).st_size
+        length -= length % RECORD.size
+        if not length:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            with memoryview(mapping) as view:
+                return list(RECORD.iter_unpack(view[:length]))
+
+
+def encode_points(points: Iterable[TradingPoint], backend: NumericBackend) -> bytes:
+    return b''.join(RECORD.pack(i.pair.value.encode('ascii'), *_columns(i, backend)) for i in points)
+
+
+def decode_point(record: Record, backend: NumericBackend) -> TradingPoint:
+    product_id, sequence, price, size, time = record
+    pair = TradingPair(product_id.rstrip(b'\0').decode('ascii'))
+    return Point(
+        pair=pair,
+        quantity=backend.from_fixed_point(size, pair.size_decimals),
+        price=backend.from_fixed_point(price, pair.price_decimals),
+        sequence=sequence,
+        time=from_epoch_nanoseconds(time),
+    )
+
+
+class Snapshots:
+    """
+    Keeps the points of the windows on local disk, so that they can be restored after a restart instead of being
+    refilled from the feed.
+
+    Every batch of points is appended to a journal. Every `interval` seconds, the points retained by the windows are
+    written into a snapshot, from a background thread, and a new journal is started. The journals older than the
+    snapshot are deleted once it is safely in place, so that the snapshot and the journals left always cover every
+    retained point. A crash at any step only leaves points that appear twice, which `restore` deduplicates by sequence.
+    The bars of the rollups go back much further than the windows, so they are written along with every snapshot, before
+    the journals are deleted, and `restore_rollups` adds the journals written since to them.
+
+    Journals are flushed after every batch, but not synced to the disk, so they survive the process but not the host.
+    """
+
+    def __init__(self, directory: str, backend: NumericBackend, interval=60.0):
+        self._directory = directory
+        self._backend = backend
+        self._interval = interval
+        self._generation = max(self._journal_generations(), default=0) + 1
+        self._journal: BinaryIO = self._open_journal()
+        self._last_snapshot = time.monotonic()
+        self._writer: Optional[threading.Thread] = None
+
+    def restore(self) -> Dict[TradingPair, List[TradingPoint]]:
+        """
+        Points of the last snapshot and of the journals written since, deduplicated by sequence and sorted by
+        sequence for every trading pair.
+        """
+        paths = [os.path.join(self._directory, SNAPSHOT_FILE)]
+        paths += [self._journal_path(i) for i in sorted(self._journal_generations()) if i != self._generation]
+        return self._read_points(paths)
+
+    def restore_rollups(self, rollups: Sequence[BarRollup]):
+        """
+        Loads the bars of the last snapshot into these empty rollups and adds the points of the journals written since,
+        or adds every point restored when there is no snapshot of bars yet.
+        """
+        rollups_by_pair = {i.trading_pair: i for i in rollups}
+        path = os.path.join(self._directory, ROLLUPS_FILE)
+        if not os.path.exists(path):
+            points_by_pair = self.restore()
+        else:
+            with open(path, 'rb') as file:
+                data = file.read()
+            generation, = GENERATION.unpack_from(data)
+            length = len(data) - GENERATION.size
+            length -= length % BAR_RECORD.size
+            rows_by_pair: Dict[bytes, List[BarRecord]] = defaultdict(list)
+            for record in BAR_RECORD.iter_unpack(data[GENERATION.size:GENERATION.size + length]):
+                rows_by_pair[record[0]].append(record)
+            for product_id, records in rows_by_pair.items():
+                rollup = rollups_by_pair.get(TradingPair(product_id.rstrip(b'\0').decode('ascii')))
+                if rollup is not None:
+                    rollup.load(from_epoch_nanoseconds(records[0][1]), map(_decode_bar, records))
+
+            points_by_pair = self._read_points([
+                self._journal_path(i) for i in sorted(self._journal_generations())
+                if i >= generation and i != self._generation
+            ])
+
+        for pair, points in points_by_pair.items():
+            rollup = rollups_by_pair.get(pair)
+            if rollup is not None:
+                rollup.add_many(points)
+
+    def _read_points(self, paths: Sequence[str]) -> Dict[TradingPair, List[TradingPoint]]:
+        records: Dict[Tuple[bytes, int], Record] = {}
+        for path in paths:
+            if os.path.exists(path):
+                for record in read_records(path):
+                    records[record[0], record[1]] = record
+
+        points_by_pair: Dict[TradingPair, List[TradingPoint]] = defaultdict(list)
+        for key in sorted(records):
+            point = decode_point(records[key], self._backend)
+            points_by_pair[point.pair].append(point)
+        return dict(points_by_pair)
+
+    def journal(self, points: Sequence[TradingPoint]):
+        self._journal.write(encode_points(points, self._backend))
+        self._journal.flush()
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_snapshot >= self._interval and not self.writing
+
+    @property
+    def writing(self) -> bool:
+        return self._writer is not None and self._writer.is_alive()
+
+    def take(
+            self,
+            stores: Sequence[PointStore],
+            time_windows: Sequence[TimeWindowVWAP],
+            reorder_buffers: Sequence[ReorderBuffer] = (),
+            rollups: Sequence[BarRollup] = ()
+    ):
+        """
+        Copies the points retained by the windows, those held by the reorder buffers before them and the bars of the
+        rollups, which only copies the columns of the stores and the bars and the references to the other points, and
+        writes them from a background thread.
+        """
+        captured = (
+            [(i.trading_pair, i.columns()) for i in stores],
+            [i.points for i in time_windows],
+            [i.points for i in reorder_buffers],
+            [i.copy() for i in rollups]
+        )
+
+        self._journal.close()
+        self._generation += 1
+        self._journal = self._open_journal()
+        self._last_snapshot = time.monotonic()
+
+        self._writer = threading.Thread(
+            target=self._write_snapshot, args=(captured, self._generation), name='snapshot', daemon=True
+        )
+        self._writer.start()
+
+    def close(self):
+        if self._writer:
+            self._writer.join()
+        self._journal.close()
+
+    def _write_snapshot(self, captured, generation: int):
+        started = time.perf_counter()
+        stores, time_windows, reorder_buffers, rollups = captured
+
+        records: Dict[Tuple[str, int], BufferedPoint] = {}
+        for points in time_windows + reorder_buffers:
+            for point in points:
+                records[point.pair.value, point.sequence] = _columns(point, self._backend)
+        for pair, columns in stores:
+            for columns_ in zip(*columns):
+                records[pair.value, columns_[0]] = columns_
+
+        path = os.path.join(self._directory, SNAPSHOT_FILE)
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(b''.join(RECORD.pack(k[0].encode('ascii'), *v) for k, v in records.items()))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+        if rollups:
+            # The held points are only rolled up once released, after this snapshot, so they go into its bars instead
+            for rollup in rollups:
+                rollup.add_many(i for points in reorder_buffers for i in points if rollup.supports(i))
+            self._write_rollups(rollups, generation)
+
+        for i in self._journal_generations():
+            if i < generation:
+                os.remove(self._journal_path(i))
+
+        logger.info(f'Wrote a snapshot of {len(records)} points in {time.perf_counter() - started:.3f}s')
+
+    def _write_rollups(self, rollups: Sequence[BarRollup], generation: int):
+        """
+        Writes the bars of the rollups, which hold every point journaled before this generation.
+        """
+        records = []
+        for rollup in rollups:
+            if rollup.newest_time is None:
+                continue
+            product_id = rollup.trading_pair.value.encode('ascii')
+            newest_time = to_epoch_nanoseconds(rollup.newest_time)
+            for nanoseconds, row in rollup.rows():
+                records.append(BAR_RECORD.pack(product_id, newest_time, nanoseconds, *_encode_bar(row)))
+
+        path = os.path.join(self._directory, ROLLUPS_FILE)
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(GENERATION.pack(generation) + b''.join(records))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    def _open_journal(self) -> BinaryIO:
+        return open(self._journal_path(self._generation), 'ab')
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self._directory, f'journal.{generation}.bin')
+
+    def _journal_generations(self) -> List[int]:
+        return [int(match.group(1)) for match in map(_JOURNAL_FILE.match, os.listdir(self._directory)) if match]
+
+
+class SequenceFilter:
+    """
+    Drops the points whose sequence was already restored, such as the trades the feed sends again after a restart.
+    """
+
+    def __init__(self, points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+        self._sequences: Dict[TradingPair, Set[int]] = {
+            pair: {i.sequence for i in points} for pair, points in points_by_pair.items()
+        }
+
+    def filter(self, points: Iterable[TradingPoint]) -> List[TradingPoint]:
+        sequences = self._sequences
+        return [i for i in points if i.sequence not in sequences.get(i.pair, ())]
+
+
+def _encode_bar(row: BarRow) -> tuple:
+    bar, open_, high, low, close, volume, price_volume, trades, open_sequence, close_sequence = row
+    return (
+        bar, open_, high, low, close, volume, price_volume & (1 << 64) - 1, price_volume >> 64, trades, open_sequence,
+        close_sequence
+    )
+
+
+def _decode_bar(record: BarRecord) -> Tuple[int, BarRow]:
+    (
+        _, _, nanoseconds, bar, open_, high, low, close, volume, price_volume_low, price_volume_high, trades,
+        open_sequence, close_sequence
+    ) = record
+    price_volume = price_volume_high << 64 | price_volume_low
+    return nanoseconds, (bar, open_, high, low, close, volume, price_volume, trades, open_sequence, close_sequence)
+
+
+def _columns(point: TradingPoint, backend: NumericBackend) -> BufferedPoint:
+    pair = point.pair
+    return (
+        point.sequence,
+        backend.to_fixed_point(point.price, pair.price_decimals),
+        backend.to_fixed_point(point.quantity, pair.size_decimals),
+        to_epoch_nanoseconds(point.time),
+    )
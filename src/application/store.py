@@ -0,0 +1,281 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+from heapq import merge
+from operator import itemgetter
+from typing import Collection, Iterable, List, Optional, Sequence, Tuple
+
+from application.buffer import BufferedPoint, PointBuffer
+from application.model import Point, TradingPair, TradingPoint
+from application.numeric import DECIMAL, NumericBackend, Number
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+_SEQUENCE = itemgetter(0)
+
+
+class FenwickTree:
+    """
+    Binary Indexed Tree over a fixed number of slots, answering prefix sums in O(log n)
+    See → https://en.wikipedia.org/wiki/Fenwick_tree
+    """
+
+    def __init__(self, size: int, zero=0, typecode: Optional[str] = None):
+        self._size = size
+        self._zero = zero
+        self._tree = array(typecode, [zero]) * (size + 1) if typecode else [zero] * (size + 1)
+
+    def update(self, index: int, delta):
+        index += 1
+        while index <= self._size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, end: int):
+        """
+        Sum of the slots in `[0, end)`.
+        """
+        total = self._zero
+        while end > 0:
+            total += self._tree[end]
+            end -= end & -end
+        return total
+
+    def range_sum(self, start: int, end: int):
+        """
+        Sum of the slots in `[start, end)`.
+        """
+        return self.prefix_sum(end) - self.prefix_sum(start)
+
+
+class PointStore:
+    """
+    Retains the latest `capacity` points of a trading pair sorted by sequence, and answers the VWAP of the last N
+    points for any N up to the capacity in O(log n).
+
+    Points are kept in a columnar `PointBuffer`, with prices and sizes scaled to integers using the tick sizes of the
+    trading pair, whatever the numeric `backend` they were parsed with. The VWAP is returned in that backend. Two
+    Fenwick trees index the size and price·size of every slot of the buffer. A point that arrives in order is a plain
+    append. A late point shifts the newer points one slot forward, which costs O(d log n) where d is how many points
+    arrived after it. A point whose sequence is already retained is a duplicate, and is dropped.
+
+    Each retained point takes `PointBuffer.BYTES_PER_POINT` (32) bytes in the buffer, plus 8 bytes in the size tree and
+    a pointer to an integer in the price·size tree, which may outgrow 64 bits.
+    """
+
+    def __init__(self, trading_pair: TradingPair, capacity=10000, backend: NumericBackend = DECIMAL):
+        self._trading_pair = trading_pair
+        self._capacity = capacity
+        self._backend = backend
+        self._buffer = PointBuffer(capacity)
+        self._sizes = FenwickTree(capacity, zero=0, typecode='q')
+        self._prices_sizes = FenwickTree(capacity, zero=0)
+        self._late = 0
+        self._evicted = 0
+        self._discarded = 0
+        self._duplicates = 0
+
+    @property
+    def trading_pair(self) -> TradingPair:
+        return self._trading_pair
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def late(self) -> int:
+        """
+        How many points were inserted before a newer point that was already retained.
+        """
+        return self._late
+
+    @property
+    def evicted(self) -> int:
+        """
+        How many points were evicted to make room for newer ones.
+        """
+        return self._evicted
+
+    @property
+    def discarded(self) -> int:
+        """
+        How many points were discarded because they were older than every retained point of a full store.
+        """
+        return self._discarded
+
+    @property
+    def duplicates(self) -> int:
+        """
+        How many points were dropped because a point with the same sequence was already retained.
+        """
+        return self._duplicates
+
+    def supports(self, point: TradingPoint) -> bool:
+        return self._trading_pair == point.pair
+
+    def add(self, point: TradingPoint):
+        sequence, price, size, time = self._to_columns(point)
+
+        buffer = self._buffer
+        if buffer.full and sequence < buffer.sequence(0):
+            self._discarded += 1
+            return
+        if self._holds(sequence):
+            self._duplicates += 1
+            return
+        if buffer.full:
+            self._evict_oldest()
+
+        position = buffer.bisect(sequence)
+        if position < len(buffer):
+            self._late += 1
+        buffer.insert(position, sequence, price, size, time)
+
+        # Every point from the insertion position onwards moved one slot forward, so each of those slots now holds
+        # what the previous one held, and the slot at the end was empty.
+        last = len(buffer) - 1
+        for i in range(position, last + 1):
+            _, price, size, _ = buffer.get(i)
+            size_delta, price_size_delta = size, price * size
+            if i < last:
+                _, price, size, _ = buffer.get(i + 1)
+                size_delta -= size
+                price_size_delta -= price * size
+
+            slot = buffer.slot(i)
+            self._sizes.update(slot, size_delta)
+            self._prices_sizes.update(slot, price_size_delta)
+
+    def add_many(self, points: Iterable[TradingPoint]):
+        """
+        Adds a batch of points with a single merge: the retained points that are newer than the oldest point of the
+        batch are taken out of the buffer, merged with the sorted batch and appended back. This costs O((d + k) log n)
+        for a batch of k points, where d is how many retained points are newer than the oldest point of the batch,
+        instead of shifting the newer points once per late point.
+        """
+        batch = sorted((self._to_columns(i) for i in points), key=_SEQUENCE)
+
+        buffer = self._buffer
+        if buffer.full:
+            oldest = buffer.sequence(0)
+            retained = [i for i in batch if i[0] >= oldest]
+            self._discarded += len(batch) - len(retained)
+            batch = retained
+
+        unique = []
+        for columns in batch:
+            if (unique and unique[-1][0] == columns[0]) or self._holds(columns[0]):
+                self._duplicates += 1
+            else:
+                unique.append(columns)
+        batch = unique
+        if not batch:
+            return
+
+        if buffer:
+            newest = buffer.sequence(len(buffer) - 1)
+            self._late += sum(1 for i in batch if i[0] < newest)
+
+        position = buffer.bisect(batch[0][0])
+        first_slot = buffer.slot(position)
+        tail = buffer.truncate(position)
+        for i, (_, price, size, _) in enumerate(tail):
+            slot = (first_slot + i) % self._capacity
+            self._sizes.update(slot, -size)
+            self._prices_sizes.update(slot, -price * size)
+
+        for sequence, price, size, time in merge(tail, batch, key=_SEQUENCE):
+            if buffer.full:
+                self._evict_oldest()
+            slot = buffer.slot(len(buffer))
+            buffer.append(sequence, price, size, time)
+            self._sizes.update(slot, size)
+            self._prices_sizes.update(slot, price * size)
+
+    def _holds(self, sequence: int) -> bool:
+        position = self._buffer.bisect(sequence)
+        return position > 0 and self._buffer.sequence(position - 1) == sequence
+
+    def vwap(self, size: int) -> Number:
+        """
+        VWAP of the last `size` points, or of all retained points if there are fewer than `size`.
+        """
+        if not 0 < size <= self._capacity:
+            raise ValueError(f'Window size must be between 1 and {self._capacity}: {size}')
+
+        size = min(size, len(self._buffer))
+        start = self._buffer.slot(len(self._buffer) - size)
+        end = start + size
+
+        if end <= self._capacity:
+            size_sum = self._sizes.range_sum(start, end)
+            price_size_sum = self._prices_sizes.range_sum(start, end)
+        else:
+            end -= self._capacity
+            size_sum = self._sizes.range_sum(start, self._capacity) + self._sizes.prefix_sum(end)
+            price_size_sum = self._prices_sizes.range_sum(start, self._capacity) + self._prices_sizes.prefix_sum(end)
+
+        price_decimals = self._trading_pair.price_decimals
+        size_decimals = self._trading_pair.size_decimals
+        return self._backend.vwap(
+            self._backend.from_fixed_point(price_size_sum, price_decimals + size_decimals),
+            self._backend.from_fixed_point(size_sum, size_decimals),
+            price_decimals
+        )
+
+    def vwaps(self, sizes: Sequence[int]) -> List[Number]:
+        return [self.vwap(i) for i in sizes]
+
+    @property
+    def points(self) -> Collection[TradingPoint]:
+        return tuple(self._point(i) for i in range(len(self._buffer)))
+
+    def columns(self) -> Tuple[array, array, array, array]:
+        """
+        Copies of the sequence, scaled price, scaled size and time columns of the retained points, oldest first.
+        """
+        return self._buffer.columns()
+
+    def _to_columns(self, point: TradingPoint) -> BufferedPoint:
+        if point.pair != self._trading_pair:
+            raise ValueError(f'Unsupported trading pair: {point.pair}')
+
+        return (
+            point.sequence,
+            self._backend.to_fixed_point(point.price, self._trading_pair.price_decimals),
+            self._backend.to_fixed_point(point.quantity, self._trading_pair.size_decimals),
+            to_epoch_nanoseconds(point.time),
+        )
+
+    def _evict_oldest(self):
+        slot = self._buffer.slot(0)
+        _, price, size, _ = self._buffer.popleft()
+        self._evicted += 1
+        self._sizes.update(slot, -size)
+        self._prices_sizes.update(slot, -price * size)
+
+    def _point(self, index: int) -> TradingPoint:
+        sequence, price, size, time = self._buffer.get(index)
+        return Point(
+            pair=self._trading_pair,
+            quantity=self._backend.from_fixed_point(size, self._trading_pair.size_decimals),
+            price=self._backend.from_fixed_point(price, self._trading_pair.price_decimals),
+            sequence=sequence,
+            time=from_epoch_nanoseconds(time),
+        )
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __str__(self) -> str:
+        return f'PointStore[{self._trading_pair}]'
+
+
+def to_epoch_nanoseconds(time: datetime) -> int:
+    return (time - _EPOCH) // _ONE_MICROSECOND * 1000
+
+
+def from_epoch_nanoseconds(time: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=time // 1000)
@@ -0,0 +1,276 @@
+from typing import Collection, Iterable, List, Sequence, Tuple
+
+from application.model import Point, TradingPair, TradingPoint
+from application.numeric import DECIMAL, Number, NumericBackend
+from application.store import from_epoch_nanoseconds, to_epoch_nanoseconds
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+Columns = Tuple['np.ndarray', 'np.ndarray', 'np.ndarray', 'np.ndarray']
+
+
+class ArrayPointStore:
+    """
+    Retains the latest `capacity` points of a trading pair sorted by sequence, like `PointStore`, in contiguous NumPy
+    arrays, so that batches are added in vectorized code rather than point by point, which pays off for large windows
+    and bulk loads.
+
+    The sequence, scaled price, scaled size and time columns are 64-bit integers, along with two more columns of the
+    cumulative sums of the sizes and of the price·sizes, the latter as doubles since they can outgrow 64 bits. The VWAP
+    of the last N points, for any N up to the capacity, is then the difference of two slots of each sum, in O(1).
+
+    The columns are preallocated to twice the capacity. Points are appended at the end of the live range, which is
+    moved back to the front once it reaches the end of the arrays, with its sums computed again from scratch, so that
+    an append costs O(1) amortized and rounding errors do not build up. A batch is sorted and merged with the retained
+    points that are newer than its oldest point, and the sums of the merged points are computed again, in O(d + k) for
+    a batch of k points where d is how many retained points are newer than the oldest point of the batch.
+
+    VWAPs are computed from the sums by the numeric `backend`, as `PointStore` does, so they are of the same type, with
+    a relative error in the order of 1e-12 for Coinbase prices and sizes whatever the backend, growing with the ratio of
+    the capacity to the window size, since the sums of the price·sizes are doubles.
+
+    It needs the `numpy` package, which is an optional dependency.
+    """
+
+    def __init__(self, trading_pair: TradingPair, capacity=10000, backend: NumericBackend = DECIMAL):
+        if np is None:
+            raise ImportError('The array store requires the numpy package: pip install numpy')
+        if capacity < 1:
+            raise ValueError(f'Capacity must be at least 1: {capacity}')
+
+        self._trading_pair = trading_pair
+        self._capacity = capacity
+        self._backend = backend
+        self._sequences = np.empty(2 * capacity, dtype=np.int64)
+        self._prices = np.empty(2 * capacity, dtype=np.int64)
+        self._sizes = np.empty(2 * capacity, dtype=np.int64)
+        self._times = np.empty(2 * capacity, dtype=np.int64)
+        self._size_sums = np.empty(2 * capacity, dtype=np.int64)
+        self._price_size_sums = np.empty(2 * capacity, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._late = 0
+        self._evicted = 0
+        self._discarded = 0
+        self._duplicates = 0
+
+    @property
+    def trading_pair(self) -> TradingPair:
+        return self._trading_pair
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def late(self) -> int:
+        """
+        How many points were inserted before a newer point that was already retained.
+        """
+        return self._late
+
+    @property
+    def evicted(self) -> int:
+        """
+        How many points were evicted to make room for newer ones.
+        """
+        return self._evicted
+
+    @property
+    def discarded(self) -> int:
+        """
+        How many points were discarded because they were older than every retained point of a full store.
+        """
+        return self._discarded
+
+    @property
+    def duplicates(self) -> int:
+        """
+        How many points were dropped because a point with the same sequence was already retained.
+        """
+        return self._duplicates
+
+    def supports(self, point: TradingPoint) -> bool:
+        return self._trading_pair == point.pair
+
+    def add(self, point: TradingPoint):
+        self.add_many((point,))
+
+    def add_many(self, points: Iterable[TradingPoint]):
+        columns = [self._to_columns(i) for i in points]
+        if not columns:
+            return
+
+        sequences, prices, sizes, times = zip(*columns)
+        self.add_columns(
+            np.array(sequences, dtype=np.int64),
+            np.array(prices, dtype=np.int64),
+            np.array(sizes, dtype=np.int64),
+            np.array(times, dtype=np.int64),
+        )
+
+    def add_columns(self, sequences: 'np.ndarray', prices: 'np.ndarray', sizes: 'np.ndarray', times: 'np.ndarray'):
+        """
+        Adds a batch of points given as columns of sequences, prices and sizes scaled to the tick sizes of the trading
+        pair, and times in nanoseconds since the epoch, in any order.
+
+        The batch is sorted, and merged with the retained points that are newer than its oldest point, which are the
+        only ones that move. Points that arrive in order are a plain copy at the end of the arrays.
+        """
+        order = np.argsort(sequences, kind='stable')
+        sequences, prices, sizes, times = sequences[order], prices[order], sizes[order], times[order]
+
+        count = self._end - self._start
+        if count == self._capacity:
+            retained = sequences >= self._sequences[self._start]
+            if not retained.all():
+                self._discarded += len(sequences) - int(retained.sum())
+                sequences, prices, sizes, times = (i[retained] for i in (sequences, prices, sizes, times))
+
+        # Points given twice in the batch, or whose sequence is already retained, are dropped as `PointStore` does
+        unique = np.ones(len(sequences), dtype=bool)
+        unique[1:] = sequences[1:] != sequences[:-1]
+        if count:
+            live = self._sequences[self._start:self._end]
+            positions = np.minimum(np.searchsorted(live, sequences), count - 1)
+            unique &= live[positions] != sequences
+        if not unique.all():
+            self._duplicates += len(sequences) - int(unique.sum())
+            sequences, prices, sizes, times = (i[unique] for i in (sequences, prices, sizes, times))
+        if not len(sequences):
+            return
+
+        if count:
+            self._late += int(np.count_nonzero(sequences < self._sequences[self._end - 1]))
+
+        # Newer points than the oldest of the batch are taken out and merged with it, after any point with the same
+        # sequence, as `PointStore` does.
+        position = self._start + int(np.searchsorted(self._sequences[self._start:self._end], sequences[0], 'right'))
+        if position < self._end:
+            sequences, prices, sizes, times = self._merge(position, (sequences, prices, sizes, times))
+        self._end = position
+
+        overflow = (self._end - self._start) + len(sequences) - self._capacity
+        if overflow > 0:
+            evicted = min(overflow, self._end - self._start)
+            self._start += evicted
+            self._evicted += overflow
+            if overflow > evicted:
+                # The batch alone outgrows the store, so only its newest points are kept
+                skipped = overflow - evicted
+                sequences, prices, sizes, times = (i[skipped:] for i in (sequences, prices, sizes, times))
+
+        if self._end + len(sequences) > len(self._sequences):
+            self._compact()
+
+        start, end = self._end, self._end + len(sequences)
+        self._sequences[start:end] = sequences
+        self._prices[start:end] = prices
+        self._sizes[start:end] = sizes
+        self._times[start:end] = times
+        self._sum(start, end)
+        self._end = end
+
+    def vwap(self, size: int) -> Number:
+        """
+        VWAP of the last `size` points, or of all retained points if there are fewer than `size`.
+        """
+        if not 0 < size <= self._capacity:
+            raise ValueError(f'Window size must be between 1 and {self._capacity}: {size}')
+
+        start = max(self._start, self._end - size)
+        size_sum, price_size_sum = self._prefix_sums(self._end)
+        size_sum_before, price_size_sum_before = self._prefix_sums(start)
+        return self._scale(price_size_sum - price_size_sum_before, size_sum - size_sum_before)
+
+    def vwaps(self, sizes: Sequence[int]) -> List[Number]:
+        return [self.vwap(i) for i in sizes]
+
+    @property
+    def points(self) -> Collection[TradingPoint]:
+        return tuple(self._point(i) for i in range(self._start, self._end))
+
+    def columns(self) -> Columns:
+        """
+        Copies of the sequence, scaled price, scaled size and time columns of the retained points, oldest first.
+        """
+        live = slice(self._start, self._end)
+        return (
+            self._sequences[live].copy(), self._prices[live].copy(), self._sizes[live].copy(), self._times[live].copy()
+        )
+
+    def _merge(self, position: int, batch: Columns) -> Columns:
+        tail = slice(position, self._end)
+        merged = tuple(
+            np.concatenate((column[tail], values))
+            for column, values in zip((self._sequences, self._prices, self._sizes, self._times), batch)
+        )
+        # Both runs are sorted, and a stable sort of two sorted runs is a merge, in O(d + k)
+        order = np.argsort(merged[0], kind='stable')
+        return tuple(i[order] for i in merged)
+
+    def _compact(self):
+        """
+        Moves the live points back to the front of the arrays, and sums them from scratch.
+        """
+        count = self._end - self._start
+        for column in (self._sequences, self._prices, self._sizes, self._times):
+            column[:count] = column[self._start:self._end]
+        self._start, self._end = 0, count
+        self._sum(0, count)
+
+    def _sum(self, start: int, end: int):
+        """
+        Computes the cumulative sums of the slots from `start` to `end`, following the sums of the previous slots.
+        """
+        size_sum, price_size_sum = self._prefix_sums(start)
+        sizes = self._sizes[start:end]
+        self._size_sums[start:end] = np.cumsum(sizes) + size_sum
+        prices_sizes = self._prices[start:end] * sizes.astype(np.float64)
+        self._price_size_sums[start:end] = np.cumsum(prices_sizes) + price_size_sum
+
+    def _prefix_sums(self, slot: int) -> Tuple[int, float]:
+        """
+        Sums of the sizes and price·sizes of the slots before `slot`, since the front of the arrays.
+        """
+        if slot == 0:
+            return 0, 0.0
+        return int(self._size_sums[slot - 1]), float(self._price_size_sums[slot - 1])
+
+    def _scale(self, price_size_sum: float, size_sum: int) -> Number:
+        price_decimals = self._trading_pair.price_decimals
+        size_decimals = self._trading_pair.size_decimals
+        return self._backend.vwap(
+            self._backend.from_fixed_point(round(price_size_sum), price_decimals + size_decimals),
+            self._backend.from_fixed_point(size_sum, size_decimals),
+            price_decimals
+        )
+
+    def _to_columns(self, point: TradingPoint) -> Tuple[int, int, int, int]:
+        if point.pair != self._trading_pair:
+            raise ValueError(f'Unsupported trading pair: {point.pair}')
+
+        return (
+            point.sequence,
+            self._backend.to_fixed_point(point.price, self._trading_pair.price_decimals),
+            self._backend.to_fixed_point(point.quantity, self._trading_pair.size_decimals),
+            to_epoch_nanoseconds(point.time),
+        )
+
+    def _point(self, slot: int) -> TradingPoint:
+        return Point(
+            pair=self._trading_pair,
+            quantity=self._backend.from_fixed_point(int(self._sizes[slot]), self._trading_pair.size_decimals),
+            price=self._backend.from_fixed_point(int(self._prices[slot]), self._trading_pair.price_decimals),
+            sequence=int(self._sequences[slot]),
+            time=from_epoch_nanoseconds(int(self._times[slot])),
+        )
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __str__(self) -> str:
+        return f'ArrayPointStore[{self._trading_pair}]'
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from application.gaps import SequenceGaps
+from application.model import TradingPair, TradingPoint
+from application.numeric import DECIMAL, NumericBackend
+from application.output import Update
+from application.store import PointStore
+from application.vwap import TimeWindowVWAP
+
+WINDOW_SIZES = (50, 200, 1000, 10000)
+
+TIME_WINDOWS = (timedelta(minutes=1), timedelta(minutes=5), timedelta(hours=1))
+
+
+class VenueWindows:
+    """
+    Windows of trading pairs whose trades come from several venues: the VWAPs of the last N trades and of the last
+    minutes of each venue, and the consolidated VWAPs of the last minutes across every venue.
+
+    Sequences only order the trades of a single venue, so the windows of the last N trades are kept per venue and pair,
+    in a `PointStore`. Trade times are comparable across venues, so the time windows of a pair are also kept across
+    venues, and fed with the trades of all of them, with a venue that lags behind the others by less than their
+    lateness still being inserted in order. Every trade is then added to a fixed number of windows, and a batch only
+    computes the VWAPs of the venue and pairs it touched, so the cost of merging a trade does not grow with the number
+    of venues.
+
+    Windows of a venue are created with its first trade. Trades that a venue sends again after it reconnects are
+    dropped by its own `SequenceGaps`. Time windows only drop old trades as new ones arrive, so `expire` has to be
+    called as time goes by for a pair or a venue that went quiet.
+    """
+
+    def __init__(
+            self,
+            trading_pairs: Iterable[TradingPair],
+            window_sizes: Sequence[int] = WINDOW_SIZES,
+            time_windows: Sequence[timedelta] = TIME_WINDOWS,
+            backend: NumericBackend = DECIMAL
+    ):
+        self._trading_pairs = frozenset(trading_pairs)
+        self._window_sizes = tuple(window_sizes)
+        self._time_windows = tuple(time_windows)
+        self._backend = backend
+        self._stores: Dict[Tuple[str, TradingPair], PointStore] = {}
+        self._venue_vwaps: Dict[Tuple[str, TradingPair], Sequence[TimeWindowVWAP]] = {}
+        self._consolidated_vwaps: Dict[TradingPair, Sequence[TimeWindowVWAP]] = {
+            i: self._new_time_windows(i) for i in self._trading_pairs
+        }
+        self._gaps: Dict[str, SequenceGaps] = {}
+
+    @property
+    def venues(self) -> List[str]:
+        return sorted(self._gaps)
+
+    def store(self, venue: str, pair: TradingPair) -> PointStore:
+        return self._stores[venue, pair]
+
+    def time_window_vwaps(self, pair: TradingPair, venue: Optional[str] = None) -> Sequence[TimeWindowVWAP]:
+        """
+        Time windows of a pair on a venue, or across every venue when none is given.
+        """
+        if venue is None:
+            return self._consolidated_vwaps[pair]
+        return self._venue_vwaps[venue, pair]
+
+    def gaps(self, venue: str) -> SequenceGaps:
+        return self._gaps[venue]
+
+    def reconnect(self, venue: str):
+        """
+        Starts following a new connection of a venue, whose trades received before it are dropped when sent again.
+        """
+        self._gaps.setdefault(venue, SequenceGaps()).reconnect()
+
+    def process(self, venue: str, points: Iterable[TradingPoint]) -> List[Update]:
+        """
+        Adds a batch of trades of a venue to its windows and to the consolidated ones, and returns the VWAPs of every
+        window that changed, labelled with the venue, such as `coinbase:200` or `coinbase:60s`, or for the consolidated
+        ones with their duration alone, such as `60s`.
+        """
+        gaps = self._gaps.get(venue)
+        if gaps is None:
+            gaps = self._gaps[venue] = SequenceGaps()
+
+        points_by_pair: Dict[TradingPair, List[TradingPoint]] = defaultdict(list)
+        for point in gaps.filter(points):
+            if point.pair in self._trading_pairs:
+                points_by_pair[point.pair].append(point)
+
+        updates: List[Update] = []
+        for pair, pair_points in points_by_pair.items():
+            key = (venue, pair)
+            store = self._stores.get(key)
+            if store is None:
+                store = self._stores[key] = PointStore(pair, capacity=max(self._window_sizes), backend=self._backend)
+                self._venue_vwaps[key] = self._new_time_windows(pair)
+
+            store.add_many(pair_points)
+            for size, value in zip(self._window_sizes, store.vwaps(self._window_sizes)):
+                updates.append(Update(pair, f'{venue}:{size}', value))
+
+            for vwap in self._venue_vwaps[key]:
+                vwap.add_many(pair_points)
+                updates.append(Update(pair, f'{venue}:{int(vwap.duration.total_seconds())}s', vwap.current_value()))
+
+            for vwap in self._consolidated_vwaps[pair]:
+                vwap.add_many(pair_points)
+                updates.append(Update(pair, f'{int(vwap.duration.total_seconds())}s', vwap.current_value()))
+        return updates
+
+    def expire(self, now: datetime) -> List[Update]:
+        """
+        Evicts the trades older than its duration relative to `now` from every time window, of every venue and across
+        them, and returns the VWAPs of the windows that changed, labelled as by `process`.
+        """
+        updates: List[Update] = []
+        for (venue, pair), vwaps in self._venue_vwaps.items():
+            for vwap in vwaps:
+                if vwap.expire(now):
+                    updates.append(Update(pair, f'{venue}:{int(vwap.duration.total_seconds())}s', vwap.current_value()))
+        for pair, vwaps in self._consolidated_vwaps.items():
+            for vwap in vwaps:
+                if vwap.expire(now):
+                    updates.append(Update(pair, f'{int(vwap.duration.total_seconds())}s', vwap.current_value()))
+        return updates
+
+    def _new_time_windows(self, pair: TradingPair) -> Sequence[TimeWindowVWAP]:
+        return tuple(TimeWindowVWAP(pair, i, backend=self._backend) for i in self._time_windows)
@@ -1,48 +1,197 @@
-import bisect
-from decimal import Decimal
-from typing import List, Collection
+import heapq
+from collections import deque
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Deque, Iterable, List, Collection, Optional
 
 from application.model import TradingPair, TradingPoint
+from application.numeric import DECIMAL, NumericBackend, Number
 
-_ZERO = Decimal(0)
 
+class _RunningVWAP:
+    """
+    Keeps the price·quantity and quantity sums of a window up to date as points enter and leave it, so that
+    `current_value()` is O(1). Subclasses decide which points belong to the window.
 
-class VWAP:
+    The prices and quantities of the points must be represented by the numeric `backend` of the VWAP, which is the one
+    used to parse them.
+    """
+
+    def __init__(self, trading_pair: TradingPair, backend: NumericBackend = DECIMAL):
+        self._trading_pair = trading_pair
+        self._backend = backend
+        self._price_quantity_sum = backend.zero
+        self._quantity_sum = backend.zero
+
+    @property
+    def trading_pair(self) -> TradingPair:
+        return self._trading_pair
+
+    def supports(self, point: TradingPoint) -> bool:
+        return self._trading_pair == point.pair
+
+    def current_value(self) -> Number:
+        return self._backend.vwap(self._price_quantity_sum, self._quantity_sum, self._trading_pair.price_decimals)
+
+    def _check_supports(self, point: TradingPoint):
+        if point.pair != self._trading_pair:
+            raise ValueError(f'Unsupported trading pair: {point.pair}')
+
+    def _increment(self, point: TradingPoint):
+        self._price_quantity_sum += point.price * point.quantity
+        self._quantity_sum += point.quantity
+
+    def _decrement(self, point: TradingPoint):
+        self._price_quantity_sum -= point.price * point.quantity
+        self._quantity_sum -= point.quantity
+
+
+class VWAP(_RunningVWAP):
     """
     Volume Weighted Average Price
     See → https://en.wikipedia.org/wiki/Volume-weighted_average_price
+
+    Points are kept in a min-heap ordered by sequence, so the oldest point is always at the top and can be evicted
+    in O(log n), even when a late point lands in the middle of the window. The price·quantity and quantity sums are
+    updated as points enter and leave the window, which makes `current_value()` O(1).
     """
 
-    def __init__(self, trading_pair: TradingPair, max_size=200):
-        self._trading_pair = trading_pair
+    def __init__(self, trading_pair: TradingPair, max_size=200, backend: NumericBackend = DECIMAL):
+        super().__init__(trading_pair, backend)
         self._max_size = max_size
         self._points: List[TradingPoint] = []
 
-    def supports(self, point: TradingPoint) -> bool:
-        return self._trading_pair == point.pair
+    def add(self, point: TradingPoint):
+        self._check_supports(point)
+
+        if len(self._points) < self._max_size:
+            heapq.heappush(self._points, point)
+            self._increment(point)
+            return
+
+        # The window is full: push the new point and pop the oldest one in a single step. If the new point is older
+        # than everything in the window, it is popped right back and the sums are left untouched.
+        evicted = heapq.heappushpop(self._points, point)
+        if evicted is not point:
+            self._increment(point)
+            self._decrement(evicted)
+
+    def add_many(self, points: Iterable[TradingPoint]):
+        """
+        Adds a batch of points with a single merge: the batch is appended to the heap, which is heapified once before
+        evicting the oldest points. This is O(n + k log n) for a batch of k points, so small batches are still added
+        one by one.
+        """
+        points = list(points)
+        for point in points:
+            self._check_supports(point)
+
+        if len(points) * max(len(self._points), 1).bit_length() < len(self._points):
+            for point in points:
+                self.add(point)
+            return
+
+        for point in points:
+            self._increment(point)
+        self._points.extend(points)
+        heapq.heapify(self._points)
+
+        while len(self._points) > self._max_size:
+            self._decrement(heapq.heappop(self._points))
+
+    @property
+    def points(self) -> Collection[TradingPoint]:
+        return tuple(sorted(self._points))
+
+    def __str__(self) -> str:
+        return f'VWAP[{self._trading_pair}]'
+
+
+class TimeWindowVWAP(_RunningVWAP):
+    """
+    Volume Weighted Average Price of the points traded within the last `duration`, relative to the newest trade time
+    seen so far.
+
+    Points are kept in a deque sorted by trade time, so evicting expired points is a pop from the left and adding a
+    point in order is an append, both O(1). A late point is inserted by walking back from the right, which is cheap
+    because it can be at most `lateness` older than the newest point. Anything later than that is discarded and
+    counted in `discarded`.
+    """
+
+    def __init__(
+            self,
+            trading_pair: TradingPair,
+            duration: timedelta,
+            lateness=timedelta(seconds=5),
+            backend: NumericBackend = DECIMAL
+    ):
+        super().__init__(trading_pair, backend)
+        self._duration = duration
+        self._lateness = lateness
+        self._points: Deque[TradingPoint] = deque()
+        self._latest_time: Optional[datetime] = None
+        self._discarded = 0
+
+    @property
+    def duration(self) -> timedelta:
+        return self._duration
+
+    @property
+    def discarded(self) -> int:
+        return self._discarded
 
     def add(self, point: TradingPoint):
-        if point.pair != self._trading_pair:
-            raise ValueError(f'Unsupported trading pair: {point.pair}')
+        self._check_supports(point)
+        self._insert(point)
+        self._evict(self._latest_time - self._duration)
 
-        bisect.insort(self._points, point)
+    def add_many(self, points: Iterable[TradingPoint]):
+        """
+        Adds a batch of points in trade time order, so that points that are only late within the batch are appended,
+        and evicts the expired points once.
+        """
+        points = sorted(points, key=attrgetter('time'))
+        for point in points:
+            self._check_supports(point)
 
-        if len(self._points) > self._max_size:
-            self._points.pop(0)
+        for point in points:
+            self._insert(point)
 
-    def current_value(self) -> Decimal:
-        price_quantity_sum = _ZERO
-        quantity_sum = _ZERO
+        if self._latest_time is not None:
+            self._evict(self._latest_time - self._duration)
 
-        for point in self._points:
-            price_quantity_sum += point.price * point.quantity
-            quantity_sum += point.quantity
+    def _insert(self, point: TradingPoint):
+        if self._latest_time is None or point.time >= self._latest_time:
+            self._points.append(point)
+            self._latest_time = point.time
+        elif point.time >= self._latest_time - self._lateness:
+            index = len(self._points)
+            while index > 0 and point.time < self._points[index - 1].time:
+                index -= 1
+            self._points.insert(index, point)
+        else:
+            self._discarded += 1
+            return
 
-        return (price_quantity_sum / quantity_sum) if quantity_sum else _ZERO
+        self._increment(point)
+
+    def expire(self, now: datetime) -> int:
+        """
+        Evicts the points that are older than `duration` relative to `now`, so that the window of a trading pair that
+        went quiet does not hold on to stale trades, and returns how many there were.
+        """
+        return self._evict(now - self._duration)
 
     @property
     def points(self) -> Collection[TradingPoint]:
         return tuple(self._points)
 
+    def _evict(self, cutoff: datetime) -> int:
+        evicted = 0
+        while self._points and self._points[0].time < cutoff:
+            self._decrement(self._points.popleft())
+            evicted += 1
+        return evicted
+
     def __str__(self) -> str:
-        return f'VWAP[{self._trading_pair}]'
+        return f'VWAP[{self._trading_pair}/{int(self._duration.total_seconds())}s]'
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from application.coinbase.products import parse_products
+from application.model import TradingPair
+from benchmarks.generator import STARTING_PRICES, STARTING_SEQUENCES, from_ticks, to_ticks
+
+logger = getLogger(__name__)
+
+# Frames of a product, as generated, for every connection subscribed to it
+Frames = List[Tuple[TradingPair, str]]
+
+
+@dataclass
+class ExchangeSettings:
+    """
+    Shape of the feed of a fake exchange, which speaks the Coinbase subscribe/match protocol.
+
+    - `rates`: matches per second of each product.
+    - `out_of_order_ratio`: share of the matches that a connection delivers late.
+    - `max_displacement`: how many frames later than its place a late match can be delivered.
+    - `duplicate_rate`: share of the matches that a connection delivers twice.
+    - `gap_rate`: share of the matches that a connection never delivers.
+    - `error_rate`: share of the matches after which a connection gets an `error` message.
+    - `disconnect_rate`: share of the matches after which a connection is closed by the exchange.
+    - `tick`: how often matches are generated and sent, in seconds.
+    - `max_backlog`: ticks of frames queued for a connection at most, after which it is closed as too slow.
+    """
+
+    rates: Dict[TradingPair, float] = field(default_factory=lambda: {
+        TradingPair.BTC_USD: 300.0,
+        TradingPair.ETH_USD: 150.0,
+        TradingPair.ETH_BTC: 50.0,
+    })
+    seed: int = 42
+    out_of_order_ratio: float = 0.0
+    max_displacement: int = 10
+    duplicate_rate: float = 0.0
+    gap_rate: float = 0.0
+    error_rate: float = 0.0
+    disconnect_rate: float = 0.0
+    tick: float = 0.005
+    max_backlog: int = 1000
+
+
+class _Connection:
+    """
+    Subscriber of the fake exchange, to which the frames of its products are sent with the faults of the settings
+    injected, drawn from a generator of its own so that every connection gets different faults.
+    """
+
+    def __init__(self, websocket, products: Set[TradingPair], settings: ExchangeSettings, seed: int):
+        self.websocket = websocket
+        self.products = products
+        self._settings = settings
+        self._generator = random.Random(seed)
+        self._queue: asyncio.Queue = asyncio.Queue(settings.max_backlog)
+        # Late frames, with how many more frames are sent before them
+        self._late: List[List] = []
+        self.closed = False
+
+    def put(self, frames: Frames):
+        frames = [frame for product, frame in frames if product in self.products]
+        if not frames:
+            return
+        try:
+            self._queue.put_nowait(frames)
+        except asyncio.QueueFull:
+            self.closed = True
+
+    async def run(self, exchange: 'FakeExchange'):
+        settings, generator, websocket = self._settings, self._generator, self.websocket
+        while not self.closed:
+            try:
+                frames = await asyncio.wait_for(self._queue.get(), settings.tick * 10)
+            except asyncio.TimeoutError:
+                # A connection closed by the server as it shuts down gets no more frames to fail on
+                if websocket.closed:
+                    return
+                continue
+
+            for frame in frames:
+                if generator.random() < settings.gap_rate:
+                    exchange.gaps += 1
+                elif generator.random() < settings.out_of_order_ratio:
+                    self._late.append([generator.randint(1, settings.max_displacement), frame])
+                    exchange.late += 1
+                else:
+                    await self._send(exchange, frame)
+                    if generator.random() < settings.duplicate_rate:
+                        await self._send(exchange, frame)
+                        exchange.duplicates += 1
+
+                if generator.random() < settings.error_rate:
+                    await websocket.send(json.dumps({'type': 'error', 'message': 'Injected error', 'reason': 'soak'}))
+                    exchange.errors += 1
+                if generator.random() < settings.disconnect_rate:
+                    exchange.disconnects += 1
+                    await websocket.close(1011, 'Injected disconnect')
+                    return
+
+        await websocket.close(1008, 'Too slow')
+
+    async def _send(self, exchange: 'FakeExchange', frame: str):
+        await self.websocket.send(frame)
+        exchange.frames += 1
+        if not self._late:
+            return
+
+        due = []
+        for late in self._late:
+            late[0] -= 1
+            if late[0] <= 0:
+                due.append(late)
+        for late in due:
+            self._late.remove(late)
+            await self.websocket.send(late[1])
+            exchange.frames += 1
+
+
+class FakeExchange:
+    """
+    Local WebSocket server that speaks the Coinbase subscribe/match protocol, to test throughput and reconnections
+    without the live feed.
+
+    Matches of every product are generated at the rate of the settings, in sequence order, with prices following a
+    random walk and times stamped when they are generated, which makes the latency of a consumer measurable from them.
+    The same matches are broadcast to every connection subscribed to their product, and each connection then gets them
+    with its own faults injected: late, duplicate and missing matches, `error` messages and disconnections. A new
+    connection gets the `subscriptions` message and the `last_match` of each product first, as Coinbase does.
+    """
+
+    def __init__(self, settings: ExchangeSettings):
+        invalid = [str(i) for i, rate in settings.rates.items() if rate <= 0]
+        if invalid:
+            raise ValueError(f'Rates must be positive: {", ".join(invalid)}')
+
+        self._settings = settings
+        self._generator = random.Random(settings.seed)
+        self._prices = {i: to_ticks(STARTING_PRICES.get(i, '100.00'), i.price_decimals) for i in settings.rates}
+        self._sequences = {i: STARTING_SEQUENCES.get(i, 1) for i in settings.rates}
+        self._generated = {i: 0 for i in settings.rates}
+        self._last_matches: Dict[TradingPair, dict] = {}
+        self._connections: Set[_Connection] = set()
+        self.connections = 0
+        self.matches = 0
+        self.frames = 0
+        self.late = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.errors = 0
+        self.disconnects = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'connections': self.connections,
+            'matches': self.matches,
+            'frames': self.frames,
+            'late': self.late,
+            'duplicates': self.duplicates,
+            'gaps': self.gaps,
+            'errors': self.errors,
+            'disconnects': self.disconnects,
+        }
+
+    async def handle(self, websocket, path=None):
+        try:
+            request = json.loads(await websocket.recv())
+            products, invalid = set(), []
+            for product_id in request.get('product_ids', ()):
+                product = next((i for i in self._settings.rates if i.value == product_id), None)
+                if product is None:
+                    invalid.append(product_id)
+                else:
+                    products.add(product)
+            if request.get('type') != 'subscribe' or invalid:
+                reason = f'{", ".join(invalid)} is not a valid product' if invalid else 'Type must be subscribe'
+                await websocket.send(json.dumps({'type': 'error', 'message': 'Failed to subscribe', 'reason': reason}))
+                return
+
+            self.connections += 1
+            connection = _Connection(websocket, products, self._settings, self._settings.seed + self.connections)
+            await websocket.send(json.dumps({
+                'type': 'subscriptions',
+                'channels': [{'name': 'matches', 'product_ids': sorted(i.value for i in products)}],
+            }))
+            for product in products:
+                if product in self._last_matches:
+                    await websocket.send(json.dumps(dict(self._last_matches[product], type='last_match')))
+
+            self._connections.add(connection)
+            try:
+                await connection.run(self)
+            finally:
+                self._connections.discard(connection)
+        except ConnectionClosed:
+            pass
+
+    async def generate(self):
+        """
+        Generates the matches due every tick, and queues them for every connection subscribed to their product.
+        """
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(self._settings.tick)
+            elapsed = time.monotonic() - started
+            frames = []
+            for product, rate in self._settings.rates.items():
+                due = int(rate * elapsed) - self._generated[product]
+                for _ in range(due):
+                    frames.append((product, json.dumps(self._match(product))))
+                self._generated[product] += due
+            if frames:
+                for connection in list(self._connections):
+                    connection.put(frames)
+
+    async def serve(self, host='127.0.0.1', port=0, started: Optional[asyncio.Future] = None):
+        """
+        Serves the feed until cancelled, setting the port it listens on as the result of `started`.
+        """
+        generator = asyncio.ensure_future(self.generate())
+        try:
+            async with websockets.serve(self.handle, host, port) as server:
+                if started is not None:
+                    started.set_result(server.sockets[0].getsockname()[1])
+                await asyncio.Event().wait()
+        finally:
+            generator.cancel()
+
+    def _match(self, product: TradingPair) -> dict:
+        generator = self._generator
+        self._prices[product] = max(1, self._prices[product] + generator.randint(-5, 5))
+        self._sequences[product] += generator.randint(1, 5)
+        self.matches += 1
+        match = {
+            'type': 'match',
+            'trade_id': self._sequences[product] // 10,
+            'side': generator.choice(('buy', 'sell')),
+            'size': from_ticks(generator.randint(1, 2 * 10 ** product.size_decimals), product.size_decimals),
+            'price': from_ticks(self._prices[product], product.price_decimals),
+            'product_id': product.value,
+            'sequence': self._sequences[product],
+            'time': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        }
+        self._last_matches[product] = match
+        return match
+
+
+def parse_rates(values: Sequence[str]) -> Dict[TradingPair, float]:
+    """
+    Rates of products given as `PRODUCT=MATCHES_PER_SECOND`, such as `BTC-USD=500`, where new products can come with
+    the decimal places of their price and size, such as `DOGE-USD:4:1=50`.
+    """
+    rates = {}
+    for value in values:
+        products, _, rate = value.rpartition('=')
+        if not products:
+            raise ValueError(f'Invalid rate: {value}')
+        for product in parse_products(products):
+            rates[product] = float(rate)
+    return rates
+
+
+def add_exchange_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        '--rate', action='append', metavar='PRODUCT=PER_SECOND',
+        help='matches per second of a product, e.g. BTC-USD=500; repeat it for every product'
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out-of-order', type=float, default=0.0, help='share of the matches delivered late')
+    parser.add_argument('--max-displacement', type=int, default=10, help='how late, in frames, a match can be')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help='share of the matches delivered twice')
+    parser.add_argument('--gap-rate', type=float, default=0.0, help='share of the matches never delivered')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of the matches followed by an error')
+    parser.add_argument(
+        '--disconnect-rate', type=float, default=0.0, help='share of the matches followed by a disconnection'
+    )
+
+
+def exchange_settings(parser: argparse.ArgumentParser, args: argparse.Namespace) -> ExchangeSettings:
+    settings = ExchangeSettings(
+        seed=args.seed,
+        out_of_order_ratio=args.out_of_order,
+        max_displacement=args.max_displacement,
+        duplicate_rate=args.duplicate_rate,
+        gap_rate=args.gap_rate,
+        error_rate=args.error_rate,
+        disconnect_rate=args.disconnect_rate,
+    )
+    if args.rate:
+        try:
+            settings.rates = parse_rates(args.rate)
+        except (ValueError, KeyError) as e:
+            parser.error(f'invalid rates: {e}')
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake exchange speaking the Coinbase subscribe/match protocol')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_exchange_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    settings = exchange_settings(parser, args)
+    exchange = FakeExchange(settings)
+    logger.info(f'Serving the matches of {", ".join(str(i) for i in settings.rates)} on ws://{args.host}:{args.port}…')
+    try:
+        asyncio.run(exchange.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info(f'Stopped: {exchange.stats()}')
+
+
+if __name__ == '__main__':
+    main()
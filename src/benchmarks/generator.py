@@ -0,0 +1,104 @@
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from application.model import TradingPair
+
+STARTING_PRICES = {
+    TradingPair.BTC_USD: '55868.06',
+    TradingPair.ETH_USD: '1795.41',
+    TradingPair.ETH_BTC: '0.03218',
+}
+
+STARTING_SEQUENCES = {
+    TradingPair.BTC_USD: 22759566651,
+    TradingPair.ETH_USD: 16043817722,
+    TradingPair.ETH_BTC: 3041220340,
+}
+
+_STARTING_TIME = datetime(2021, 3, 16, 0, 10, 50, tzinfo=timezone.utc)
+
+
+@dataclass
+class StreamSettings:
+    """
+    Shape of a synthetic stream of Coinbase matches.
+
+    - `pairs`: relative share of the trades of each trading pair.
+    - `out_of_order_ratio`: share of the trades that are delivered late.
+    - `max_displacement`: how many positions later than its place in the stream a late trade can be delivered.
+    - `duplicate_rate`: share of the trades that are delivered twice.
+    """
+
+    count: int = 100000
+    seed: int = 42
+    pairs: Dict[TradingPair, float] = field(default_factory=lambda: {
+        TradingPair.BTC_USD: 0.6,
+        TradingPair.ETH_USD: 0.3,
+        TradingPair.ETH_BTC: 0.1,
+    })
+    out_of_order_ratio: float = 0.05
+    max_displacement: int = 10
+    duplicate_rate: float = 0.01
+
+
+def generate_payloads(settings: StreamSettings) -> List[dict]:
+    """
+    Generates the payloads of a stream of matches, deterministically for the same settings. Prices follow a random walk
+    on the tick size of each pair, and sequences and trade times increase for every trade of a pair before the stream
+    is shuffled out of order.
+    """
+    generator = random.Random(settings.seed)
+    pairs = list(settings.pairs)
+    weights = [settings.pairs[i] for i in pairs]
+
+    prices = {i: to_ticks(STARTING_PRICES.get(i, '100.00'), i.price_decimals) for i in pairs}
+    sequences = {i: STARTING_SEQUENCES.get(i, 1) for i in pairs}
+    time = _STARTING_TIME
+
+    payloads = []
+    for pair in generator.choices(pairs, weights, k=settings.count):
+        prices[pair] = max(1, prices[pair] + generator.randint(-5, 5))
+        sequences[pair] += generator.randint(1, 50)
+        time += timedelta(microseconds=generator.randint(1, 2000))
+
+        payloads.append({
+            'type': 'match',
+            'trade_id': sequences[pair] // 10,
+            'side': generator.choice(('buy', 'sell')),
+            'size': from_ticks(generator.randint(1, 2 * 10 ** pair.size_decimals), pair.size_decimals),
+            'price': from_ticks(prices[pair], pair.price_decimals),
+            'product_id': pair.value,
+            'sequence': sequences[pair],
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        })
+
+    # Late trades are delivered up to `max_displacement` positions after their place in the stream
+    positions = [
+        i + generator.randint(1, settings.max_displacement) + 0.5
+        if generator.random() < settings.out_of_order_ratio else i
+        for i in range(len(payloads))
+    ]
+    payloads = [payload for _, payload in sorted(zip(positions, payloads), key=lambda i: i[0])]
+
+    stream = []
+    for payload in payloads:
+        stream.append(payload)
+        if generator.random() < settings.duplicate_rate:
+            stream.append(dict(payload))
+    return stream
+
+
+def generate_frames(settings: StreamSettings) -> List[str]:
+    return [json.dumps(i) for i in generate_payloads(settings)]
+
+
+def to_ticks(value: str, decimals: int) -> int:
+    whole, _, fraction = value.partition('.')
+    return int(whole + fraction.ljust(decimals, '0'))
+
+
+def from_ticks(ticks: int, decimals: int) -> str:
+    return f'{ticks // 10 ** decimals}.{ticks % 10 ** decimals:0{decimals}d}'
@@ -0,0 +1,83 @@
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Sequence
+
+Operation = Callable[[Any], Any]
+
+# Builds a fresh operation for each measurement pass, so that state left by a pass does not leak into the next one
+Setup = Callable[[], Operation]
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    operations: int
+    operations_per_second: float
+    latency_ns: Dict[str, float]
+    retained_bytes_per_operation: float
+    retained_blocks_per_operation: float
+    peak_bytes_per_operation: float
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def measure(name: str, setup: Setup, inputs: Sequence[Any]) -> BenchmarkResult:
+    """
+    Runs an operation once per input in three separate passes: one timing the whole loop for the throughput, one timing
+    every call for the latency percentiles, and one tracing memory, which slows everything down.
+
+    The memory measured is what the operations retained once the pass is over, in bytes and blocks, and the peak of
+    what they held at once. Memory allocated and freed within the pass is not counted in the retained memory, so an
+    operation that allocates a lot of short-lived objects can retain nothing.
+    """
+    count = len(inputs)
+    if not count:
+        raise ValueError(f'Nothing to measure for {name}')
+
+    operation = setup()
+    gc.collect()
+    started = time.perf_counter_ns()
+    for i in inputs:
+        operation(i)
+    elapsed = time.perf_counter_ns() - started
+
+    operation = setup()
+    gc.collect()
+    latencies = []
+    for i in inputs:
+        started = time.perf_counter_ns()
+        operation(i)
+        latencies.append(time.perf_counter_ns() - started)
+
+    operation = setup()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in inputs:
+        operation(i)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    differences = after.compare_to(before, 'filename')
+
+    return BenchmarkResult(
+        name=name,
+        operations=count,
+        operations_per_second=count / (elapsed / 1e9) if elapsed else 0.0,
+        latency_ns=percentiles(latencies),
+        retained_bytes_per_operation=sum(i.size_diff for i in differences) / count,
+        retained_blocks_per_operation=sum(i.count_diff for i in differences) / count,
+        peak_bytes_per_operation=peak / count,
+    )
+
+
+def percentiles(latencies: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    result = {f'p{i:g}': float(ordered[min(len(ordered) - 1, int(len(ordered) * i / 100))]) for i in PERCENTILES}
+    result['max'] = float(ordered[-1])
+    return result
@@ -0,0 +1,196 @@
+import argparse
+import json
+import logging
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from application.coinbase import feed
+from application.coinbase.decoder import decode_message
+from application.coinbase.products import parse_products
+from application.coinbase.schema import deserialize_message
+from application.model import TradingPair, TradingPoint
+from application.numeric import DECIMAL, FIXED_POINT, FLOAT, NumericBackend
+from application.store import PointStore
+from application.vwap import VWAP
+from benchmarks.generator import StreamSettings, generate_payloads
+from benchmarks.harness import BenchmarkResult, measure
+
+BACKENDS = {
+    'decimal': DECIMAL,
+    'fixed': FIXED_POINT,
+    'float': FLOAT,
+}
+
+
+class Suite:
+    """
+    Benchmarks of the ingest pipeline over one synthetic stream of matches.
+    """
+
+    def __init__(self, settings: StreamSettings, window_size: int, backend: NumericBackend):
+        self._window_size = window_size
+        self._backend = backend
+        self._payloads = generate_payloads(settings)
+        self._frames = [json.dumps(i) for i in self._payloads]
+        self._points: List[TradingPoint] = [decode_message(i, backend) for i in self._frames]
+        self._pairs = list(settings.pairs)
+
+    def benchmarks(self) -> Dict[str, Callable[[], BenchmarkResult]]:
+        return {
+            'vwap.add': lambda: measure('vwap.add', self._vwap_add, self._points),
+            'vwap.current_value': lambda: measure('vwap.current_value', self._vwap_current_value, self._points),
+            'store.add': lambda: measure('store.add', self._store_add, self._points),
+            'store.vwap': lambda: measure('store.vwap', self._store_vwap, self._points),
+            'deserialize_message': lambda: measure('deserialize_message', self._deserialize, self._payloads),
+            'decode_message': lambda: measure('decode_message', self._decode, self._frames),
+            'feed.process': lambda: measure('feed.process', self._feed_process, self._points),
+        }
+
+    def _vwaps(self) -> Dict[TradingPair, VWAP]:
+        return {i: VWAP(i, max_size=self._window_size, backend=self._backend) for i in self._pairs}
+
+    def _stores(self) -> Dict[TradingPair, PointStore]:
+        return {i: PointStore(i, capacity=self._window_size, backend=self._backend) for i in self._pairs}
+
+    def _vwap_add(self):
+        vwaps = self._vwaps()
+        return lambda point: vwaps[point.pair].add(point)
+
+    def _vwap_current_value(self):
+        vwaps = self._vwaps()
+        for point in self._points:
+            vwaps[point.pair].add(point)
+        return lambda point: vwaps[point.pair].current_value()
+
+    def _store_add(self):
+        stores = self._stores()
+        return lambda point: stores[point.pair].add(point)
+
+    def _store_vwap(self):
+        stores = self._stores()
+        for point in self._points:
+            stores[point.pair].add(point)
+        return lambda point: stores[point.pair].vwap(self._window_size)
+
+    def _deserialize(self):
+        return lambda payload: deserialize_message(payload, self._backend)
+
+    def _decode(self):
+        return lambda frame: decode_message(frame, self._backend)
+
+    def _feed_process(self):
+        feed.configure(self._pairs, self._backend)
+        return feed.process
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_pairs(text: str, extra_pairs=0) -> Dict[TradingPair, float]:
+    pairs = {}
+    for item in text.split(','):
+        product, _, weight = item.partition('=')
+        pairs[parse_products(product)[0]] = float(weight or 1)
+
+    # Synthetic pairs, each trading as much as an average pair of the mix
+    weight = sum(pairs.values()) / len(pairs)
+    for i in range(extra_pairs):
+        pairs[TradingPair.register(f'SYN{i}-USD', price_decimals=2, size_decimals=8)] = weight
+    return pairs
+
+
+def _print_table(results: List[BenchmarkResult], baseline: Dict[str, dict]):
+    header = (
+        f'{"benchmark":<22}{"ops/s":>14}{"p50 ns":>10}{"p99 ns":>10}{"p99.9 ns":>10}'
+        f'{"retained B/op":>15}{"retained blocks/op":>20}'
+    )
+    if baseline:
+        header += f'{"vs base":>10}'
+    print(header)
+
+    for result in results:
+        line = (
+            f'{result.name:<22}{result.operations_per_second:>14,.0f}'
+            f'{result.latency_ns["p50"]:>10,.0f}{result.latency_ns["p99"]:>10,.0f}{result.latency_ns["p99.9"]:>10,.0f}'
+            f'{result.retained_bytes_per_operation:>15.1f}{result.retained_blocks_per_operation:>20.2f}'
+        )
+        if result.name in baseline:
+            line += f'{result.operations_per_second / baseline[result.name]["operations_per_second"]:>9.2f}x'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the VWAP ingest pipeline')
+    parser.add_argument('benchmarks', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('--count', type=int, default=50000, help='number of matches in the stream')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument(
+        '--pairs', default='BTC-USD=0.6,ETH-USD=0.3,ETH-BTC=0.1',
+        help='pair mix, e.g. BTC-USD=2,ETH-BTC=1, with the decimal places of new pairs, e.g. DOGE-USD:4:1=1'
+    )
+    parser.add_argument(
+        '--extra-pairs', type=int, default=0,
+        help='add this many synthetic pairs to the mix, e.g. to check that dispatch does not slow down with more pairs'
+    )
+    parser.add_argument('--window-size', type=int, default=200)
+    parser.add_argument('--out-of-order', type=float, default=0.05, help='share of late trades')
+    parser.add_argument('--max-displacement', type=int, default=10, help='how late, in positions, a trade can be')
+    parser.add_argument('--duplicates', type=float, default=0.01, help='share of trades delivered twice')
+    parser.add_argument('--backend', choices=BACKENDS, default='fixed')
+    parser.add_argument('--output', metavar='PATH', help='save the results as JSON into this file')
+    parser.add_argument('--baseline', metavar='PATH', help='compare with results saved by a previous run')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    settings = StreamSettings(
+        count=args.count,
+        seed=args.seed,
+        pairs=_parse_pairs(args.pairs, args.extra_pairs),
+        out_of_order_ratio=args.out_of_order,
+        max_displacement=args.max_displacement,
+        duplicate_rate=args.duplicates,
+    )
+    suite = Suite(settings, window_size=args.window_size, backend=BACKENDS[args.backend])
+    benchmarks = suite.benchmarks()
+
+    unknown = set(args.benchmarks) - set(benchmarks)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    results = [benchmarks[i]() for i in (args.benchmarks or benchmarks)]
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = {i['name']: i for i in json.load(file)['results']}
+    _print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'commit': _git_commit(),
+                'time': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'settings': {
+                    'count': settings.count,
+                    'seed': settings.seed,
+                    'pairs': {str(k): v for k, v in settings.pairs.items()},
+                    'out_of_order_ratio': settings.out_of_order_ratio,
+                    'max_displacement': settings.max_displacement,
+                    'duplicate_rate': settings.duplicate_rate,
+                    'window_size': args.window_size,
+                    'backend': args.backend,
+                },
+                'results': [i.to_dict() for i in results],
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+from application.coinbase import feed
+from application.coinbase.adapter import CoinbaseAdapter
+from application.model import TradingPair, TradingPoint
+from application.numeric import FIXED_POINT
+from benchmarks.exchange import ExchangeSettings, FakeExchange, add_exchange_arguments, exchange_settings
+from benchmarks.harness import percentiles
+
+# Latencies kept for the percentiles of a whole run, sampled uniformly, so that a long run takes a fixed amount of
+# memory and does not show up in its own memory growth
+RESERVOIR_SIZE = 100000
+
+# How long to wait at most for the exchange process to start and to stop, and for the first matches to reach the
+# windows, in seconds
+EXCHANGE_TIMEOUT = 10.0
+
+
+def resident_bytes() -> int:
+    """
+    Resident set size of the process, or its peak where `/proc` is not available.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LatencySampler:
+    """
+    Latencies of the current interval, and a uniform sample of those of the whole run, kept by reservoir sampling.
+    See → https://en.wikipedia.org/wiki/Reservoir_sampling
+    """
+
+    def __init__(self, reservoir_size=RESERVOIR_SIZE, seed=42):
+        self._reservoir_size = reservoir_size
+        self._generator = random.Random(seed)
+        self._interval: List[float] = []
+        self._reservoir: List[float] = []
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def reservoir(self) -> Sequence[float]:
+        return self._reservoir
+
+    def add(self, latency: float):
+        self._interval.append(latency)
+        self._count += 1
+        if len(self._reservoir) < self._reservoir_size:
+            self._reservoir.append(latency)
+        else:
+            index = self._generator.randrange(self._count)
+            if index < self._reservoir_size:
+                self._reservoir[index] = latency
+
+    def take_interval(self) -> List[float]:
+        latencies, self._interval = self._interval, []
+        return latencies
+
+    def reset(self):
+        self._interval, self._reservoir, self._count = [], [], 0
+
+
+@dataclass
+class SoakInterval:
+    elapsed: float
+    matches_per_second: float
+    latency_ms: Dict[str, float]
+    resident_bytes: int
+
+
+@dataclass
+class SoakReport:
+    duration: float
+    matches: int
+    matches_per_second: float
+    latency_ms: Dict[str, float]
+    resident_bytes_start: int
+    resident_bytes_end: int
+    memory_growth_bytes_per_hour: float
+    reconnects: int
+    missing_sequences: int
+    intervals: List[SoakInterval]
+    exchange: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__, intervals=[dict(i.__dict__) for i in self.intervals])
+
+
+def serve_exchange(settings: ExchangeSettings, output, stop):
+    """
+    Entry point of the exchange process, which puts the port it listens on into the `output` queue, and then its stats
+    once `stop` is set, before closing its connections, which can take as long as their closing handshakes.
+    """
+    exchange = FakeExchange(settings)
+
+    async def serve():
+        loop = asyncio.get_event_loop()
+        started = loop.create_future()
+        server = asyncio.ensure_future(exchange.serve(started=started))
+        output.put(await started)
+        await loop.run_in_executor(None, stop.wait)
+        output.put(exchange.stats())
+        server.cancel()
+
+    asyncio.run(serve())
+
+
+def run_soak(
+        settings: ExchangeSettings,
+        duration: float,
+        warmup=5.0,
+        interval=10.0,
+        connections=1,
+        on_interval: Optional[Callable[[SoakInterval], None]] = None,
+        context=None,
+        timeout=EXCHANGE_TIMEOUT
+) -> SoakReport:
+    """
+    Runs the feed against a fake exchange served by another process for `duration` seconds after a `warmup`, and
+    measures every `interval` seconds how many matches per second it processed, the latency from the time the exchange
+    stamped a match to when its VWAPs were computed, and the resident memory of the process. Only the matches that reach
+    the windows are measured, leaving out the duplicates and the `last_match` sent again that the feed drops.
+
+    The warmup lasts until the first matches reached the windows too, waiting for them for up to `timeout` seconds, as
+    for the exchange process to start and to stop.
+
+    The feed runs as it does in production, on its own event loop with the Coinbase adapter pointed at the exchange,
+    and its globals are restored afterwards.
+    """
+    context = context or multiprocessing.get_context()
+    output = context.Queue()
+    stop = context.Event()
+    process = context.Process(target=serve_exchange, args=(settings, output, stop), name='exchange', daemon=True)
+    process.start()
+
+    saved = {
+        name: getattr(feed, name)
+        for name in (
+            'adapter', 'CONNECTIONS', 'emit', 'apply', 'reconnects', 'disconnected_at', 'recovery_seconds'
+        )
+    }
+    trading_pairs, backend = feed.TRADING_PAIRS, feed.NUMERIC_BACKEND
+    try:
+        port = output.get(timeout=timeout)
+        feed.configure(list(settings.rates), FIXED_POINT)
+        feed.adapter = CoinbaseAdapter(f'ws://127.0.0.1:{port}', venue='exchange')
+        feed.CONNECTIONS = connections
+        feed.emit = lambda updates: None
+        report = asyncio.run(_soak(duration, warmup, interval, on_interval, stop.set, timeout))
+        report.exchange = output.get(timeout=timeout)
+        return report
+    finally:
+        for name, value in saved.items():
+            setattr(feed, name, value)
+        feed.configure(trading_pairs, backend)
+        stop.set()
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+
+
+async def _soak(
+        duration: float,
+        warmup: float,
+        interval: float,
+        on_interval: Optional[Callable[[SoakInterval], None]],
+        stop_exchange: Callable[[], None],
+        timeout: float
+) -> SoakReport:
+    sampler = LatencySampler()
+    apply = feed.apply
+
+    def measured_apply(points_by_pair: Dict[TradingPair, List[TradingPoint]]):
+        apply(points_by_pair)
+        now = datetime.now(timezone.utc)
+        for points in points_by_pair.values():
+            for point in points:
+                sampler.add((now - point.time).total_seconds() * 1000)
+
+    feed.apply = measured_apply
+    event_loop = asyncio.ensure_future(feed.event_loop())
+    try:
+        await _wait(event_loop, warmup)
+        deadline = time.monotonic() + timeout
+        while not sampler.count:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'No match reached the windows within {timeout}s')
+            await _wait(event_loop, 0.01)
+        sampler.reset()
+        reconnects = feed.reconnects
+        resident_bytes_start = resident_bytes()
+        started = last = time.monotonic()
+
+        intervals: List[SoakInterval] = []
+        while last - started < duration:
+            await _wait(event_loop, min(interval, duration - (last - started)))
+            now = time.monotonic()
+            latencies = sampler.take_interval()
+            intervals.append(SoakInterval(
+                elapsed=now - started,
+                matches_per_second=len(latencies) / (now - last),
+                latency_ms=percentiles(latencies) if latencies else {},
+                resident_bytes=resident_bytes(),
+            ))
+            last = now
+            if on_interval:
+                on_interval(intervals[-1])
+
+        elapsed = last - started
+        resident_bytes_end = resident_bytes()
+        report = SoakReport(
+            duration=elapsed,
+            matches=sampler.count,
+            matches_per_second=sampler.count / elapsed,
+            latency_ms=percentiles(sampler.reservoir) if sampler.count else {},
+            resident_bytes_start=resident_bytes_start,
+            resident_bytes_end=resident_bytes_end,
+            memory_growth_bytes_per_hour=(resident_bytes_end - resident_bytes_start) / elapsed * 3600,
+            reconnects=feed.reconnects - reconnects,
+            missing_sequences=sum(feed.sequence_gaps.missing(i) for i in feed.sequence_gaps.trading_pairs),
+            intervals=intervals,
+        )
+
+        # The exchange closes the connection while the feed still reads it: a feed cancelled first would leave the
+        # frames in flight unread, and its closing handshake would time out behind them. The feed is cancelled as soon
+        # as it stopped reading, before it reconnects, since a connection opened while the exchange closes would time
+        # out the same way
+        frame_queue = feed.frame_queue
+        stop_exchange()
+        deadline = time.monotonic() + timeout
+        while not frame_queue.closed and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return report
+    finally:
+        # The feed can miss a cancellation that comes in just as it wakes up, such as when a frame arrives, so it is
+        # cancelled again until it stopped
+        while not event_loop.done():
+            event_loop.cancel()
+            await asyncio.wait((event_loop,), timeout=0.1)
+
+
+async def _wait(event_loop: asyncio.Future, seconds: float):
+    """
+    Sleeps while the feed runs, and raises its failure if it stopped.
+    """
+    await asyncio.wait((event_loop,), timeout=seconds)
+    if event_loop.done():
+        event_loop.result()
+        raise RuntimeError('The feed stopped')
+
+
+def _print_interval(result: SoakInterval):
+    latency = result.latency_ms
+    print(
+        f'{result.elapsed:>8.0f}{result.matches_per_second:>12,.0f}{latency.get("p50", 0):>10.2f}'
+        f'{latency.get("p99", 0):>10.2f}{latency.get("max", 0):>10.2f}{result.resident_bytes / 2 ** 20:>10.1f}',
+        flush=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Soak test of the feed against a local fake exchange, reporting throughput, end-to-end latency '
+                    'and memory growth'
+    )
+    parser.add_argument('--duration', type=float, default=60.0, metavar='SECONDS', help='how long to measure')
+    parser.add_argument(
+        '--warmup', type=float, default=5.0, metavar='SECONDS', help='how long to run before measuring'
+    )
+    parser.add_argument('--interval', type=float, default=10.0, metavar='SECONDS', help='how often to report')
+    parser.add_argument('--connections', type=int, default=1, help='connections of the feed, as with the feed itself')
+    add_exchange_arguments(parser)
+    parser.add_argument('--output', metavar='PATH', help='save the report as JSON into this file')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    settings = exchange_settings(parser, args)
+
+    print(f'{"seconds":>8}{"matches/s":>12}{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}{"RSS MiB":>10}')
+    report = run_soak(settings, args.duration, args.warmup, args.interval, args.connections, _print_interval)
+    print(
+        f'{report.matches:,} matches in {report.duration:.0f}s: {report.matches_per_second:,.0f}/s, latency '
+        f'p50 {report.latency_ms.get("p50", 0):.2f}ms p99 {report.latency_ms.get("p99", 0):.2f}ms, memory growth '
+        f'{report.memory_growth_bytes_per_hour / 2 ** 20:,.1f} MiB/h, {report.reconnects} reconnections'
+    )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'settings': vars(args), 'report': report.to_dict()}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List
+
+from application.model import Point, TradingPair, TradingPoint
+from application.numeric import FIXED_POINT
+from application.store import PointStore
+from application.vectorized import ArrayPointStore, np
+
+ENGINES: Dict[str, Callable[[int], object]] = {
+    'python': lambda capacity: PointStore(TradingPair.BTC_USD, capacity=capacity, backend=FIXED_POINT),
+    'numpy': lambda capacity: ArrayPointStore(TradingPair.BTC_USD, capacity=capacity, backend=FIXED_POINT),
+}
+
+WINDOW_SIZES = (200, 1000, 10000, 100000, 1000000, 10000000)
+
+# Windows whose VWAPs are recomputed together, besides the full window, as the feed does
+SMALLER_WINDOWS = (50, 200, 1000, 10000)
+
+_STARTING_TIME = datetime(2021, 3, 16, 0, 10, 50, tzinfo=timezone.utc)
+
+
+@dataclass
+class WindowResult:
+    engine: str
+    window_size: int
+    load_points_per_second: float
+    vwap_ns: float
+    vwaps_ns: float
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def generate_batches(count: int, batch_size: int, seed: int, out_of_order_ratio=0.05) -> Iterator[List[TradingPoint]]:
+    """
+    Fixed-point BTC-USD trades in batches, a share of which are shuffled within their batch. Points are built one batch
+    at a time, so that ten million of them never need to be held at once.
+    """
+    generator = random.Random(seed)
+    price = 5586806
+    for start in range(0, count, batch_size):
+        batch = []
+        for sequence in range(start, min(count, start + batch_size)):
+            price = max(1, price + generator.randint(-500, 500))
+            batch.append(Point(
+                pair=TradingPair.BTC_USD,
+                quantity=generator.randint(1, 10 ** 8),
+                price=price,
+                sequence=sequence,
+                time=_STARTING_TIME + timedelta(milliseconds=sequence),
+            ))
+        for i in range(int(len(batch) * out_of_order_ratio)):
+            j, k = generator.randrange(len(batch)), generator.randrange(len(batch))
+            batch[j], batch[k] = batch[k], batch[j]
+        yield batch
+
+
+def measure_window(engine: str, window_size: int, batch_size: int, repeat: int, seed: int) -> WindowResult:
+    """
+    Fills a store of the window size with as many points, one batch at a time, then times the VWAP of the full window
+    and the VWAPs of the full and every smaller window together.
+    """
+    store = ENGINES[engine](window_size)
+
+    elapsed = 0
+    for batch in generate_batches(window_size, batch_size, seed):
+        started = time.perf_counter_ns()
+        store.add_many(batch)
+        elapsed += time.perf_counter_ns() - started
+
+    sizes = [i for i in SMALLER_WINDOWS if i < window_size] + [window_size]
+
+    def median_ns(query: Callable[[], object]) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            query()
+            timings.append(time.perf_counter_ns() - started)
+        return statistics.median(timings)
+
+    return WindowResult(
+        engine=engine,
+        window_size=window_size,
+        load_points_per_second=window_size / (elapsed / 1e9) if elapsed else 0.0,
+        vwap_ns=median_ns(lambda: store.vwap(window_size)),
+        vwaps_ns=median_ns(lambda: store.vwaps(sizes)),
+    )
+
+
+def _print_row(result: WindowResult):
+    print(
+        f'{result.engine:<8}{result.window_size:>12,}{result.load_points_per_second:>16,.0f}'
+        f'{result.vwap_ns:>14,.0f}{result.vwaps_ns:>14,.0f}',
+        flush=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks of the pure-Python and NumPy point stores over window sizes from 200 to 10 million'
+    )
+    parser.add_argument(
+        '--window-sizes', default=','.join(str(i) for i in WINDOW_SIZES),
+        help='comma-separated window sizes, each of them filled with as many points'
+    )
+    parser.add_argument('--engines', default=','.join(ENGINES), help='comma-separated engines: python, numpy')
+    parser.add_argument('--batch-size', type=int, default=1000, help='points added at once with add_many')
+    parser.add_argument('--repeat', type=int, default=20, help='how many times every query is timed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', metavar='PATH', help='save the results as JSON into this file')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    engines = args.engines.split(',')
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f'unknown engines: {", ".join(sorted(unknown))}')
+    if 'numpy' in engines and np is None:
+        parser.error('the numpy engine requires the numpy package: pip install numpy')
+
+    print(f'{"engine":<8}{"window":>12}{"load points/s":>16}{"vwap ns":>14}{"vwaps ns":>14}')
+    results = []
+    for window_size in (int(i) for i in args.window_sizes.split(',')):
+        for engine in engines:
+            results.append(measure_window(engine, window_size, args.batch_size, args.repeat, args.seed))
+            _print_row(results[-1])
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'settings': {'batch_size': args.batch_size, 'repeat': args.repeat, 'seed': args.seed},
+                'results': [i.to_dict() for i in results],
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from application.bars import Bar, BarRollup, BarSeries, parse_duration
+from application.model import TradingPair, TradingPoint
+from tests.points import new_point
+
+START = datetime(2021, 3, 16, tzinfo=timezone.utc)
+
+
+def at(sequence: int, seconds: float, price='100', quantity='1') -> TradingPoint:
+    return new_point(sequence=sequence, time=START + timedelta(seconds=seconds), price=price, quantity=quantity)
+
+
+class TestBarSeries:
+
+    def test_reset_the_slot_of_a_bar_when_a_newer_bar_takes_it(self):
+        series = BarSeries(timedelta(seconds=1), capacity=2)
+
+        series.add(1, price=100, size=1, time=0)
+        series.add(2, price=200, size=1, time=2 * 10 ** 9)
+
+        assert series.sums(0) == (0, 0)
+        assert series.sums(2) == (1, 200)
+        assert not series.holds(0)
+
+    def test_discard_the_trades_older_than_every_retained_bar(self):
+        series = BarSeries(timedelta(seconds=1), capacity=2)
+
+        series.add(2, price=200, size=1, time=5 * 10 ** 9)
+        series.add(1, price=100, size=1, time=3 * 10 ** 9)
+
+        assert series.discarded == 1
+        assert series.get(3) is None
+
+
+class TestBarRollup:
+
+    def test_roll_up_trades_into_ohlcv_bars_of_every_resolution(self):
+        rollup = BarRollup(TradingPair.BTC_USD)
+
+        rollup.add_many([
+            at(1, 0.1, price='100', quantity='1'),
+            at(2, 0.5, price='300', quantity='2'),
+            at(3, 0.9, price='50', quantity='1'),
+            at(4, 61, price='200', quantity='1'),
+        ])
+
+        assert rollup.bars(timedelta(seconds=1), START) == [
+            Bar(START, Decimal(100), Decimal(300), Decimal(50), Decimal(50), Decimal(4), Decimal(750), 3),
+            Bar(START + timedelta(seconds=61), *[Decimal(200)] * 4, Decimal(1), Decimal(200), 1),
+        ]
+        minute, = rollup.bars(timedelta(minutes=1), START, START + timedelta(seconds=30))
+        assert (minute.open, minute.close, minute.trades) == (Decimal(100), Decimal(50), 3)
+        hour, = rollup.bars(timedelta(hours=1), START)
+        assert (hour.open, hour.high, hour.low, hour.close, hour.volume) == (100, 300, 50, 200, 5)
+
+    def test_update_the_bar_of_a_late_trade_with_its_open_and_close_by_sequence(self):
+        rollup = BarRollup(TradingPair.BTC_USD)
+        rollup.add_many([at(2, 0.5, price='200'), at(5, 30, price='400')])
+
+        rollup.add_many([at(1, 0.2, price='100'), at(3, 0.7, price='300')])
+
+        bar, _ = rollup.bars(timedelta(seconds=1), START)
+        assert (bar.open, bar.high, bar.low, bar.close, bar.trades) == (100, 300, 100, 300, 3)
+
+    def test_compute_the_vwap_of_an_interval_from_bars_of_several_resolutions(self):
+        rollup = BarRollup(TradingPair.BTC_USD)
+        points = [at(i, i * 7.5, price=f'{100 + i % 7}', quantity=f'{1 + i % 3}') for i in range(2000)]
+        rollup.add_many(points)
+
+        def expected(start: datetime, end: datetime) -> Decimal:
+            window = [i for i in points if start <= i.time < end]
+            return sum(i.price * i.quantity for i in window) / sum(i.quantity for i in window)
+
+        # Only the last hour of 1s bars is retained, so earlier bounds must fall on a minute
+        for start, end in (
+            (START + timedelta(minutes=59), START + timedelta(hours=2, minutes=1)),
+            (START, START + timedelta(hours=3, minutes=1)),
+            (START + timedelta(hours=4), START + timedelta(hours=4, minutes=10, seconds=15)),
+        ):
+            assert rollup.vwap(start, end) == expected(start, end)
+        assert rollup.vwap(START) == expected(START, START + timedelta(days=1))
+
+    def test_round_the_bounds_of_an_interval_outwards_to_the_finest_bars_retained(self):
+        rollup = BarRollup(TradingPair.BTC_USD, resolutions=((timedelta(seconds=1), 10), (timedelta(minutes=1), 10)))
+        rollup.add_many([at(1, 5, price='100'), at(2, 50, price='200'), at(3, 125, price='300')])
+
+        # The 1s bars before the newest 10 seconds are gone, so the interval starts at the minute
+        assert rollup.vwap(START + timedelta(seconds=30), START + timedelta(seconds=125.5)) == 200
+        assert rollup.vwap(START + timedelta(seconds=124), START + timedelta(seconds=125.5)) == 300
+
+    def test_fail_to_compute_the_vwap_of_an_interval_older_than_every_retained_bar(self):
+        rollup = BarRollup(TradingPair.BTC_USD, resolutions=((timedelta(seconds=1), 10),))
+        rollup.add(at(1, 100))
+
+        with pytest.raises(ValueError) as e:
+            rollup.vwap(START)
+
+        assert str(e.value) == f'Interval starts before the oldest bar retained: {START}'
+
+    def test_start_an_interval_at_the_oldest_bar_retained_at_the_earliest(self):
+        rollup = BarRollup(TradingPair.BTC_USD, resolutions=((timedelta(seconds=1), 10), (timedelta(minutes=1), 10)))
+        assert rollup.oldest_time is None
+
+        rollup.add_many([at(1, 5, price='100'), at(2, 545, price='200'), at(3, 605, price='300')])
+
+        # The newest 10 minute bars are retained, from the one of 60 to 119 seconds onwards, without the first trade
+        assert rollup.oldest_time == START + timedelta(minutes=1)
+        assert rollup.vwap(rollup.oldest_time) == 250
+        with pytest.raises(ValueError):
+            rollup.vwap(rollup.newest_time - timedelta(minutes=10))
+
+    def test_compute_the_vwap_when_there_are_no_trades(self):
+        rollup = BarRollup(TradingPair.BTC_USD)
+
+        assert rollup.vwap(START) == Decimal(0)
+        assert rollup.bars(timedelta(minutes=1), START) == []
+
+    def test_load_the_bars_of_a_copy_into_an_empty_rollup(self):
+        rollup = BarRollup(TradingPair.BTC_USD)
+        rollup.add_many([at(1, 0.5, price='100'), at(2, 3600, price='300')])
+        copied = rollup.copy()
+        rollup.add(at(3, 3601, price='500'))
+
+        loaded = BarRollup(TradingPair.BTC_USD)
+        loaded.load(copied.newest_time, copied.rows())
+
+        assert loaded.bars(timedelta(seconds=1), START) == copied.bars(timedelta(seconds=1), START)
+        assert loaded.newest_time == START + timedelta(seconds=3600)
+        assert loaded.vwap(START) == Decimal(200)
+        loaded.add(at(0, 0.1, price='50'))
+        assert loaded.bars(timedelta(hours=1), START)[0].open == Decimal(50)
+
+    def test_fail_when_resolutions_are_not_multiples_of_each_other(self):
+        with pytest.raises(ValueError) as e:
+            BarRollup(TradingPair.BTC_USD, resolutions=((timedelta(seconds=7), 10), (timedelta(minutes=1), 10)))
+
+        assert str(e.value) == 'Resolutions must be increasing multiples of each other: 0:00:07, 0:01:00'
+
+    def test_fail_when_trying_to_add_point_that_does_not_belong_to_the_rollup_trading_pair(self):
+        rollup = BarRollup(TradingPair.ETH_BTC)
+
+        with pytest.raises(ValueError) as e:
+            rollup.add(new_point(pair='BTC-USD'))
+
+        assert str(e.value) == 'Unsupported trading pair: BTC-USD'
+
+
+def test_parse_durations():
+    assert parse_duration('90s') == timedelta(seconds=90)
+    assert parse_duration('24h') == timedelta(hours=24)
+    assert parse_duration('7d') == timedelta(days=7)
+
+    with pytest.raises(ValueError) as e:
+        parse_duration('1w')
+
+    assert str(e.value) == 'Invalid duration: 1w'
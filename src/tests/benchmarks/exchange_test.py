@@ -0,0 +1,87 @@
+import asyncio
+import json
+from typing import List
+
+import pytest
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from application.model import TradingPair
+from benchmarks.exchange import ExchangeSettings, FakeExchange, parse_rates
+
+
+def receive(settings: ExchangeSettings, product_ids: List[str], frames: int) -> List[dict]:
+    """
+    Subscribes to the products on a fake exchange, and returns the messages received until `frames` of them or the
+    connection closed, leaving out the `last_match` of the matches generated before the subscription, if any.
+    """
+    async def run():
+        exchange = FakeExchange(settings)
+        started = asyncio.get_event_loop().create_future()
+        server = asyncio.ensure_future(exchange.serve(started=started))
+        received = []
+        try:
+            async with websockets.connect(f'ws://127.0.0.1:{await started}') as websocket:
+                await websocket.send(json.dumps({
+                    'type': 'subscribe', 'product_ids': product_ids, 'channels': ['matches']
+                }))
+                while len(received) < frames:
+                    message = json.loads(await asyncio.wait_for(websocket.recv(), 5))
+                    if message['type'] != 'last_match':
+                        received.append(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            server.cancel()
+        return received
+
+    return asyncio.run(run())
+
+
+def test_send_the_matches_of_the_subscribed_products_in_sequence_order():
+    settings = ExchangeSettings(rates={TradingPair.BTC_USD: 1000, TradingPair.ETH_USD: 1000})
+
+    subscriptions, *matches = receive(settings, ['BTC-USD'], 21)
+
+    assert subscriptions['channels'] == [{'name': 'matches', 'product_ids': ['BTC-USD']}]
+    assert {i['type'] for i in matches} == {'match'}
+    assert {i['product_id'] for i in matches} == {'BTC-USD'}
+    sequences = [i['sequence'] for i in matches]
+    assert sequences == sorted(set(sequences))
+
+
+def test_inject_duplicates_and_late_matches():
+    settings = ExchangeSettings(
+        rates={TradingPair.BTC_USD: 1000}, duplicate_rate=0.2, out_of_order_ratio=0.2, max_displacement=3
+    )
+
+    _, *matches = receive(settings, ['BTC-USD'], 101)
+
+    sequences = [i['sequence'] for i in matches]
+    assert len(set(sequences)) < len(sequences)
+    assert sequences != sorted(sequences)
+
+
+def test_inject_errors_and_disconnections():
+    matches = receive(ExchangeSettings(rates={TradingPair.BTC_USD: 1000}, error_rate=1.0), ['BTC-USD'], 3)
+    assert [i['type'] for i in matches] == ['subscriptions', 'match', 'error']
+
+    matches = receive(ExchangeSettings(rates={TradingPair.BTC_USD: 1000}, disconnect_rate=1.0), ['BTC-USD'], 10)
+    assert [i['type'] for i in matches] == ['subscriptions', 'match']
+
+
+def test_reject_a_subscription_to_an_unknown_product():
+    error, = receive(ExchangeSettings(rates={TradingPair.BTC_USD: 1000}), ['ETH-USD'], 1)
+
+    assert error == {'type': 'error', 'message': 'Failed to subscribe', 'reason': 'ETH-USD is not a valid product'}
+
+
+def test_parse_the_rates_of_products():
+    assert parse_rates(['BTC-USD=500', 'ETH-USD,ETH-BTC=20.5']) == {
+        TradingPair.BTC_USD: 500.0,
+        TradingPair.ETH_USD: 20.5,
+        TradingPair.ETH_BTC: 20.5,
+    }
+
+    with pytest.raises(ValueError):
+        parse_rates(['500'])
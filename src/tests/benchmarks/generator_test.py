@@ -0,0 +1,56 @@
+from collections import Counter
+
+from application.coinbase.decoder import decode_message
+from application.model import TradingPair
+from application.numeric import FIXED_POINT
+from benchmarks.generator import StreamSettings, generate_frames, generate_payloads
+
+
+def test_generate_the_same_stream_for_the_same_seed():
+    assert generate_frames(StreamSettings(count=100, seed=7)) == generate_frames(StreamSettings(count=100, seed=7))
+    assert generate_frames(StreamSettings(count=100, seed=7)) != generate_frames(StreamSettings(count=100, seed=8))
+
+
+def test_generate_matches_that_the_feed_can_decode():
+    for frame in generate_frames(StreamSettings(count=300)):
+        assert decode_message(frame, FIXED_POINT) is not None
+
+
+def test_generate_trades_following_the_pair_mix():
+    payloads = generate_payloads(StreamSettings(count=10000, pairs={TradingPair.BTC_USD: 3, TradingPair.ETH_BTC: 1}))
+
+    counts = Counter(i['product_id'] for i in payloads)
+
+    assert set(counts) == {'BTC-USD', 'ETH-BTC'}
+    assert 2.7 < counts['BTC-USD'] / counts['ETH-BTC'] < 3.3
+
+
+def test_generate_an_in_order_stream_without_duplicates():
+    payloads = generate_payloads(StreamSettings(count=1000, out_of_order_ratio=0, duplicate_rate=0))
+
+    sequences = [i['sequence'] for i in payloads if i['product_id'] == 'BTC-USD']
+    assert sequences == sorted(set(sequences))
+
+
+def test_generate_late_trades_within_the_maximum_displacement():
+    settings = StreamSettings(
+        count=5000,
+        pairs={TradingPair.BTC_USD: 1},
+        out_of_order_ratio=0.2,
+        max_displacement=4,
+        duplicate_rate=0
+    )
+    sequences = [i['sequence'] for i in generate_payloads(settings)]
+
+    ranks = {sequence: rank for rank, sequence in enumerate(sorted(sequences))}
+    displacements = [position - ranks[sequence] for position, sequence in enumerate(sequences)]
+
+    assert sum(1 for i in displacements if i > 0) > 500
+    assert max(displacements) <= 4
+
+
+def test_generate_duplicates():
+    payloads = generate_payloads(StreamSettings(count=5000, duplicate_rate=0.1))
+
+    assert 5300 < len(payloads) < 5700
+    assert len({(i['product_id'], i['sequence']) for i in payloads}) == 5000
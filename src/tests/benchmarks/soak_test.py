@@ -0,0 +1,39 @@
+import multiprocessing
+
+from application.coinbase import feed
+from application.model import TradingPair
+from benchmarks.exchange import ExchangeSettings
+from benchmarks.soak import LatencySampler, run_soak
+
+
+def test_run_the_feed_against_the_fake_exchange_and_report_every_interval():
+    adapter, trading_pairs, reconnects = feed.adapter, feed.TRADING_PAIRS, feed.reconnects
+    intervals = []
+
+    report = run_soak(
+        ExchangeSettings(rates={TradingPair.BTC_USD: 200}, duplicate_rate=0.05), duration=1.0, warmup=0.3,
+        interval=0.5, on_interval=intervals.append, context=multiprocessing.get_context('fork'), timeout=5.0
+    )
+
+    assert report.matches > 0
+    assert report.matches_per_second > 0
+    assert set(report.latency_ms) == {'p50', 'p90', 'p99', 'p99.9', 'max'}
+    assert report.resident_bytes_end > 0
+    # Duplicates are dropped before they reach the windows, so they are not measured
+    assert report.exchange['duplicates'] > 0
+    assert report.matches <= report.exchange['matches']
+    assert intervals == report.intervals and len(intervals) == 2
+    assert (feed.adapter, feed.TRADING_PAIRS, feed.reconnects) == (adapter, trading_pairs, reconnects)
+
+
+def test_keep_a_uniform_sample_of_a_fixed_size():
+    sampler = LatencySampler(reservoir_size=100)
+
+    for i in range(10000):
+        sampler.add(float(i))
+
+    assert sampler.count == 10000
+    assert len(sampler.reservoir) == 100
+    assert 3000 < sum(sampler.reservoir) / 100 < 7000
+    assert len(sampler.take_interval()) == 10000
+    assert sampler.take_interval() == []
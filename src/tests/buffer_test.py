@@ -0,0 +1,85 @@
+import pytest
+
+from application.buffer import PointBuffer
+
+
+def sequences(buffer: PointBuffer):
+    return [buffer.sequence(i) for i in range(len(buffer))]
+
+
+def add(buffer: PointBuffer, sequence: int, price: int = 5586806, size: int = 2450000, time: int = 0):
+    buffer.insert(buffer.bisect(sequence), sequence, price, size, time)
+
+
+def test_take_32_bytes_per_point():
+    assert PointBuffer.BYTES_PER_POINT == 32
+
+
+def test_insert_points_ensuring_the_buffer_remains_sorted_by_sequence():
+    buffer = PointBuffer(capacity=8)
+
+    for sequence in (30, 10, 50, 20, 40):
+        add(buffer, sequence)
+
+    assert sequences(buffer) == [10, 20, 30, 40, 50]
+
+
+def test_keep_every_column_of_a_point_together_when_shifting():
+    buffer = PointBuffer(capacity=4)
+
+    add(buffer, 2, price=200, size=20, time=2000)
+    add(buffer, 3, price=300, size=30, time=3000)
+    add(buffer, 1, price=100, size=10, time=1000)
+
+    assert [buffer.get(i) for i in range(3)] == [
+        (1, 100, 10, 1000),
+        (2, 200, 20, 2000),
+        (3, 300, 30, 3000),
+    ]
+
+
+def test_wrap_around_the_end_of_the_columns_after_evicting_the_oldest_points():
+    buffer = PointBuffer(capacity=4)
+
+    for sequence in (1, 2, 3, 4):
+        add(buffer, sequence)
+
+    assert buffer.full
+    assert buffer.popleft()[0] == 1
+    assert buffer.popleft()[0] == 2
+
+    add(buffer, 6)
+    add(buffer, 5)
+
+    assert sequences(buffer) == [3, 4, 5, 6]
+    assert buffer.slot(0) == 2
+    assert buffer.slot(3) == 1
+
+
+def test_fail_to_insert_into_a_full_buffer():
+    buffer = PointBuffer(capacity=2)
+    add(buffer, 1)
+    add(buffer, 2)
+
+    with pytest.raises(OverflowError) as e:
+        add(buffer, 3)
+
+    assert str(e.value) == 'Buffer is full: 2 points'
+
+
+def test_fail_to_evict_from_an_empty_buffer():
+    with pytest.raises(IndexError):
+        PointBuffer(capacity=2).popleft()
+
+
+def test_copy_the_columns_in_order_across_the_end_of_the_ring():
+    buffer = PointBuffer(capacity=3)
+    for sequence in (1, 2, 3):
+        add(buffer, sequence, price=sequence * 100, size=sequence * 10, time=sequence * 1000)
+    buffer.popleft()
+    add(buffer, 4, price=400, size=40, time=4000)
+
+    columns = buffer.columns()
+    buffer.popleft()
+
+    assert [list(i) for i in columns] == [[2, 3, 4], [200, 300, 400], [20, 30, 40], [2000, 3000, 4000]]
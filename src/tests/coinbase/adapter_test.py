@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+from application.coinbase.adapter import CoinbaseAdapter
+from application.coinbase.model import Error
+from application.model import TradingPair
+from application.numeric import FIXED_POINT
+from tests.coinbase.feed_test import match_frame
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message: str):
+        self.sent.append(json.loads(message))
+
+
+def test_subscribe_to_the_matches_of_the_trading_pairs():
+    connection = FakeConnection()
+
+    asyncio.run(CoinbaseAdapter().subscribe(connection, (TradingPair.BTC_USD, TradingPair.ETH_USD)))
+
+    assert connection.sent == [{'type': 'subscribe', 'product_ids': ['BTC-USD', 'ETH-USD'], 'channels': ['matches']}]
+
+
+def test_decode_matches_and_describe_errors():
+    adapter = CoinbaseAdapter('ws://127.0.0.1:8765', venue='local')
+
+    match = adapter.decode(match_frame(7), FIXED_POINT)
+
+    assert (match.sequence, match.price) == (7, 5586806)
+    assert adapter.product_id(match_frame(7)) == 'BTC-USD'
+    assert adapter.failure(match) is None
+    assert adapter.failure(Error('Failed to subscribe', 'BTC-XYZ is not a valid product')) == (
+        'Coinbase sent an error: Failed to subscribe (BTC-XYZ is not a valid product)'
+    )
+    assert str(adapter) == 'CoinbaseAdapter[local]'
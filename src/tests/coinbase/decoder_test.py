@@ -0,0 +1,118 @@
+import json
+import logging
+from decimal import Decimal
+
+import dateutil.parser
+import pytest
+
+from application.coinbase.decoder import decode_message, peek_sequence
+from application.coinbase.model import Match
+from application.errors import SchemaValidationError
+from application.numeric import FIXED_POINT
+from tests.coinbase.schema_test import build_match_payload, build_last_match_payload
+
+
+def without(field: str) -> dict:
+    payload = build_match_payload()
+    del payload[field]
+    return payload
+
+
+def replacing(field: str, value) -> dict:
+    payload = build_match_payload()
+    payload[field] = value
+    return payload
+
+
+class TestDecodeMessage:
+
+    @pytest.mark.parametrize('payload', [build_match_payload(), build_last_match_payload()])
+    def test_decode_match_message(self, payload):
+        message = decode_message(json.dumps(payload))
+        assert isinstance(message, Match)
+
+        assert message.quantity == Decimal(payload['size'])
+        assert message.price == Decimal(payload['price'])
+        assert str(message.pair) == payload['product_id']
+        assert message.sequence == payload['sequence']
+        assert message.time == dateutil.parser.parse(payload['time'])
+
+    def test_decode_match_message_into_fixed_point(self):
+        message = decode_message(json.dumps(build_match_payload()), FIXED_POINT)
+
+        assert message.quantity == 2450000
+        assert message.price == 5586806
+
+    def test_decode_match_message_with_numbers_as_json_literals(self):
+        payload = replacing('size', 0.5)
+        payload['sequence'] = str(payload['sequence'])
+
+        message = decode_message(json.dumps(payload))
+
+        assert message.quantity == Decimal('0.5')
+        assert message.sequence == 22759566651
+
+    def test_decode_match_message_regardless_of_whitespace(self):
+        message = decode_message(json.dumps(build_match_payload(), indent=4))
+
+        assert message.sequence == 22759566651
+
+    @pytest.mark.parametrize('field, payload', [
+        ('size', without('size')),
+        ('price', without('price')),
+        ('product_id', without('product_id')),
+        ('sequence', without('sequence')),
+        ('time', without('time')),
+        ('size', replacing('size', None)),
+        ('price', replacing('price', None)),
+        ('product_id', replacing('product_id', None)),
+        ('sequence', replacing('sequence', None)),
+        ('time', replacing('time', None)),
+        ('size', replacing('size', 'a lot')),
+        ('price', replacing('price', 'NaN')),
+        ('product_id', replacing('product_id', 'DOGE-USD')),
+        ('sequence', replacing('sequence', 'first')),
+        ('time', replacing('time', 'yesterday')),
+        ('time', replacing('time', '2021-13-45T00:10:50.123456Z')),
+        ('time', replacing('time', '2021-02-29T24:10:50Z')),
+    ])
+    def test_reject_the_same_malformed_payloads_as_the_strict_decoder(self, field, payload):
+        raw_message = json.dumps(payload)
+
+        with pytest.raises(SchemaValidationError) as e:
+            decode_message(raw_message, strict=True)
+        assert f"{{'{field}': [" in str(e.value)
+
+        with pytest.raises(SchemaValidationError) as e:
+            decode_message(raw_message)
+        assert f"{{'{field}': [" in str(e.value)
+
+    def test_report_the_same_failure_as_the_strict_decoder(self):
+        raw_message = json.dumps(without('size'))
+
+        with pytest.raises(SchemaValidationError) as strict:
+            decode_message(raw_message, strict=True)
+
+        with pytest.raises(SchemaValidationError) as fast:
+            decode_message(raw_message)
+
+        assert str(fast.value) == str(strict.value)
+
+    def test_reject_price_finer_than_the_tick_size_in_fixed_point(self):
+        with pytest.raises(SchemaValidationError) as e:
+            decode_message(json.dumps(replacing('price', '55868.061')), FIXED_POINT)
+
+        assert "{'price': ['Value has more than 2 decimal places: 55868.061']}" in str(e.value)
+
+    def test_ignore_other_messages_through_the_strict_decoder(self, caplog):
+        raw_message = json.dumps({'type': 'subscriptions', 'channels': [{'name': 'matches', 'product_ids': []}]})
+
+        with caplog.at_level(logging.INFO):
+            assert decode_message(raw_message) is None
+
+        assert caplog.records[0].message == 'Ignoring message with type "subscriptions"'
+
+
+def test_peek_the_sequence_of_a_frame_without_decoding_it():
+    assert peek_sequence(json.dumps(build_match_payload())) == 22759566651
+    assert peek_sequence('{"type": "subscriptions", "channels": []}') is None
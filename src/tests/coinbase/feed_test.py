@@ -0,0 +1,428 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable
+
+import pytest
+import websockets
+from websockets.exceptions import ConnectionClosedOK
+
+from application.coinbase import feed
+from application.coinbase.adapter import CoinbaseAdapter
+from application.coinbase.feed import receive_batch
+from application.errors import FeedError
+from application.model import TradingPair
+from application.numeric import DECIMAL, FIXED_POINT
+from application.redis_store import RedisPointStore
+from tests.coinbase.schema_test import build_match_payload
+from tests.fake_redis import FakeRedis
+from tests.points import new_point
+
+
+class FakeWebSocket:
+    def __init__(self, raw_messages: Iterable[str]):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        for raw_message in raw_messages:
+            self._queue.put_nowait(raw_message)
+
+    async def recv(self) -> str:
+        return await self._queue.get()
+
+
+def test_receive_every_frame_already_buffered_in_one_batch():
+    async def receive():
+        return await receive_batch(FakeWebSocket(['a', 'b', 'c']))
+
+    assert asyncio.run(receive()) == ['a', 'b', 'c']
+
+
+def test_receive_at_most_the_maximum_batch_size(monkeypatch):
+    monkeypatch.setattr(feed, 'MAX_BATCH_SIZE', 2)
+
+    async def receive():
+        websocket = FakeWebSocket(['a', 'b', 'c'])
+        return await receive_batch(websocket), await receive_batch(websocket)
+
+    assert asyncio.run(receive()) == (['a', 'b'], ['c'])
+
+
+class ClosingWebSocket(FakeWebSocket):
+    async def recv(self) -> str:
+        if self._queue.empty():
+            raise ConnectionClosedOK(1000, '')
+        return await super().recv()
+
+
+def test_listen_until_the_connection_is_closed_processing_every_frame(monkeypatch):
+    batches = []
+    monkeypatch.setattr(feed, 'consume', batches.append)
+    monkeypatch.setattr(feed, 'MAX_BATCH_SIZE', 2)
+
+    asyncio.run(feed.listen(ClosingWebSocket(['a', 'b', 'c'])))
+
+    assert [i for batch in batches for i in batch] == ['a', 'b', 'c']
+    assert feed.frame_queue.closed
+
+
+def test_stop_listening_when_processing_fails(monkeypatch):
+    def consume(raw_messages):
+        raise ValueError('Unsupported trading pair: LTC-USD')
+
+    monkeypatch.setattr(feed, 'consume', consume)
+
+    with pytest.raises(ValueError):
+        asyncio.run(feed.listen(FakeWebSocket(['a'])))
+
+
+def test_process_batches_on_an_executor(monkeypatch):
+    batches = []
+    monkeypatch.setattr(feed, 'consume', batches.append)
+    monkeypatch.setattr(feed, 'executor', ThreadPoolExecutor(max_workers=1))
+
+    asyncio.run(feed.listen(ClosingWebSocket(['a', 'b'])))
+
+    assert batches == [['a', 'b']]
+
+
+# Globals of the feed replaced by `configure`, `start_rollups`, `restore` and the connections
+GLOBALS = (
+    'TRADING_PAIRS', 'NUMERIC_BACKEND', 'STORES', 'TIME_WINDOW_VWAPS', 'STORES_BY_PAIR', 'TIME_WINDOW_VWAPS_BY_PAIR',
+    'sequence_gaps', 'reorder_buffers', 'rollups', 'ROLLUP_WINDOWS', 'snapshots', 'sequence_filter', 'hedge',
+    'reconnects', 'disconnected_at', 'recovery_seconds'
+)
+
+
+@pytest.fixture(autouse=True)
+def feed_globals(monkeypatch):
+    for name in GLOBALS:
+        monkeypatch.setattr(feed, name, getattr(feed, name))
+
+
+def test_emit_the_vwap_of_every_window_of_the_pairs_in_a_batch(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (1, 2))
+    feed.configure((TradingPair.BTC_USD, TradingPair.ETH_USD), DECIMAL)
+
+    feed.process_batch([
+        new_point(TradingPair.BTC_USD, quantity='1', price='100', sequence=1),
+        new_point(TradingPair.BTC_USD, quantity='3', price='200', sequence=2),
+    ])
+
+    assert [str(i) for i in emitted] == [
+        'VWAP[BTC-USD/1]: 200.00',
+        'VWAP[BTC-USD/2]: 175.00',
+        'VWAP[BTC-USD/60s]: 175',
+        'VWAP[BTC-USD/300s]: 175',
+        'VWAP[BTC-USD/3600s]: 175',
+    ]
+
+
+def test_add_to_and_read_the_redis_stores_of_every_pair_in_one_round_trip_each(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (1, 2))
+    feed.configure((TradingPair.BTC_USD, TradingPair.ETH_USD), DECIMAL)
+    client = FakeRedis()
+    monkeypatch.setattr(feed, 'STORES', tuple(RedisPointStore(i, client, capacity=2) for i in feed.TRADING_PAIRS))
+    feed.index_windows()
+
+    feed.process_batch([
+        new_point(TradingPair.BTC_USD, quantity='1', price='100', sequence=1),
+        new_point(TradingPair.ETH_USD, quantity='1', price='300', sequence=1),
+        new_point(TradingPair.BTC_USD, quantity='3', price='200', sequence=2),
+    ])
+
+    assert client.round_trips == 2
+    assert [str(i) for i in emitted if i.window in ('1', '2')] == [
+        'VWAP[BTC-USD/1]: 200.00', 'VWAP[BTC-USD/2]: 175.00', 'VWAP[ETH-USD/1]: 300.00', 'VWAP[ETH-USD/2]: 300.00'
+    ]
+
+
+def test_keep_the_points_in_numpy_arrays_with_the_array_store(monkeypatch, tmp_path):
+    pytest.importorskip('numpy')
+    from application.vectorized import ArrayPointStore
+
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (1, 2))
+    monkeypatch.setattr(feed, 'STORE_CLASS', ArrayPointStore)
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+
+    feed.process_batch([
+        new_point(TradingPair.BTC_USD, quantity='1', price='100', sequence=1),
+        new_point(TradingPair.BTC_USD, quantity='3', price='200', sequence=2),
+    ])
+    feed.snapshots.close()
+
+    assert isinstance(feed.STORES_BY_PAIR[TradingPair.BTC_USD], ArrayPointStore)
+    assert [(i.window, i.value) for i in emitted if i.window in ('1', '2')] == [('1', 200.0), ('2', 175.0)]
+
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+    assert [i.sequence for i in feed.STORES[0].points] == [1, 2]
+    feed.snapshots.close()
+
+
+def test_expire_the_time_windows_of_a_quiet_pair_against_the_wall_clock(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'TIMER_INTERVAL', 0.01)
+    feed.configure((TradingPair.BTC_USD, TradingPair.ETH_USD), DECIMAL)
+
+    now = datetime.now(timezone.utc)
+    feed.process_batch([
+        new_point(TradingPair.BTC_USD, quantity='1', price='100', sequence=1, time=now - timedelta(seconds=90)),
+        new_point(TradingPair.ETH_USD, quantity='1', price='200', sequence=1, time=now),
+    ])
+    emitted.clear()
+
+    async def run():
+        timer = asyncio.ensure_future(feed.run_timer())
+        for _ in range(100):
+            if emitted:
+                break
+            await asyncio.sleep(0.01)
+        timer.cancel()
+
+    asyncio.run(run())
+
+    # The BTC-USD trade left its 60s window, while it is still within the longer ones
+    assert [str(i) for i in emitted] == ['VWAP[BTC-USD/60s]: 0']
+    assert feed.TIME_WINDOW_VWAPS_BY_PAIR[TradingPair.ETH_USD][0].current_value() == Decimal(200)
+
+
+def test_restore_the_windows_after_a_restart_and_drop_trades_sent_again(monkeypatch, tmp_path):
+    monkeypatch.setattr(feed, 'emit', lambda updates: None)
+
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+    feed.process_batch([new_point(sequence=i, price=f'{100 + i}') for i in (1, 2, 3)])
+    feed.snapshots.close()
+    before = feed.STORES[0].vwap(50)
+
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+    assert feed.STORES[0].vwap(50) == before
+
+    feed.process_batch([new_point(sequence=i, price=f'{100 + i}') for i in (3, 4)])
+    feed.snapshots.close()
+
+    assert [i.sequence for i in feed.STORES[0].points] == [1, 2, 3, 4]
+
+
+def test_restore_the_bars_of_trades_gone_from_the_windows_after_a_restart(monkeypatch, tmp_path):
+    monkeypatch.setattr(feed, 'emit', lambda updates: None)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (1,))
+    monkeypatch.setattr(feed, 'SNAPSHOT_INTERVAL', 0)
+    feed.start_rollups((timedelta(hours=24),))
+
+    start = datetime(2021, 3, 16, tzinfo=timezone.utc)
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+    feed.process_batch([new_point(quantity='1', price='100', sequence=1, time=start)])
+    feed.snapshots.close()
+
+    # The snapshot taken with the second trade no longer has the first one in any window
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+    feed.process_batch([new_point(quantity='1', price='300', sequence=2, time=start + timedelta(hours=2))])
+    feed.snapshots.close()
+
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.restore(str(tmp_path))
+    feed.snapshots.close()
+
+    rollup = feed.rollups[TradingPair.BTC_USD]
+    assert [i.sequence for i in feed.STORES[0].points] == [2]
+    assert [(i.start, i.close) for i in rollup.bars(timedelta(hours=1), start)] == \
+        [(start, Decimal(100)), (start + timedelta(hours=2), Decimal(300))]
+    assert rollup.vwap(start) == Decimal(200)
+
+
+def test_raise_an_error_sent_by_coinbase_once_the_trades_of_the_batch_are_processed(monkeypatch):
+    batches = []
+    monkeypatch.setattr(feed, 'process_batch', batches.append)
+    error = json.dumps({'type': 'error', 'message': 'Failed to subscribe', 'reason': 'BTC-XYZ is not a valid product'})
+
+    with pytest.raises(FeedError) as e:
+        feed.consume([match_frame(1), error])
+
+    assert str(e.value) == 'Coinbase sent an error: Failed to subscribe (BTC-XYZ is not a valid product)'
+    assert [i.sequence for i in batches[0]] == [1]
+
+
+def test_skip_and_count_the_frames_that_fail_to_decode(monkeypatch):
+    batches = []
+    monkeypatch.setattr(feed, 'process_batch', batches.append)
+    monkeypatch.setattr(feed, 'NUMERIC_BACKEND', FIXED_POINT)
+    monkeypatch.setattr(feed, 'invalid_frames', 0)
+    finer = json.loads(match_frame(2))
+    finer['price'] = '55868.061'
+
+    assert feed.consume([match_frame(1), json.dumps(finer), '{"type": "match", "time', match_frame(3)]) == 2
+
+    assert [i.sequence for i in batches[0]] == [1, 3]
+    assert feed.invalid_frames == 2
+
+
+def match_frame(sequence: int) -> str:
+    payload = build_match_payload()
+    payload['sequence'] = sequence
+    return json.dumps(payload)
+
+
+class FakeCoinbase:
+    """
+    Serves the given frames on each connection after the subscription, pausing for a moment at every `sleep`, and then
+    drops it, sends an error, or keeps it open, as told by the last frame of the connection.
+    """
+
+    def __init__(self, connections):
+        self.connections = list(connections)
+        self.subscriptions = []
+
+    async def handle(self, websocket, path=None):
+        self.subscriptions.append(json.loads(await websocket.recv()))
+        *frames, ending = self.connections.pop(0)
+        for frame in frames:
+            if frame == 'sleep':
+                await asyncio.sleep(0.2)
+            else:
+                await websocket.send(frame)
+        if ending == 'drop':
+            await websocket.close(1011, 'Internal error')
+        elif ending == 'error':
+            await websocket.send(json.dumps({'type': 'error', 'message': 'Failed to subscribe'}))
+        await websocket.wait_closed()
+
+
+def test_reconnect_and_resubscribe_keeping_the_windows(monkeypatch):
+    coinbase = FakeCoinbase([
+        (match_frame(1), match_frame(2), match_frame(3), 'drop'),
+        ('error',),
+        (match_frame(3), match_frame(10), match_frame(11), 'open'),
+    ])
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.append)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (10,))
+    monkeypatch.setattr(feed, 'RECONNECT_DELAY', 0.01)
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+
+    async def run():
+        async with websockets.serve(coinbase.handle, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            monkeypatch.setattr(feed, 'adapter', CoinbaseAdapter(f'ws://127.0.0.1:{port}'))
+            event_loop = asyncio.ensure_future(feed.event_loop())
+            while len(feed.STORES[0]) < 5 and not event_loop.done():
+                await asyncio.sleep(0.01)
+            event_loop.cancel()
+
+    asyncio.run(run())
+
+    assert [i.sequence for i in feed.STORES[0].points] == [1, 2, 3, 10, 11]
+    assert len(coinbase.subscriptions) == 3
+    assert feed.reconnects == 2
+    assert feed.sequence_gaps.gaps(TradingPair.BTC_USD) == [(4, 9)]
+    assert feed.recovery_seconds < 1
+
+
+def test_keep_the_late_trades_of_a_connection_of_the_hedge_while_another_one_reconnects(monkeypatch):
+    coinbase = FakeCoinbase([
+        (match_frame(1), match_frame(5), match_frame(9), match_frame(20), 'sleep', match_frame(15), 'open'),
+        ('drop',),
+        ('open',),
+    ])
+    monkeypatch.setattr(feed, 'emit', lambda updates: None)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (10,))
+    monkeypatch.setattr(feed, 'RECONNECT_DELAY', 0.01)
+    monkeypatch.setattr(feed, 'CONNECTIONS', 2)
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+
+    async def run():
+        async with websockets.serve(coinbase.handle, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            monkeypatch.setattr(feed, 'adapter', CoinbaseAdapter(f'ws://127.0.0.1:{port}'))
+            event_loop = asyncio.ensure_future(feed.event_loop())
+            for _ in range(200):
+                if len(feed.STORES[0]) == 5 or event_loop.done():
+                    break
+                await asyncio.sleep(0.01)
+            event_loop.cancel()
+
+    asyncio.run(run())
+
+    # The late trade arrived after the other connection subscribed again
+    assert len(coinbase.subscriptions) == 3
+    assert [i.sequence for i in feed.STORES[0].points] == [1, 5, 9, 15, 20]
+    assert feed.sequence_gaps.gaps(TradingPair.BTC_USD) == []
+
+
+def test_pass_trades_on_to_the_windows_in_order_with_a_reorder_delay(monkeypatch):
+    monkeypatch.setattr(feed, 'emit', lambda updates: None)
+    monkeypatch.setattr(feed, 'REORDER_DELAY', timedelta(seconds=5))
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+
+    feed.process_batch([new_point(sequence=i) for i in (3, 1, 4)])
+    feed.process_batch([new_point(sequence=2), new_point(sequence=5, time=datetime.now(timezone.utc))])
+
+    store, = feed.STORES
+    buffer = feed.reorder_buffers[TradingPair.BTC_USD]
+    assert [i.sequence for i in store.points] == [1, 3, 4]
+    assert store.late == 0
+    assert (buffer.held, buffer.discarded) == (1, 1)
+
+
+def test_release_the_trades_held_for_a_pair_that_went_quiet(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (10,))
+    monkeypatch.setattr(feed, 'REORDER_DELAY', timedelta(seconds=5))
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+
+    now = datetime.now(timezone.utc)
+    feed.process_batch([new_point(sequence=i, price='100', time=now) for i in (2, 1)])
+    assert feed.STORES[0].points == () and emitted == []
+
+    feed.tick(now + timedelta(seconds=1))
+    assert feed.STORES[0].points == ()
+
+    feed.tick(now + timedelta(seconds=5))
+    assert [i.sequence for i in feed.STORES[0].points] == [1, 2]
+    assert 'VWAP[BTC-USD/10]: 100.00' in [str(i) for i in emitted]
+
+
+def test_publish_the_vwap_of_rollup_windows_from_bars(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (1,))
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.start_rollups((timedelta(hours=24),))
+
+    start = datetime(2021, 3, 16, tzinfo=timezone.utc)
+    feed.process_batch([
+        new_point(quantity='1', price='100', sequence=1, time=start),
+        new_point(quantity='1', price='300', sequence=2, time=start + timedelta(hours=23)),
+    ])
+    feed.process_batch([new_point(quantity='2', price='400', sequence=3, time=start + timedelta(hours=25))])
+
+    # The first trade is out of the last 24 hours once the third one is in
+    assert [i.value for i in emitted if i.window == '86400s'] == [Decimal(200), Decimal(1100) / Decimal(3)]
+
+
+def test_publish_the_vwap_of_a_rollup_window_as_long_as_the_bars_retained(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(feed, 'emit', emitted.extend)
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (1,))
+    feed.configure((TradingPair.BTC_USD,), DECIMAL)
+    feed.start_rollups((timedelta(days=7),))
+
+    start = datetime(2021, 3, 16, 12, 30, tzinfo=timezone.utc)
+    feed.process_batch([new_point(quantity='1', price='100', sequence=1, time=start)])
+    feed.process_batch([new_point(quantity='1', price='300', sequence=2, time=start + timedelta(days=7))])
+
+    # The hour of the first trade is a week older than the newest one, and out of the bars retained
+    assert [i.value for i in emitted if i.window == '604800s'] == [Decimal(100), Decimal(300)]
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from typing import List, Tuple
+
+import websockets
+
+from application.coinbase import feed
+from application.coinbase.adapter import CoinbaseAdapter
+from application.coinbase.hedging import HedgedFeed
+from tests.coinbase.feed_test import FakeCoinbase, match_frame
+
+
+def run_hedged(coinbase: FakeCoinbase, connections: int, frames: int, copies: int) -> Tuple[HedgedFeed, List[str]]:
+    async def run():
+        async with websockets.serve(coinbase.handle, '127.0.0.1', 0) as server:
+            uri = f'ws://127.0.0.1:{server.sockets[0].getsockname()[1]}'
+            async with HedgedFeed(CoinbaseAdapter(uri), connections, feed.subscribe, reconnect_delay=0.01) as hedge:
+                received = [await asyncio.wait_for(hedge.recv(), 5) for _ in range(frames)]
+                while hedge.duplicates + sum(hedge.wins) < copies:
+                    await asyncio.sleep(0.01)
+                return hedge, received
+
+    return asyncio.run(run())
+
+
+def test_merge_the_frames_of_every_connection_keeping_the_first_copy_of_each():
+    coinbase = FakeCoinbase([
+        (match_frame(1), match_frame(3), 'open'),
+        (match_frame(1), match_frame(2), match_frame(3), 'open'),
+    ])
+
+    hedge, received = run_hedged(coinbase, connections=2, frames=3, copies=5)
+
+    assert sorted(json.loads(i)['sequence'] for i in received) == [1, 2, 3]
+    assert len(coinbase.subscriptions) == 2
+    assert sum(hedge.wins) == 3
+    assert hedge.duplicates == 2
+
+
+def test_reconnect_a_connection_on_which_coinbase_sent_an_error():
+    coinbase = FakeCoinbase([('error',), (match_frame(1), 'open')])
+
+    hedge, received = run_hedged(coinbase, connections=1, frames=1, copies=1)
+
+    assert [json.loads(i)['sequence'] for i in received] == [1]
+    assert hedge.reconnects == [1]
+    assert hedge.wins == [1]
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from application.coinbase import feed
+from application.coinbase.model import Match
+from application.coinbase.parallel import ParallelDecoder
+from application.numeric import FIXED_POINT
+from application.pipeline import FrameQueue, OverflowPolicy
+from tests.coinbase.feed_test import match_frame
+
+SUBSCRIPTIONS = '{"type": "subscriptions", "channels": []}'
+
+
+@pytest.fixture
+def decoder():
+    decoder = ParallelDecoder(2, chunk_size=3, min_batch_size=4, backend=FIXED_POINT)
+    yield decoder
+    decoder.close()
+
+
+def test_decode_a_batch_on_the_workers_in_arrival_order(decoder):
+    frames = [match_frame(i) for i in (5, 3, 8, 1, 9, 2, 7)] + [SUBSCRIPTIONS]
+
+    messages = asyncio.run(decoder.decode(frames))
+
+    assert [i.sequence for i in messages[:-1]] == [5, 3, 8, 1, 9, 2, 7]
+    assert all(isinstance(i, Match) and i.price == 5586806 for i in messages[:-1])
+    assert messages[-1] is None
+    assert (decoder.parallel_batches, decoder.inline_batches) == (1, 0)
+
+
+def test_decode_small_batches_inline(decoder):
+    messages = asyncio.run(decoder.decode([match_frame(1), match_frame(2)]))
+
+    assert [i.sequence for i in messages] == [1, 2]
+    assert (decoder.parallel_batches, decoder.inline_batches) == (0, 1)
+
+
+def test_skip_and_count_the_frames_that_cannot_be_decoded(decoder):
+    frames = [match_frame(1), match_frame(2), match_frame(3), '{"type": "match", "product_id": "BTC-USD"}']
+
+    messages = asyncio.run(decoder.decode(frames))
+
+    assert [i.sequence for i in messages[:-1]] == [1, 2, 3]
+    assert messages[-1] is None
+    assert decoder.invalid_frames == 1
+
+
+def test_fail_to_create_a_decoder_without_workers():
+    with pytest.raises(ValueError) as e:
+        ParallelDecoder(0)
+
+    assert str(e.value) == 'Workers must be at least 1: 0'
+
+
+def test_process_the_batches_decoded_by_the_workers(monkeypatch, decoder):
+    batches = []
+    monkeypatch.setattr(feed, 'decoder', decoder)
+    monkeypatch.setattr(feed, 'process_batch', batches.append)
+
+    async def consume():
+        queue = FrameQueue(10, OverflowPolicy.BLOCK)
+        for i in range(6):
+            await queue.put(match_frame(i))
+        queue.close()
+        await feed.consume_queue(queue)
+
+    asyncio.run(consume())
+
+    assert [[i.sequence for i in batch] for batch in batches] == [[0, 1, 2, 3, 4, 5]]
+
+
+def test_decode_the_batches_too_small_for_the_workers_on_the_executor(monkeypatch, decoder):
+    threads = []
+    monkeypatch.setattr(feed, 'decoder', decoder)
+    monkeypatch.setattr(feed, 'executor', ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(feed, 'consume', lambda raw_messages: threads.append(threading.current_thread()))
+
+    async def consume():
+        queue = FrameQueue(10, OverflowPolicy.BLOCK)
+        for i in range(2):
+            await queue.put(match_frame(i))
+        queue.close()
+        await feed.consume_queue(queue)
+
+    asyncio.run(consume())
+
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+    assert (decoder.parallel_batches, decoder.inline_batches) == (0, 0)
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from application.coinbase.decoder import decode_message
+from application.coinbase.products import load_products, parse_products
+from application.model import TradingPair
+from application.numeric import FIXED_POINT
+from tests.coinbase.schema_test import build_match_payload
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(TradingPair, '_registry', dict(TradingPair._registry))
+
+
+def test_register_the_products_of_a_file(tmp_path):
+    path = tmp_path / 'products.json'
+    path.write_text(json.dumps([
+        {'id': 'BTC-USD', 'base_increment': '0.00000001', 'quote_increment': '0.01', 'status': 'online'},
+        {'id': 'DOGE-USD', 'base_increment': '0.1', 'quote_increment': '0.0001', 'status': 'online'},
+        {'id': 'SHIB-USD', 'base_increment': '1', 'quote_increment': '0.00000001', 'status': 'online'},
+    ]))
+
+    pairs = load_products(str(path))
+
+    assert pairs[0] is TradingPair.BTC_USD
+    assert [(str(i), i.price_decimals, i.size_decimals) for i in pairs[1:]] == [('DOGE-USD', 4, 1), ('SHIB-USD', 8, 0)]
+
+
+def test_decode_a_match_of_a_product_registered_at_runtime():
+    TradingPair.register('DOGE-USD', price_decimals=4, size_decimals=1)
+    payload = dict(build_match_payload(), product_id='DOGE-USD', price='0.0553', size='120.5')
+
+    message = decode_message(json.dumps(payload), FIXED_POINT)
+
+    assert (message.pair, message.price, message.quantity) == (TradingPair('DOGE-USD'), 553, 1205)
+    assert decode_message(json.dumps(payload), FIXED_POINT, strict=True).pair is message.pair
+
+
+def test_parse_registered_and_new_products():
+    pairs = parse_products('BTC-USD, DOGE-USD:4:1')
+
+    assert pairs == [TradingPair.BTC_USD, TradingPair('DOGE-USD')]
+    assert parse_products('all') == list(TradingPair)
+
+
+@pytest.mark.parametrize('text', ['DOGE-USD', 'DOGE-USD:4', 'DOGE-USD:a:1'])
+def test_fail_to_parse_unknown_or_malformed_products(text):
+    with pytest.raises(ValueError):
+        parse_products(text)
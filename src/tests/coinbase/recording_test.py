@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from application.coinbase.recording import Recorder, read_recording
+from application.coinbase.replay import replay
+from tests.coinbase.schema_test import build_match_payload
+
+
+def build_frames(count: int, interval_ns: int = 1000000):
+    frames = []
+    for i in range(count):
+        payload = build_match_payload()
+        payload['sequence'] += i
+        frames.append((1615853450667352000 + i * interval_ns, json.dumps(payload)))
+    return frames
+
+
+class TestRecording:
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_read_the_frames_that_were_recorded(self, tmp_path, compress):
+        path = str(tmp_path / 'feed.rec')
+        frames = build_frames(3) + [(1615853450667352999, '{"type":"subscriptions","note":"ünïcødé"}')]
+
+        with Recorder(path, compress=compress) as recorder:
+            for received_at, raw_message in frames:
+                recorder.record(raw_message, received_at)
+
+        assert list(read_recording(path)) == frames
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_append_to_an_existing_recording(self, tmp_path, compress):
+        path = str(tmp_path / 'feed.rec')
+        frames = build_frames(4)
+
+        for received_at, raw_message in frames:
+            with Recorder(path, compress=compress) as recorder:
+                recorder.record(raw_message, received_at)
+
+        assert list(read_recording(path)) == frames
+
+    def test_ignore_a_frame_that_was_not_completely_written(self, tmp_path):
+        path = tmp_path / 'feed.rec'
+        frames = build_frames(2)
+
+        with Recorder(str(path)) as recorder:
+            for received_at, raw_message in frames:
+                recorder.record(raw_message, received_at)
+        path.write_bytes(path.read_bytes()[:-5])
+
+        assert list(read_recording(str(path))) == frames[:1]
+
+    def test_read_a_compressed_recording_up_to_where_it_was_last_flushed(self, tmp_path):
+        path = tmp_path / 'feed.rec'
+        frames = build_frames(3)
+
+        recorder = Recorder(str(path), compress=True, flush_interval=0)
+        for received_at, raw_message in frames[:2]:
+            recorder.record(raw_message, received_at)
+        assert list(read_recording(str(path))) == frames[:2]
+
+        recorder.record(frames[2][1], frames[2][0])
+        recorder.close()
+        path.write_bytes(path.read_bytes()[:-5])
+        assert list(read_recording(str(path))) == frames
+
+    def test_record_the_current_time_by_default(self, tmp_path):
+        path = str(tmp_path / 'feed.rec')
+
+        with Recorder(path) as recorder:
+            recorder.record('{}')
+
+        (received_at, raw_message), = read_recording(path)
+        assert received_at > 1615853450667352000
+        assert raw_message == '{}'
+
+
+class TestReplay:
+
+    def test_replay_as_fast_as_possible(self):
+        frames = build_frames(10) + [(1615853450767352000, '{"type":"heartbeat"}')]
+
+        report = replay(frames, speed=None)
+
+        assert report.frames == 11
+        assert report.trades == 10
+        assert report.frames_per_second > 0
+
+    def test_count_the_recorded_errors_and_keep_replaying(self):
+        error = '{"type": "error", "message": "Failed to subscribe", "reason": "BTC-XYZ is not a valid product"}'
+        frames = build_frames(4)
+        frames.insert(2, (1615853450667352000, error))
+
+        report = replay(frames, speed=None)
+
+        assert report.frames == 5
+        assert report.trades == 4
+        assert report.errors == 1
+
+    def test_replay_at_the_original_pace_sped_up(self):
+        frames = build_frames(5, interval_ns=100000000)
+
+        report = replay(frames, speed=10)
+
+        assert report.frames == 5
+        assert report.trades == 5
+        assert report.seconds >= 0.04
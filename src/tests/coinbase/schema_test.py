@@ -4,10 +4,11 @@ from decimal import Decimal
 import dateutil.parser
 import pytest
 
-from application.coinbase.model import Match, Subscribe, Channel
+from application.coinbase.model import Error, Match, Subscribe, Channel
 from application.coinbase.schema import deserialize_message, serialize_message
 from application.errors import SchemaValidationError
 from application.model import TradingPair
+from application.numeric import FIXED_POINT, FLOAT
 
 
 def build_match_payload() -> dict:
@@ -68,6 +69,31 @@ class TestDeserialization:
         assert message.sequence == payload['sequence']
         assert message.time == dateutil.parser.parse(payload['time'])
 
+    def test_deserialize_match_message_into_fixed_point(self):
+        payload = build_last_match_payload()
+
+        message = deserialize_message(payload, FIXED_POINT)
+
+        assert message.quantity == 556364
+        assert message.price == 3218
+
+    def test_deserialize_match_message_into_float(self):
+        payload = build_match_payload()
+
+        message = deserialize_message(payload, FLOAT)
+
+        assert message.quantity == 0.0245
+        assert message.price == 55868.06
+
+    def test_fail_to_deserialize_match_message_into_fixed_point_with_price_finer_than_the_tick_size(self):
+        payload = build_match_payload()
+        payload['price'] = '55868.061'
+
+        with pytest.raises(SchemaValidationError) as e:
+            deserialize_message(payload, FIXED_POINT)
+
+        assert "{'price': ['Value has more than 2 decimal places: 55868.061']}" in str(e.value)
+
     def test_fail_to_deserialize_match_message_without_size(self):
         payload = build_match_payload()
         del payload['size']
@@ -133,6 +159,13 @@ class TestDeserialization:
 
         assert caplog.records[0].message == 'Ignoring message with type "subscriptions"'
 
+    def test_deserialize_error_message(self):
+        payload = {'type': 'error', 'message': 'Failed to subscribe', 'reason': 'BTC-XYZ is not a valid product'}
+
+        assert deserialize_message(payload) == Error(
+            message='Failed to subscribe', reason='BTC-XYZ is not a valid product'
+        )
+
     def test_ignore_message_without_type(self, caplog):
         payload = {'something': 'evil'}
 
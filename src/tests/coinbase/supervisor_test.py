@@ -0,0 +1,115 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from contextlib import asynccontextmanager
+from typing import List, Sequence
+
+import pytest
+
+from application.coinbase import feed
+from application.coinbase.adapter import CoinbaseAdapter
+from application.coinbase.supervisor import Supervisor, route
+from application.model import TradingPair
+from tests.coinbase.schema_test import build_match_payload
+
+
+def match_frame(product_id: str, sequence: int) -> str:
+    payload = build_match_payload()
+    payload['product_id'] = product_id
+    payload['sequence'] = sequence
+    return json.dumps(payload)
+
+
+class DroppingConnection:
+    """
+    Connection that sends the given frames, and then drops.
+    """
+
+    def __init__(self, frames: Sequence[str]):
+        self._frames = list(frames)
+
+    async def send(self, message: str):
+        pass
+
+    async def recv(self) -> str:
+        if not self._frames:
+            await asyncio.sleep(0.05)
+            raise OSError('Connection dropped')
+        return self._frames.pop(0)
+
+
+class DroppingAdapter(CoinbaseAdapter):
+    def __init__(self, connections: Sequence[Sequence[str]]):
+        super().__init__('fake://coinbase')
+        self.connections = [list(i) for i in connections]
+
+    @asynccontextmanager
+    async def connect(self):
+        yield DroppingConnection(self.connections.pop(0))
+
+
+def test_route_frames_to_the_worker_of_their_product():
+    frames = [
+        match_frame('BTC-USD', 1),
+        match_frame('ETH-USD', 2),
+        '{"type": "subscriptions", "channels": []}',
+        match_frame('LTC-USD', 3),
+        match_frame('BTC-USD', 4),
+    ]
+
+    batches = route(frames, {'BTC-USD': 'worker-0', 'ETH-USD': 'worker-1'}, CoinbaseAdapter().product_id)
+
+    assert batches == {'worker-0': [frames[0], frames[4]], 'worker-1': [frames[1]]}
+
+
+def test_assign_every_trading_pair_to_exactly_one_worker():
+    supervisor = Supervisor(list(TradingPair), workers=2)
+
+    pairs = [pair for pairs in supervisor.assignments.values() for pair in pairs]
+    assert sorted(pairs, key=str) == sorted(TradingPair, key=str)
+
+
+def test_reject_a_supervisor_without_workers():
+    with pytest.raises(ValueError) as e:
+        Supervisor(list(TradingPair), workers=0)
+
+    assert str(e.value) == 'Workers must be at least 1: 0'
+
+
+def test_collect_the_updates_of_every_worker_into_one_stream():
+    supervisor = Supervisor(
+        list(TradingPair), workers=3, shared_ingest=True, context=multiprocessing.get_context('fork')
+    )
+    supervisor.start()
+    try:
+        supervisor.dispatch([match_frame(str(pair), 1) for pair in TradingPair])
+
+        names = set()
+        deadline = time.monotonic() + 10
+        while len(names) < 3 and time.monotonic() < deadline:
+            names.update(i.name for i in supervisor.receive(timeout=1) or () if i.window == '50')
+    finally:
+        supervisor.stop()
+
+    assert names == {'VWAP[BTC-USD/50]', 'VWAP[ETH-USD/50]', 'VWAP[ETH-BTC/50]'}
+
+
+def test_ingest_the_frames_of_a_new_connection_when_the_shared_one_drops(monkeypatch):
+    monkeypatch.setattr(feed, 'adapter', DroppingAdapter([[match_frame('BTC-USD', 1)], [match_frame('BTC-USD', 2)]]))
+    monkeypatch.setattr(feed, 'RECONNECT_DELAY', 0.01)
+    supervisor = Supervisor([TradingPair.BTC_USD], workers=1, shared_ingest=True)
+    batches: List[Sequence[str]] = []
+    supervisor.dispatch = batches.append
+
+    async def run():
+        ingest = asyncio.ensure_future(supervisor._ingest())
+        for _ in range(100):
+            if len(batches) == 2:
+                break
+            await asyncio.sleep(0.01)
+        ingest.cancel()
+
+    asyncio.run(run())
+
+    assert [[json.loads(i)['sequence'] for i in batch] for batch in batches] == [[1], [2]]
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from application.coinbase import feed, telemetry
+from application.coinbase.parallel import ParallelDecoder
+from application.gaps import SequenceGaps
+from application.model import TradingPair
+from application.store import PointStore
+from application.vwap import TimeWindowVWAP
+from tests.coinbase.feed_test import FakeWebSocket, match_frame
+
+
+@pytest.fixture
+def instrumented(monkeypatch):
+    monkeypatch.setattr(feed, 'STORES', (PointStore(TradingPair.BTC_USD, capacity=2, backend=feed.NUMERIC_BACKEND),))
+    monkeypatch.setattr(feed, 'WINDOW_SIZES', (2,))
+    monkeypatch.setattr(feed, 'TIME_WINDOW_VWAPS', (
+        TimeWindowVWAP(TradingPair.BTC_USD, feed.TIME_WINDOWS[0], backend=feed.NUMERIC_BACKEND),
+    ))
+    monkeypatch.setattr(feed, 'sequence_gaps', SequenceGaps())
+    for name in ('STORES_BY_PAIR', 'TIME_WINDOW_VWAPS_BY_PAIR'):
+        monkeypatch.setattr(feed, name, getattr(feed, name))
+    feed.index_windows()
+    telemetry.instrument()
+    yield
+    telemetry.uninstrument()
+
+
+def test_leave_the_feed_uninstrumented_unless_asked():
+    decode_message = feed.decode_message
+
+    telemetry.instrument()
+    assert feed.decode_message is not decode_message
+    telemetry.uninstrument()
+
+    assert feed.decode_message is decode_message
+
+
+def test_count_messages_and_trades_and_time_every_stage(instrumented):
+    matches = telemetry.MESSAGES.value('match')
+    subscriptions = telemetry.MESSAGES.value('subscriptions')
+    trades = telemetry.TRADES.value('BTC-USD')
+    decoded = telemetry.STAGE_SECONDS.count('decode')
+    inserted = telemetry.STAGE_SECONDS.count('insert')
+    published = telemetry.STAGE_SECONDS.count('publish')
+
+    feed.consume([match_frame(3), match_frame(1), match_frame(2), '{"type": "subscriptions", "channels": []}'])
+
+    assert telemetry.MESSAGES.value('match') == matches + 3
+    assert telemetry.MESSAGES.value('subscriptions') == subscriptions + 1
+    assert telemetry.TRADES.value('BTC-USD') == trades + 3
+    assert telemetry.STAGE_SECONDS.count('decode') == decoded + 4
+    assert telemetry.STAGE_SECONDS.count('insert') == inserted + 1
+    assert telemetry.STAGE_SECONDS.count('publish') == published + 1
+    assert telemetry.EVICTED_POINTS.value('BTC-USD') == 1
+
+
+def test_count_the_frames_that_fail_to_decode(instrumented, monkeypatch):
+    monkeypatch.setattr(feed, 'invalid_frames', 0)
+    invalid = telemetry.MESSAGES.value('invalid')
+
+    feed.consume([match_frame(1), '{"type": "match", "product_id": "BTC-USD"}'])
+
+    assert telemetry.MESSAGES.value('invalid') == invalid + 1
+    assert telemetry.INVALID_FRAMES.value() == 1
+    assert 'vwap_feed_invalid_frames_total 1\n' in telemetry.REGISTRY.render()
+
+
+def test_count_late_and_discarded_points_when_they_are_collected(instrumented):
+    feed.consume([match_frame(10), match_frame(20)])
+    feed.consume([match_frame(15), match_frame(5)])
+
+    assert telemetry.LATE_POINTS.value('BTC-USD') == 1
+    assert telemetry.DISCARDED_POINTS.value('BTC-USD') == 1
+    assert 'vwap_feed_late_points_total{pair="BTC-USD"} 1\n' in telemetry.REGISTRY.render()
+
+
+def test_count_the_sequences_missed_between_connections(instrumented):
+    feed.consume([match_frame(10), match_frame(20)])
+    feed.resume()
+    feed.consume([match_frame(20), match_frame(30)])
+
+    assert telemetry.SEQUENCE_GAPS.value('BTC-USD') == 1
+    assert telemetry.MISSING_SEQUENCES.value('BTC-USD') == 9
+    assert 'vwap_feed_missing_sequences_total{pair="BTC-USD"} 9\n' in telemetry.REGISTRY.render()
+
+
+def test_count_the_trades_too_late_to_be_reordered(instrumented, monkeypatch):
+    monkeypatch.setattr(feed, 'REORDER_DELAY', timedelta(seconds=5))
+    monkeypatch.setattr(feed, 'reorder_buffers', {})
+
+    feed.consume([match_frame(10), match_frame(20)])
+    feed.consume([match_frame(15)])
+
+    assert telemetry.REORDER_DISCARDED.value('BTC-USD') == 1
+    assert telemetry.REORDER_HELD.value('BTC-USD') == 0
+    assert 'vwap_feed_reorder_discarded_points_total{pair="BTC-USD"} 1\n' in telemetry.REGISTRY.render()
+
+
+def test_time_the_reception_of_every_batch(instrumented):
+    received = telemetry.STAGE_SECONDS.count('receive')
+    frames = telemetry.BATCH_FRAMES.count()
+
+    asyncio.run(feed.receive_batch(FakeWebSocket(['a', 'b'])))
+
+    assert telemetry.STAGE_SECONDS.count('receive') == received + 1
+    assert telemetry.BATCH_FRAMES.count() == frames + 1
+
+
+def test_time_and_count_the_batches_decoded_by_the_workers(instrumented, monkeypatch):
+    decoder = ParallelDecoder(1, min_batch_size=1, backend=feed.NUMERIC_BACKEND)
+    monkeypatch.setattr(feed, 'decoder', decoder)
+    matches = telemetry.MESSAGES.value('match')
+    subscriptions = telemetry.MESSAGES.value('subscriptions')
+    invalid = telemetry.MESSAGES.value('invalid')
+    decoded = telemetry.STAGE_SECONDS.count('decode')
+
+    try:
+        messages = asyncio.run(feed.decode_batch([
+            match_frame(1), '{"type": "subscriptions", "channels": []}', '{"type": "match", "product_id": "BTC-USD"}',
+            match_frame(2),
+        ]))
+    finally:
+        decoder.close()
+
+    assert [i.sequence if i else None for i in messages] == [1, None, None, 2]
+    assert telemetry.MESSAGES.value('match') == matches + 2
+    assert telemetry.MESSAGES.value('subscriptions') == subscriptions + 1
+    assert telemetry.MESSAGES.value('invalid') == invalid + 1
+    assert telemetry.STAGE_SECONDS.count('decode') == decoded + 4
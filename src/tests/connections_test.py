@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import pytest
+
+from application.connections import backoff_delay, keep_connected
+from application.errors import FeedError
+
+
+def test_double_the_delay_with_jitter_up_to_the_maximum():
+    assert 0.05 <= backoff_delay(0, 0.1, 10) <= 0.1
+    assert 0.2 <= backoff_delay(2, 0.1, 10) <= 0.4
+    assert 5 <= backoff_delay(20, 0.1, 10) <= 10
+
+
+def test_connect_again_after_every_failure_until_cancelled():
+    opened: List[int] = []
+    dropped_at: List[Optional[float]] = []
+    reconnects: List[int] = []
+
+    @asynccontextmanager
+    async def connect():
+        if not opened:
+            opened.append(0)
+            raise OSError('refused')
+        opened.append(len(opened))
+        yield len(opened) - 1
+
+    async def listen(connection: int, previous_drop: Optional[float]):
+        dropped_at.append(previous_drop)
+        if connection == 1:
+            raise FeedError('error sent by the venue')
+        if connection == 3:
+            await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(keep_connected(
+            connect, listen, 'test', reconnect_delay=0.001, on_reconnect=lambda: reconnects.append(1)
+        ))
+        while len(opened) < 4:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert opened == [0, 1, 2, 3]
+    assert dropped_at[0] is None
+    assert dropped_at[1] <= dropped_at[2]
+    assert len(reconnects) == 3
+
+
+def test_raise_other_failures():
+    @asynccontextmanager
+    async def connect():
+        yield None
+
+    async def listen(_connection, _dropped_at):
+        raise KeyError('bug')
+
+    with pytest.raises(KeyError):
+        asyncio.run(keep_connected(connect, listen, 'test'))
@@ -0,0 +1,29 @@
+import pytest
+
+from application.dedupe import DedupeIndex
+
+
+def test_accept_only_the_first_copy_of_a_key():
+    index = DedupeIndex(10)
+
+    assert [index.add(i) for i in (('BTC-USD', 1), ('BTC-USD', 2), ('BTC-USD', 1), ('ETH-USD', 1))] == [
+        True, True, False, True
+    ]
+    assert len(index) == 3
+
+
+def test_forget_the_oldest_keys_beyond_the_capacity():
+    index = DedupeIndex(2)
+    for key in (1, 2, 3):
+        index.add(key)
+
+    assert 1 not in index
+    assert len(index) == 2
+    assert index.add(1)
+
+
+def test_fail_to_create_an_index_without_capacity():
+    with pytest.raises(ValueError) as e:
+        DedupeIndex(0)
+
+    assert str(e.value) == 'Capacity must be at least 1: 0'
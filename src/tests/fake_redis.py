@@ -0,0 +1,87 @@
+from typing import Dict, List
+
+# Fields of the sums, in the order of their values in the arguments of the script and in its members
+_FIELDS = ('size', 'price_size_low', 'price_size_mid', 'price_size_high')
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the handful of Redis commands the Redis store uses. The Lua script of the store is
+    emulated by `_add_points`, which follows it step by step.
+    """
+
+    def __init__(self):
+        self.sorted_sets: Dict[str, Dict[str, float]] = {}
+        self.hashes: Dict[str, Dict[str, int]] = {}
+        self.round_trips = 0
+
+    def register_script(self, script: str):
+        def run(keys, args, client=None):
+            if client is not None:
+                return client._add_points(keys, [str(i) for i in args])
+            self.round_trips += 1
+            return self._add_points(keys, [str(i) for i in args])
+        return run
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def zcard(self, key: str) -> int:
+        return len(self.sorted_sets.get(key, {}))
+
+    def zrange(self, key: str, start: int, end: int) -> List[bytes]:
+        members = sorted(self.sorted_sets.get(key, {}).items(), key=lambda i: (i[1], i[0]))
+        end = len(members) if end == -1 else end + 1
+        return [member.encode('ascii') for member, _ in members[start:end]]
+
+    def hmget(self, key: str, *fields: str) -> List[bytes]:
+        values = self.hashes.get(key, {})
+        return [str(values[i]).encode('ascii') if i in values else None for i in fields]
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self.sorted_sets.pop(key, None)
+            self.hashes.pop(key, None)
+
+    def _add_points(self, keys, args):
+        points = self.sorted_sets.setdefault(keys[0], {})
+        sums = self.hashes.setdefault(keys[1], {})
+        capacity = int(args[0])
+        added = 0
+
+        for i in range(1, len(args), 6):
+            score, member, *values = args[i:i + 6]
+            if float(score) not in points.values():
+                points[member] = float(score)
+                added += 1
+                for field, value in zip(_FIELDS, values):
+                    sums[field] = sums.get(field, 0) + int(value)
+
+        evicted = 0
+        excess = len(points) - capacity
+        if excess > 0:
+            for member in self.zrange(keys[0], 0, excess - 1):
+                member = member.decode('ascii')
+                del points[member]
+                _, _, size, _, *limbs = member.split(':')
+                for field, value in zip(_FIELDS, (size, *limbs)):
+                    sums[field] -= int(value)
+                evicted += 1
+
+        return [added, evicted]
+
+
+class _FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args):
+            self._commands.append((name, args))
+            return self
+        return queue
+
+    def execute(self) -> list:
+        self._redis.round_trips += 1
+        return [getattr(self._redis, name)(*args) for name, args in self._commands]
@@ -0,0 +1,64 @@
+import pytest
+
+from application.gaps import Ranges, SequenceGaps
+from application.model import TradingPair
+from tests.points import new_point
+
+
+def test_merge_ranges_that_overlap_or_touch():
+    ranges = Ranges()
+    for start, end in ((10, 12), (1, 3), (20, 25), (4, 5), (11, 19)):
+        ranges.add(start, end)
+
+    assert list(ranges) == [(1, 5), (10, 25)]
+    assert ranges.gaps == [(6, 9)]
+
+
+def test_find_an_integer_within_the_ranges():
+    ranges = Ranges()
+    ranges.add(1, 3)
+    ranges.add(7, 7)
+
+    assert [i for i in range(10) if i in ranges] == [1, 2, 3, 7]
+
+
+def test_fail_to_add_a_range_that_ends_before_it_starts():
+    with pytest.raises(ValueError) as e:
+        Ranges().add(2, 1)
+
+    assert str(e.value) == 'Range start must not be greater than its end: 2 > 1'
+
+
+def test_count_the_sequences_missed_between_connections_only():
+    gaps = SequenceGaps()
+    gaps.filter([new_point(sequence=i) for i in (1, 3, 6)])
+    gaps.reconnect()
+    gaps.filter([new_point(sequence=i) for i in (10, 12)])
+
+    assert gaps.gaps(TradingPair.BTC_USD) == [(7, 9)]
+    assert gaps.missing(TradingPair.BTC_USD) == 3
+    assert gaps.gaps(TradingPair.ETH_USD) == []
+
+
+def test_drop_the_trades_of_a_previous_connection_sent_again():
+    gaps = SequenceGaps()
+    gaps.filter([new_point(sequence=i) for i in (1, 2, 3)])
+    gaps.reconnect()
+
+    points = gaps.filter([
+        new_point(sequence=3),
+        new_point(TradingPair.ETH_USD, sequence=3),
+        new_point(sequence=4),
+    ])
+
+    assert [(i.pair, i.sequence) for i in points] == [(TradingPair.ETH_USD, 3), (TradingPair.BTC_USD, 4)]
+    assert gaps.trading_pairs == [TradingPair.BTC_USD, TradingPair.ETH_USD]
+
+
+def test_keep_late_trades_of_the_current_connection():
+    gaps = SequenceGaps()
+
+    points = gaps.filter([new_point(sequence=i) for i in (5, 3, 4)])
+
+    assert [i.sequence for i in points] == [5, 3, 4]
+    assert list(gaps.ranges(TradingPair.BTC_USD)) == [(3, 5)]
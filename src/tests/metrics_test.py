@@ -0,0 +1,118 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from application.metrics import Counter, Gauge, Histogram, Registry, serve_metrics
+
+
+def test_render_counters_with_and_without_labels():
+    registry = Registry()
+    frames = registry.register(Counter('frames_total', 'Frames received'))
+    trades = registry.register(Counter('trades_total', 'Trades by pair', ('pair',)))
+
+    frames.inc()
+    frames.inc(amount=2)
+    trades.inc('ETH-USD')
+    trades.inc('BTC-USD', amount=5)
+
+    assert registry.render() == (
+        '# HELP frames_total Frames received\n'
+        '# TYPE frames_total counter\n'
+        'frames_total 3\n'
+        '# HELP trades_total Trades by pair\n'
+        '# TYPE trades_total counter\n'
+        'trades_total{pair="BTC-USD"} 5\n'
+        'trades_total{pair="ETH-USD"} 1\n'
+    )
+
+
+def test_collect_the_values_of_a_metric_when_it_is_rendered():
+    values = {('BTC-USD',): 1}
+    evicted = Counter('evicted_total', 'Evicted points', ('pair',), collect=lambda: values)
+
+    values[('BTC-USD',)] = 7
+
+    assert evicted.value('BTC-USD') == 7
+    assert evicted.render()[-1] == 'evicted_total{pair="BTC-USD"} 7'
+
+
+def test_set_a_gauge():
+    depth = Gauge('queue_depth', 'Frames waiting')
+    depth.set(4)
+    depth.set(2)
+
+    assert depth.value() == 2
+    assert depth.render()[-1] == 'queue_depth 2'
+
+
+def test_render_cumulative_histogram_buckets():
+    latency = Histogram('stage_seconds', 'Stage latency', ('stage',), buckets=(0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 0.5):
+        latency.observe(value, 'decode')
+
+    assert latency.count('decode') == 4
+    assert latency.render()[2:] == [
+        'stage_seconds_bucket{stage="decode",le="0.001"} 2',
+        'stage_seconds_bucket{stage="decode",le="0.01"} 3',
+        'stage_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'stage_seconds_sum{stage="decode"} 0.5065',
+        'stage_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_escape_label_values():
+    messages = Counter('messages_total', 'Messages by type', ('type',))
+    messages.inc('a"b\\c')
+
+    assert messages.render()[-1] == 'messages_total{type="a\\"b\\\\c"} 1'
+
+
+def test_serve_the_metrics_over_http():
+    registry = Registry()
+    registry.register(Counter('frames_total', 'Frames received')).inc()
+
+    async def get(path: str) -> bytes:
+        server = await serve_metrics(registry, port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    response = asyncio.run(get('/metrics'))
+    assert response.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n' in response
+    assert response.endswith(
+        b'\r\n\r\n# HELP frames_total Frames received\n# TYPE frames_total counter\nframes_total 1\n'
+    )
+
+    assert asyncio.run(get('/other')).startswith(b'HTTP/1.1 404 Not Found\r\n')
+
+
+def test_serve_the_metrics_rendered_by_the_given_function():
+    registry = Registry()
+    registry.register(Counter('frames_total', 'Frames received')).inc()
+    executor = ThreadPoolExecutor(1)
+
+    async def get() -> bytes:
+        server = await serve_metrics(
+            registry, port=0, render=lambda: asyncio.get_event_loop().run_in_executor(executor, registry.render)
+        )
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+            writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    try:
+        assert asyncio.run(get()).endswith(b'frames_total 1\n')
+    finally:
+        executor.shutdown()
@@ -0,0 +1,48 @@
+import copy
+import pickle
+
+import pytest
+
+from application.model import TradingPair
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(TradingPair, '_registry', dict(TradingPair._registry))
+
+
+def test_intern_trading_pairs_by_product():
+    assert TradingPair('BTC-USD') is TradingPair.BTC_USD
+    assert TradingPair(TradingPair.BTC_USD) is TradingPair.BTC_USD
+    assert TradingPair.get('DOGE-USD') is None
+
+
+def test_register_a_trading_pair_at_runtime():
+    pair = TradingPair.register('DOGE-USD', price_decimals=4, size_decimals=1)
+
+    assert TradingPair('DOGE-USD') is pair
+    assert TradingPair.register('DOGE-USD', price_decimals=4, size_decimals=1) is pair
+    assert (str(pair), pair.price_decimals, pair.size_decimals) == ('DOGE-USD', 4, 1)
+    assert list(TradingPair)[-1] is pair
+    assert 'DOGE-USD' in TradingPair.values()
+
+
+def test_fail_to_register_a_trading_pair_again_with_other_increments():
+    with pytest.raises(ValueError) as e:
+        TradingPair.register('BTC-USD', price_decimals=1, size_decimals=8)
+
+    assert str(e.value) == 'Trading pair already registered with other increments: BTC-USD'
+
+
+def test_fail_to_find_an_unknown_trading_pair():
+    with pytest.raises(ValueError) as e:
+        TradingPair('DOGE-USD')
+
+    assert str(e.value) == 'Unknown trading pair: DOGE-USD'
+
+
+def test_keep_trading_pairs_interned_when_copied_or_pickled():
+    pair = TradingPair.register('DOGE-USD', price_decimals=4, size_decimals=1)
+
+    assert copy.deepcopy(pair) is pair
+    assert pickle.loads(pickle.dumps(pair)) is pair
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import multiprocessing
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, List, Optional, Sequence
+
+import pytest
+
+from application.adapters import FeedAdapter
+from application.model import TradingPair
+from application.multifeed import MultiFeed, parse_source
+from application.numeric import DECIMAL, NumericBackend
+from application.output import Update
+from application.venues import VenueWindows
+from tests.points import new_point
+
+
+def trade(sequence: int, price='100', quantity='1') -> str:
+    return json.dumps({'pair': 'BTC-USD', 'sequence': sequence, 'price': price, 'quantity': quantity})
+
+
+class FakeConnection:
+    def __init__(self, frames: Sequence[str]):
+        self._frames = list(frames)
+
+    async def send(self, message: str):
+        pass
+
+    async def recv(self) -> str:
+        if not self._frames:
+            await asyncio.Event().wait()
+        return self._frames.pop(0)
+
+
+class FakeAdapter(FeedAdapter):
+    """
+    Venue that sends the given frames on each connection, and then keeps the last one open. Frames are either trades
+    or `error` or `invalid`.
+    """
+
+    def __init__(self, venue: str, connections: Sequence[Sequence[str]]):
+        self._venue = venue
+        self.connections = [list(i) for i in connections]
+        self.subscriptions = 0
+
+    @property
+    def venue(self) -> str:
+        return self._venue
+
+    @property
+    def uri(self) -> str:
+        return f'fake://{self._venue}'
+
+    @asynccontextmanager
+    async def connect(self):
+        yield FakeConnection(self.connections.pop(0) if len(self.connections) > 1 else self.connections[0])
+
+    async def subscribe(self, connection, trading_pairs: Sequence[TradingPair]):
+        self.subscriptions += 1
+
+    def decode(self, raw_message: str, backend: NumericBackend = DECIMAL, strict=False) -> Optional[object]:
+        if raw_message == 'error':
+            return raw_message
+        if raw_message == 'invalid':
+            raise ValueError('Invalid frame')
+        return new_point(**json.loads(raw_message))
+
+    def failure(self, message: object) -> Optional[str]:
+        return 'Failed' if message == 'error' else None
+
+
+def run_until(multifeed: MultiFeed, condition: Callable[[], bool]):
+    async def run():
+        task = asyncio.ensure_future(multifeed.run())
+        for _ in range(1000):
+            if condition() or task.done():
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+
+
+def new_multifeed(adapters: Sequence[FeedAdapter], emitted: List[Update], **kwargs) -> MultiFeed:
+    windows = VenueWindows((TradingPair.BTC_USD,), window_sizes=(10,), time_windows=(timedelta(minutes=1),))
+    return MultiFeed(adapters, (TradingPair.BTC_USD,), windows, emitted.extend, reconnect_delay=0.01, **kwargs)
+
+
+def consolidated(emitted: List[Update]) -> List[Decimal]:
+    return [i.value for i in emitted if i.window == '60s']
+
+
+def test_merge_the_trades_of_every_venue_on_one_event_loop():
+    emitted = []
+    multifeed = new_multifeed([
+        FakeAdapter('a', [(trade(1, '100'), trade(2, '200'))]),
+        FakeAdapter('b', [(trade(1, '600', quantity='2'),)]),
+    ], emitted)
+
+    run_until(multifeed, lambda: Decimal(375) in consolidated(emitted))
+
+    assert consolidated(emitted)[-1] == Decimal(375)
+    assert multifeed.windows.store('a', TradingPair.BTC_USD).vwap(10) == Decimal(150)
+    assert multifeed.windows.store('b', TradingPair.BTC_USD).vwap(10) == Decimal(600)
+    assert {i.window for i in emitted} == {'a:10', 'a:60s', 'b:10', 'b:60s', '60s'}
+
+
+def test_reconnect_a_venue_that_sent_an_error_dropping_the_trades_it_sends_again():
+    emitted = []
+    adapter = FakeAdapter('a', [(trade(1), trade(2), 'error'), (trade(2), trade(3))])
+    multifeed = new_multifeed([adapter, FakeAdapter('b', [()])], emitted)
+
+    run_until(multifeed, lambda: len(multifeed.windows.time_window_vwaps(TradingPair.BTC_USD)[0].points) == 3)
+
+    assert [i.sequence for i in multifeed.windows.store('a', TradingPair.BTC_USD).points] == [1, 2, 3]
+    assert adapter.subscriptions == 2
+
+
+def test_expire_the_time_windows_of_a_quiet_venue_against_the_wall_clock():
+    emitted = []
+    multifeed = new_multifeed([FakeAdapter('a', [(trade(1),)]), FakeAdapter('b', [()])], emitted, timer_interval=0.01)
+
+    # The trades are stamped long ago, so that the timer expires them as soon as they are in
+    run_until(multifeed, lambda: consolidated(emitted)[-1:] == [Decimal(0)])
+
+    assert consolidated(emitted) == [Decimal(100), Decimal(0)]
+    assert [i.value for i in emitted if i.window == 'a:60s'] == [Decimal(100), Decimal(0)]
+    assert multifeed.windows.store('a', TradingPair.BTC_USD).vwap(10) == Decimal(100)
+
+
+def test_skip_the_frames_that_fail_to_decode():
+    emitted = []
+    adapter = FakeAdapter('a', [(trade(1), 'invalid', trade(2))])
+    multifeed = new_multifeed([adapter, FakeAdapter('b', [()])], emitted)
+
+    run_until(multifeed, lambda: len(multifeed.windows.time_window_vwaps(TradingPair.BTC_USD)[0].points) == 2)
+
+    assert [i.sequence for i in multifeed.windows.store('a', TradingPair.BTC_USD).points] == [1, 2]
+    assert adapter.subscriptions == 1
+
+
+def test_listen_to_every_venue_on_a_process_of_its_own():
+    emitted = []
+    multifeed = new_multifeed([
+        FakeAdapter('a', [(trade(1, '100'),)]),
+        FakeAdapter('b', [(trade(1, '300'),)]),
+    ], emitted, processes=True, context=multiprocessing.get_context('fork'))
+
+    run_until(multifeed, lambda: Decimal(200) in consolidated(emitted))
+
+    assert Decimal(200) in consolidated(emitted)
+    assert multifeed.windows.venues == ['a', 'b']
+
+
+def test_reject_venues_given_twice():
+    with pytest.raises(ValueError) as e:
+        new_multifeed([FakeAdapter('a', [()]), FakeAdapter('a', [()])], [])
+
+    assert str(e.value) == "Venues must be unique: ['a', 'a']"
+
+
+def test_parse_sources_speaking_the_coinbase_protocol():
+    adapter = parse_source('local=ws://127.0.0.1:8765')
+
+    assert (adapter.venue, adapter.uri) == ('local', 'ws://127.0.0.1:8765')
+    assert parse_source('coinbase').uri == 'wss://ws-feed.pro.coinbase.com'
@@ -0,0 +1,126 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from application.model import TradingPair, Point
+from application.numeric import DECIMAL, FIXED_POINT, FLOAT, NumericBackend
+from application.store import PointStore
+from application.vwap import VWAP
+from tests.points import new_point
+
+
+def random_trades(count: int, seed: int = 42):
+    generator = random.Random(seed)
+    sequences = list(range(count))
+    for i in range(0, count - 8, 4):
+        window = sequences[i:i + 8]
+        generator.shuffle(window)
+        sequences[i:i + 8] = window
+
+    for sequence in sequences:
+        price = f'{generator.randint(3000000, 6500000) // 100}.{generator.randint(0, 99):02}'
+        size = f'{generator.randint(0, 20)}.{generator.randint(1, 99999999):08}'
+        yield price, size, sequence
+
+
+def build_point(backend: NumericBackend, price: str, size: str, sequence: int) -> Point:
+    pair = TradingPair.BTC_USD
+    return Point(
+        pair=pair,
+        price=backend.parse(price, pair.price_decimals),
+        quantity=backend.parse(size, pair.size_decimals),
+        sequence=sequence,
+        time=new_point().time,
+    )
+
+
+class TestFixedPointBackend:
+
+    @pytest.mark.parametrize('text, decimals, expected', [
+        ('55868.06', 2, 5586806),
+        ('55868.1', 2, 5586810),
+        ('55868', 2, 5586800),
+        ('55868.060000', 2, 5586806),
+        ('0.00556364', 8, 556364),
+        ('-0.5', 2, -50),
+        ('1E-8', 8, 1),
+    ])
+    def test_parse_scaled_integers(self, text, decimals, expected):
+        assert FIXED_POINT.parse(text, decimals) == expected
+
+    def test_fail_to_parse_values_finer_than_the_tick_size(self):
+        with pytest.raises(ValueError) as e:
+            FIXED_POINT.parse('55868.061', 2)
+
+        assert str(e.value) == 'Value has more than 2 decimal places: 55868.061'
+
+    def test_fail_to_parse_values_that_are_not_numbers(self):
+        with pytest.raises(ValueError) as e:
+            FIXED_POINT.parse('evil', 2)
+
+        assert str(e.value) == 'Not a valid number: evil'
+
+    @pytest.mark.parametrize('text', ['Infinity', '-inf', 'NaN', 'sNaN'])
+    def test_fail_to_parse_values_that_are_not_finite(self, text):
+        with pytest.raises(ValueError):
+            FIXED_POINT.parse(text, 2)
+
+    @pytest.mark.parametrize('value', [Decimal('Infinity'), Decimal('NaN')])
+    def test_fail_to_scale_values_that_are_not_finite(self, value):
+        with pytest.raises(ValueError) as e:
+            FIXED_POINT.from_decimal(value, 2)
+
+        assert str(e.value) == f'Not a finite number: {value}'
+
+    def test_match_the_decimal_vwap_exactly(self):
+        decimal_vwap = VWAP(TradingPair.BTC_USD, max_size=100, backend=DECIMAL)
+        fixed_point_vwap = VWAP(TradingPair.BTC_USD, max_size=100, backend=FIXED_POINT)
+
+        for price, size, sequence in random_trades(2000):
+            decimal_vwap.add(build_point(DECIMAL, price, size, sequence))
+            fixed_point_vwap.add(build_point(FIXED_POINT, price, size, sequence))
+
+            assert fixed_point_vwap.current_value() == decimal_vwap.current_value()
+
+    def test_match_the_decimal_vwap_of_the_point_store_exactly(self):
+        decimal_store = PointStore(TradingPair.BTC_USD, capacity=100, backend=DECIMAL)
+        fixed_point_store = PointStore(TradingPair.BTC_USD, capacity=100, backend=FIXED_POINT)
+
+        for price, size, sequence in random_trades(500):
+            decimal_store.add(build_point(DECIMAL, price, size, sequence))
+            fixed_point_store.add(build_point(FIXED_POINT, price, size, sequence))
+
+            for window in (1, 10, 100):
+                assert fixed_point_store.vwap(window) == decimal_store.vwap(window)
+
+
+class TestFloatBackend:
+
+    def test_stay_within_a_small_relative_error_of_the_decimal_vwap(self):
+        decimal_vwap = VWAP(TradingPair.BTC_USD, max_size=100, backend=DECIMAL)
+        float_vwap = VWAP(TradingPair.BTC_USD, max_size=100, backend=FLOAT)
+
+        for price, size, sequence in random_trades(5000):
+            decimal_vwap.add(build_point(DECIMAL, price, size, sequence))
+            float_vwap.add(build_point(FLOAT, price, size, sequence))
+
+            expected = decimal_vwap.current_value()
+            assert abs(Decimal(float_vwap.current_value()) - expected) <= expected * Decimal('1e-12')
+
+    def test_round_trip_through_fixed_point(self):
+        assert FLOAT.to_fixed_point(FLOAT.parse('55868.06', 2), 2) == 5586806
+        assert FLOAT.from_fixed_point(5586806, 2) == 55868.06
+
+
+class TestDecimalBackend:
+
+    def test_convert_to_and_from_fixed_point(self):
+        assert DECIMAL.to_fixed_point(Decimal('0.0245'), 8) == 2450000
+        assert DECIMAL.from_fixed_point(2450000, 8) == Decimal('0.0245')
+
+    def test_fail_to_convert_values_finer_than_the_tick_size_to_fixed_point(self):
+        with pytest.raises(ValueError) as e:
+            DECIMAL.to_fixed_point(Decimal('0.123'), 2)
+
+        assert str(e.value) == 'Value has more than 2 decimal places: 0.123'
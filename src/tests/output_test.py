@@ -0,0 +1,89 @@
+import io
+import json
+from decimal import Decimal
+
+import pytest
+
+from application.model import TradingPair
+from application.output import OutputFormat, OutputSink, Update, broadcast
+
+
+def btc_usd(window: str, value: str) -> Update:
+    return Update(TradingPair.BTC_USD, window, Decimal(value))
+
+
+def test_format_an_update_as_text():
+    assert str(btc_usd('200', '55868.06')) == 'VWAP[BTC-USD/200]: 55868.06'
+
+
+def test_broadcast_every_batch_to_each_emitter():
+    first, second = [], []
+    updates = [btc_usd('200', '55868.06')]
+
+    broadcast(first.extend, second.extend)(updates)
+
+    assert first == second == updates
+
+
+def test_write_every_update_as_text():
+    stream = io.StringIO()
+    sink = OutputSink(stream)
+
+    sink.emit([btc_usd('50', '55868.06'), btc_usd('60s', '55870.00')])
+    sink.close()
+
+    assert stream.getvalue() == 'VWAP[BTC-USD/50]: 55868.06\nVWAP[BTC-USD/60s]: 55870.00\n'
+
+
+def test_write_updates_as_ndjson():
+    stream = io.StringIO()
+    sink = OutputSink(stream, OutputFormat.NDJSON)
+
+    sink.emit([btc_usd('50', '55868.06')])
+    sink.close()
+
+    record = json.loads(stream.getvalue())
+    assert record.pop('time')
+    assert record == {'pair': 'BTC-USD', 'window': '50', 'vwap': '55868.06'}
+
+
+def test_conflate_the_updates_of_a_window_within_an_interval():
+    stream = io.StringIO()
+    sink = OutputSink(stream, interval=60)
+
+    for value in ('100.00', '101.00', '102.00'):
+        sink.emit([btc_usd('50', value), btc_usd('200', '99.00')])
+    sink.close()
+
+    assert stream.getvalue() == 'VWAP[BTC-USD/50]: 102.00\nVWAP[BTC-USD/200]: 99.00\n'
+
+
+def test_only_write_a_window_that_moved_beyond_the_threshold():
+    stream = io.StringIO()
+    sink = OutputSink(stream, threshold=0.01)
+
+    for value in ('100.00', '100.50', '101.01', '100.50'):
+        sink.emit([btc_usd('50', value)])
+        sink.flush()
+    sink.close()
+
+    assert stream.getvalue() == 'VWAP[BTC-USD/50]: 100.00\nVWAP[BTC-USD/50]: 101.01\n'
+
+
+def test_skip_a_window_whose_value_did_not_change():
+    stream = io.StringIO()
+    sink = OutputSink(stream)
+
+    for value in ('100.00', '100.00', '100.01'):
+        sink.emit([btc_usd('50', value)])
+        sink.flush()
+    sink.close()
+
+    assert stream.getvalue() == 'VWAP[BTC-USD/50]: 100.00\nVWAP[BTC-USD/50]: 100.01\n'
+
+
+def test_reject_a_negative_interval():
+    with pytest.raises(ValueError) as e:
+        OutputSink(io.StringIO(), interval=-1)
+
+    assert str(e.value) == 'Interval must not be negative: -1'
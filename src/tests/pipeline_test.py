@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from application.pipeline import FrameQueue, OverflowPolicy
+
+
+def key(frame: str) -> str:
+    return frame[0]
+
+
+def test_take_queued_frames_in_order_up_to_a_batch_size():
+    async def run():
+        queue = FrameQueue(10)
+        for frame in ('a1', 'b1', 'a2'):
+            await queue.put(frame)
+        return await queue.get_batch(2), await queue.get_batch(2), queue.depth
+
+    assert asyncio.run(run()) == (['a1', 'b1'], ['a2'], 0)
+
+
+def test_drop_the_oldest_frame_of_the_same_key_when_full():
+    async def run():
+        queue = FrameQueue(3, OverflowPolicy.DROP_OLDEST, key=key)
+        for frame in ('a1', 'b1', 'a2', 'b2', 'c1'):
+            await queue.put(frame)
+        return await queue.get_batch(10), queue.dropped
+
+    # b2 dropped b1, and c1, without any frame of its own, dropped the oldest one
+    assert asyncio.run(run()) == (['a2', 'b2', 'c1'], 2)
+
+
+def test_conflate_the_frames_of_the_same_key_when_full():
+    async def run():
+        queue = FrameQueue(3, OverflowPolicy.CONFLATE, key=key)
+        for frame in ('a1', 'b1', 'a2', 'a3'):
+            await queue.put(frame)
+        return await queue.get_batch(10), queue.dropped
+
+    assert asyncio.run(run()) == (['b1', 'a3'], 2)
+
+
+def test_block_the_producer_until_there_is_room():
+    async def run():
+        queue = FrameQueue(2, OverflowPolicy.BLOCK)
+        await queue.put('a1')
+        await queue.put('a2')
+
+        producer = asyncio.ensure_future(queue.put('a3'))
+        await asyncio.sleep(0.01)
+        blocked = not producer.done()
+
+        first = await queue.get_batch(1)
+        await producer
+        return blocked, first, await queue.get_batch(10), queue.dropped
+
+    assert asyncio.run(run()) == (True, ['a1'], ['a2', 'a3'], 0)
+
+
+def test_measure_how_long_the_oldest_frame_of_a_batch_waited():
+    async def run():
+        queue = FrameQueue(10)
+        await queue.put('a1')
+        await asyncio.sleep(0.02)
+        await queue.put('a2')
+        await queue.get_batch(10)
+        return queue.lag
+
+    assert asyncio.run(run()) >= 0.02
+
+
+def test_wait_for_a_frame_and_end_once_closed_and_empty():
+    async def run():
+        queue = FrameQueue(10)
+        consumer = asyncio.ensure_future(queue.get_batch(10))
+        await asyncio.sleep(0)
+        await queue.put('a1')
+        first = await consumer
+
+        queue.close()
+        return first, await queue.get_batch(10)
+
+    assert asyncio.run(run()) == (['a1'], [])
+
+
+def test_keep_the_dropped_frames_from_piling_up():
+    async def run():
+        queue = FrameQueue(2, OverflowPolicy.DROP_OLDEST, key=key)
+        await queue.put('b1')
+        for i in range(1000):
+            await queue.put(f'a{i}')
+        return len(queue._entries), await queue.get_batch(10)
+
+    entries, batch = asyncio.run(run())
+    assert entries <= 4
+    assert batch == ['b1', 'a999']
+
+
+def test_reject_an_empty_queue():
+    with pytest.raises(ValueError) as e:
+        FrameQueue(0)
+
+    assert str(e.value) == 'Capacity must be at least 1: 0'
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from application.model import TradingPair, TradingPoint
+
+
+class FakePoint(TradingPoint):
+    def __init__(self, pair: TradingPair, price: Decimal, quantity: Decimal, sequence: int, time: datetime):
+        self._pair = pair
+        self._price = price
+        self._quantity = quantity
+        self._sequence = sequence
+        self._time = time
+
+    @property
+    def pair(self) -> TradingPair:
+        return self._pair
+
+    @property
+    def quantity(self) -> Decimal:
+        return self._quantity
+
+    @property
+    def price(self) -> Decimal:
+        return self._price
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    @property
+    def time(self) -> datetime:
+        return self._time
+
+
+def new_point(
+        pair: str = 'BTC-USD',
+        quantity: str = '0.0245',
+        price: str = '55868.06',
+        sequence: int = 9876543210,
+        time: datetime = datetime(2021, 3, 16, tzinfo=timezone.utc)
+) -> TradingPoint:
+    return FakePoint(
+        pair=TradingPair(pair),
+        quantity=Decimal(quantity),
+        price=Decimal(price),
+        sequence=sequence,
+        time=time,
+    )
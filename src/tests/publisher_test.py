@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from decimal import Decimal
+from typing import List
+
+import pytest
+
+from application.model import TradingPair
+from application.output import Update
+from application.publisher import Publisher, encode_frame, read_frame
+
+
+class Subscriber:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, publisher: Publisher, *product_ids: str) -> 'Subscriber':
+        subscriber = cls(*await asyncio.open_connection('127.0.0.1', publisher.port))
+        if product_ids:
+            await subscriber.send('subscribe', *product_ids)
+        return subscriber
+
+    async def send(self, message_type: str, *product_ids: str) -> dict:
+        self.writer.write(encode_frame({'type': message_type, 'product_ids': list(product_ids)}))
+        return await self.receive()
+
+    async def receive(self) -> dict:
+        return await asyncio.wait_for(read_frame(self.reader), 5)
+
+    async def receive_values(self, count: int) -> List[str]:
+        return [f'{i["pair"]}/{i["window"]}: {i["vwap"]}' for i in [await self.receive() for _ in range(count)]]
+
+
+def update(pair: TradingPair, window: str, value: str) -> Update:
+    return Update(pair, window, Decimal(value))
+
+
+def run(scenario):
+    async def main():
+        publisher = Publisher(port=0)
+        await publisher.start()
+        try:
+            return await scenario(publisher)
+        finally:
+            await publisher.close()
+
+    return asyncio.run(main())
+
+
+def test_push_the_updates_of_the_subscribed_pairs_only():
+    async def scenario(publisher: Publisher):
+        subscriber = await Subscriber.connect(publisher, 'BTC-USD')
+        publisher.publish([update(TradingPair.ETH_USD, '200', '1795.41'), update(TradingPair.BTC_USD, '200', '55868')])
+        return await subscriber.receive_values(1)
+
+    assert run(scenario) == ['BTC-USD/200: 55868']
+
+
+def test_acknowledge_subscriptions():
+    async def scenario(publisher: Publisher):
+        subscriber = await Subscriber.connect(publisher)
+        return await subscriber.send('subscribe', 'BTC-USD', 'ETH-USD'), await subscriber.send('unsubscribe', 'ETH-USD')
+
+    assert run(scenario) == (
+        {'type': 'subscriptions', 'product_ids': ['BTC-USD', 'ETH-USD']},
+        {'type': 'subscriptions', 'product_ids': ['BTC-USD']},
+    )
+
+
+def test_send_the_latest_value_of_every_window_on_subscription():
+    async def scenario(publisher: Publisher):
+        publisher.publish([update(TradingPair.BTC_USD, '50', '100'), update(TradingPair.ETH_USD, '50', '10')])
+        publisher.publish([update(TradingPair.BTC_USD, '50', '101')])
+        subscriber = await Subscriber.connect(publisher, '*')
+        return await subscriber.receive_values(2)
+
+    assert sorted(run(scenario)) == ['BTC-USD/50: 101', 'ETH-USD/50: 10']
+
+
+def test_conflate_the_updates_of_a_window_a_client_did_not_take_yet():
+    async def scenario(publisher: Publisher):
+        subscriber = await Subscriber.connect(publisher, 'BTC-USD')
+        for value in ('100', '101', '102'):
+            publisher.publish([update(TradingPair.BTC_USD, '50', value), update(TradingPair.BTC_USD, '200', value)])
+        values = await subscriber.receive_values(2)
+        publisher.publish([update(TradingPair.BTC_USD, '50', '103')])
+        return values + await subscriber.receive_values(1), publisher.conflated
+
+    assert run(scenario) == (['BTC-USD/50: 102', 'BTC-USD/200: 102', 'BTC-USD/50: 103'], 4)
+
+
+def test_fan_out_every_update_to_many_subscribers():
+    async def scenario(publisher: Publisher):
+        subscribers = [await Subscriber.connect(publisher, 'BTC-USD') for _ in range(200)]
+        publisher.publish([update(TradingPair.BTC_USD, '200', '55868.06')])
+        values = await asyncio.gather(*(i.receive_values(1) for i in subscribers))
+        return values, publisher.clients, publisher.published
+
+    values, clients, published = run(scenario)
+
+    assert values == [['BTC-USD/200: 55868.06']] * 200
+    assert (clients, published) == (200, 1)
+
+
+def test_publish_updates_emitted_from_another_thread():
+    async def scenario(publisher: Publisher):
+        subscriber = await Subscriber.connect(publisher, 'BTC-USD')
+        thread = threading.Thread(target=publisher.emit, args=([update(TradingPair.BTC_USD, '200', '55868.06')],))
+        thread.start()
+        thread.join()
+        return await subscriber.receive_values(1)
+
+    assert run(scenario) == ['BTC-USD/200: 55868.06']
+
+
+def test_disconnect_a_client_sending_an_invalid_frame():
+    async def scenario(publisher: Publisher):
+        subscriber = await Subscriber.connect(publisher)
+        subscriber.writer.write(encode_frame({'type': 'trade'}))
+        with pytest.raises(asyncio.IncompleteReadError):
+            await subscriber.receive()
+        return publisher.clients
+
+    assert run(scenario) == 0
@@ -0,0 +1,149 @@
+import os
+import random
+
+import pytest
+
+from application.model import TradingPair
+from application.numeric import DECIMAL
+from application.redis_store import RedisPointStore, add_batches, read_vwaps
+from application.store import PointStore
+from tests.fake_redis import FakeRedis
+from tests.points import new_point
+
+
+@pytest.fixture(params=['emulated', 'lua'])
+def client(request):
+    """
+    Client of the Redis commands of the store, either `FakeRedis`, which emulates the Lua script, or one that runs the
+    script itself on a fake server with a Lua interpreter.
+    """
+    if request.param == 'emulated':
+        return FakeRedis()
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    return fakeredis.FakeRedis()
+
+
+def new_store(client=None, capacity=10) -> RedisPointStore:
+    return RedisPointStore(TradingPair.BTC_USD, client or FakeRedis(), capacity=capacity, backend=DECIMAL)
+
+
+def test_compute_the_same_vwaps_as_the_in_memory_store(client):
+    redis_store = new_store(client, capacity=50)
+    memory_store = PointStore(TradingPair.BTC_USD, capacity=50, backend=DECIMAL)
+
+    generator = random.Random(3)
+    sequences = list(range(1000, 1400))
+    for i in range(0, len(sequences), 20):
+        window = sequences[i:i + 30]
+        generator.shuffle(window)
+        sequences[i:i + 30] = window
+    for i in range(0, len(sequences), 20):
+        batch = [
+            new_point(quantity=f'{generator.randint(1, 500)}.{generator.randint(0, 99999999):08d}',
+                      price=f'{generator.randint(50000, 60000)}.{generator.randint(0, 99):02d}',
+                      sequence=sequence)
+            for sequence in sequences[i:i + 20]
+        ]
+        redis_store.add_many(batch)
+        memory_store.add_many(batch)
+
+        assert [i.sequence for i in redis_store.points] == [i.sequence for i in memory_store.points]
+        assert redis_store.vwaps([1, 10, 50]) == memory_store.vwaps([1, 10, 50])
+
+
+def test_add_each_batch_in_one_round_trip():
+    client = FakeRedis()
+    store = new_store(client)
+
+    store.add_many([new_point(sequence=i) for i in range(20)])
+
+    assert client.round_trips == 1
+    assert len(store) == 10
+    assert store.evicted == 10
+
+
+def test_query_every_window_size_in_one_round_trip():
+    client = FakeRedis()
+    store = new_store(client)
+    store.add_many([new_point(quantity='1', price=f'{i}', sequence=i) for i in range(1, 11)])
+    client.round_trips = 0
+
+    assert store.vwaps([2, 5, 10]) == [9.5, 8, 5.5]
+    assert client.round_trips == 1
+
+
+def test_count_a_trade_added_twice_once(client):
+    store = new_store(client)
+
+    store.add(new_point(quantity='1', price='100', sequence=1))
+    store.add(new_point(quantity='1', price='100', sequence=1))
+    store.add(new_point(quantity='1', price='200', sequence=2))
+
+    assert len(store) == 2
+    assert store.vwap(10) == 150
+
+
+def test_count_a_sequence_added_twice_once_even_with_other_fields(client):
+    store = new_store(client)
+
+    store.add(new_point(quantity='1', price='100', sequence=1))
+    store.add_many([new_point(quantity='2', price='300', sequence=1), new_point(quantity='1', price='200', sequence=2)])
+
+    assert [i.sequence for i in store.points] == [1, 2]
+    assert store.vwap(10) == 150
+
+
+def test_add_to_and_read_the_stores_of_every_pair_in_one_round_trip_each():
+    client = FakeRedis()
+    btc = new_store(client)
+    eth = RedisPointStore(TradingPair.ETH_USD, client, capacity=10, backend=DECIMAL)
+
+    add_batches([
+        (btc, [new_point(quantity='1', price=f'{i}', sequence=i) for i in range(1, 11)]),
+        (eth, [new_point(TradingPair.ETH_USD, quantity='1', price='7', sequence=1)]),
+    ])
+    assert client.round_trips == 1
+
+    assert read_vwaps([btc, eth], [2, 10]) == [[9.5, 5.5], [7, 7]]
+    assert client.round_trips == 2
+
+
+def test_share_the_windows_between_replicas(client):
+    store = new_store(client)
+    replica = new_store(client)
+
+    store.add(new_point(quantity='1', price='100', sequence=1))
+    replica.add(new_point(quantity='3', price='200', sequence=2))
+
+    assert store.vwap(10) == replica.vwap(10) == 175
+
+
+def test_keep_exact_sums_of_products_beyond_64_bits(client):
+    store = new_store(client, capacity=1000)
+
+    store.add_many([new_point(quantity='90000000', price='99999999.99', sequence=i) for i in range(1000)])
+
+    assert store.vwap(1000) == store.vwap(999) == DECIMAL.parse('99999999.99', 2)
+
+
+def test_reject_an_unsupported_window_size():
+    with pytest.raises(ValueError) as e:
+        new_store().vwap(11)
+
+    assert str(e.value) == 'Window size must be between 1 and 10: 11'
+
+
+@pytest.mark.skipif('REDIS_URL' not in os.environ, reason='needs a Redis server at REDIS_URL')
+def test_run_the_script_on_a_redis_server():
+    pytest.importorskip('redis')
+    client = RedisPointStore.connect(os.environ['REDIS_URL'])
+    store = RedisPointStore(TradingPair.BTC_USD, client, capacity=3, backend=DECIMAL, prefix='vwap-test')
+    store.clear()
+    try:
+        store.add_many([new_point(quantity='1', price=f'{i}', sequence=i) for i in (4, 1, 3, 2, 2)])
+
+        assert [i.sequence for i in store.points] == [2, 3, 4]
+        assert store.vwaps([1, 3]) == [4, 3]
+    finally:
+        store.clear()
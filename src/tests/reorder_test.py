@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+
+from application.model import TradingPair, TradingPoint
+from application.reorder import ReorderBuffer
+from tests.points import new_point
+
+START = datetime(2021, 3, 16, tzinfo=timezone.utc)
+
+
+def at(sequence: int, seconds: float) -> TradingPoint:
+    return new_point(sequence=sequence, time=START + timedelta(seconds=seconds))
+
+
+def sequences(points: List[TradingPoint]) -> List[int]:
+    return [i.sequence for i in points]
+
+
+def test_release_the_points_the_watermark_passed_in_sequence_order():
+    buffer = ReorderBuffer(TradingPair.BTC_USD, timedelta(seconds=2))
+
+    buffer.add_many([at(3, 1), at(1, 0), at(2, 0.5)])
+    assert buffer.release() == []
+    assert buffer.held == 3
+
+    buffer.add_many([at(5, 3), at(4, 2.5)])
+    assert sequences(buffer.release()) == [1, 2, 3]
+    assert buffer.held == 2
+
+
+def test_release_the_points_held_for_longer_than_the_delay_when_the_pair_goes_quiet():
+    buffer = ReorderBuffer(TradingPair.BTC_USD, timedelta(seconds=2))
+    buffer.add_many([at(2, 1), at(1, 0)])
+
+    assert sequences(buffer.release(now=START + timedelta(seconds=2.5))) == [1]
+    assert sequences(buffer.release(now=START + timedelta(seconds=3))) == [2]
+    assert buffer.held == 0
+
+
+def test_discard_and_count_the_points_older_than_the_last_point_released():
+    buffer = ReorderBuffer(TradingPair.BTC_USD, timedelta(seconds=1))
+    buffer.add_many([at(2, 0), at(4, 5)])
+    assert sequences(buffer.release()) == [2]
+
+    buffer.add_many([at(1, 4), at(2, 4), at(3, 4.5)])
+
+    assert buffer.discarded == 2
+    assert sequences(buffer.release(now=START + timedelta(seconds=10))) == [3, 4]
+
+
+def test_release_the_oldest_points_beyond_the_capacity_before_the_delay_is_over():
+    buffer = ReorderBuffer(TradingPair.BTC_USD, timedelta(hours=1), capacity=2)
+
+    buffer.add_many([at(4, 3), at(2, 1), at(3, 2), at(1, 0)])
+
+    assert sequences(buffer.release()) == [1, 2]
+    assert buffer.held == 2
+
+
+def test_fail_when_trying_to_add_point_that_does_not_belong_to_the_buffer_trading_pair():
+    buffer = ReorderBuffer(TradingPair.ETH_BTC, timedelta(seconds=1))
+
+    with pytest.raises(ValueError) as e:
+        buffer.add_many([new_point(pair='BTC-USD')])
+
+    assert str(e.value) == 'Unsupported trading pair: BTC-USD'
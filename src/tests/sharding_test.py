@@ -0,0 +1,58 @@
+import pytest
+
+from application.sharding import HashRing
+
+
+def test_assign_the_same_key_to_the_same_node_across_rings():
+    keys = [f'PAIR-{i}' for i in range(100)]
+
+    assert HashRing(['a', 'b', 'c']).assign(keys) == HashRing(['c', 'b', 'a']).assign(keys)
+
+
+def test_spread_keys_evenly_across_nodes():
+    ring = HashRing([f'worker-{i}' for i in range(4)])
+
+    assignments = ring.assign(f'PAIR-{i}' for i in range(4000))
+
+    assert sorted(assignments) == ['worker-0', 'worker-1', 'worker-2', 'worker-3']
+    assert all(700 < len(keys) < 1300 for keys in assignments.values())
+
+
+def test_only_move_the_keys_of_a_removed_node():
+    keys = [f'PAIR-{i}' for i in range(1000)]
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    before = {key: ring.node(key) for key in keys}
+
+    ring.remove('d')
+
+    for key in keys:
+        if before[key] != 'd':
+            assert ring.node(key) == before[key]
+        else:
+            assert ring.node(key) in ('a', 'b', 'c')
+
+
+def test_only_move_keys_to_an_added_node():
+    keys = [f'PAIR-{i}' for i in range(1000)]
+    ring = HashRing(['a', 'b', 'c'])
+    before = {key: ring.node(key) for key in keys}
+
+    ring.add('d')
+
+    moved = [key for key in keys if ring.node(key) != before[key]]
+    assert all(ring.node(key) == 'd' for key in moved)
+    assert 150 < len(moved) < 350
+
+
+def test_reject_a_node_added_twice():
+    ring = HashRing(['a'])
+
+    with pytest.raises(ValueError) as e:
+        ring.add('a')
+
+    assert str(e.value) == 'Node already in the ring: a'
+
+
+def test_look_up_a_key_in_an_empty_ring():
+    with pytest.raises(LookupError):
+        HashRing().node('BTC-USD')
@@ -0,0 +1,134 @@
+import os
+from datetime import timedelta
+from decimal import Decimal
+
+from application.bars import BarRollup
+from application.model import TradingPair, TradingPoint
+from application.numeric import DECIMAL, FIXED_POINT
+from application.reorder import ReorderBuffer
+from application.snapshot import RECORD, ROLLUPS_FILE, SNAPSHOT_FILE, SequenceFilter, Snapshots, decode_point, \
+    encode_points, read_records
+from application.store import PointStore
+from application.vwap import TimeWindowVWAP
+from tests.points import FakePoint, new_point
+
+
+def sequences(points_by_pair):
+    return {pair: [i.sequence for i in points] for pair, points in points_by_pair.items()}
+
+
+def fixed_point(sequence: int) -> TradingPoint:
+    point = new_point(sequence=sequence)
+    return FakePoint(TradingPair.BTC_USD, price=10000, quantity=150000000, sequence=sequence, time=point.time)
+
+
+def test_encode_and_decode_a_point():
+    point = new_point(TradingPair.ETH_BTC, quantity='0.00012345', price='0.03218', sequence=3041220340)
+
+    record = RECORD.unpack(encode_points([point], DECIMAL))
+    decoded = decode_point(record, DECIMAL)
+
+    assert record[0].rstrip(b'\0') == b'ETH-BTC'
+    assert (decoded.pair, decoded.quantity, decoded.price, decoded.sequence, decoded.time) == \
+        (TradingPair.ETH_BTC, Decimal('0.00012345'), Decimal('0.03218'), 3041220340, point.time)
+
+
+def test_ignore_a_record_only_partially_written(tmp_path):
+    path = str(tmp_path / 'journal.1.bin')
+    with open(path, 'wb') as file:
+        file.write(encode_points([new_point(sequence=1), new_point(sequence=2)], DECIMAL)[:-5])
+
+    assert [i[1] for i in read_records(path)] == [1]
+
+
+def test_restore_the_points_journaled_before_a_restart(tmp_path):
+    snapshots = Snapshots(str(tmp_path), DECIMAL)
+    snapshots.journal([new_point(sequence=2), new_point(TradingPair.ETH_USD, sequence=7)])
+    snapshots.journal([new_point(sequence=1), new_point(sequence=2)])
+    snapshots.close()
+
+    restored = Snapshots(str(tmp_path), DECIMAL).restore()
+
+    assert sequences(restored) == {TradingPair.BTC_USD: [1, 2], TradingPair.ETH_USD: [7]}
+
+
+def test_replace_the_journals_with_a_snapshot_of_the_windows(tmp_path):
+    store = PointStore(TradingPair.BTC_USD, capacity=2, backend=FIXED_POINT)
+    time_window = TimeWindowVWAP(TradingPair.BTC_USD, timedelta(minutes=1), backend=FIXED_POINT)
+    points = [fixed_point(sequence=i) for i in (1, 2, 3)]
+
+    snapshots = Snapshots(str(tmp_path), FIXED_POINT, interval=0)
+    store.add_many(points)
+    time_window.add_many(points)
+    snapshots.journal(points)
+
+    assert snapshots.due()
+    snapshots.take([store], [time_window])
+    snapshots.journal([fixed_point(sequence=4)])
+    snapshots.close()
+
+    assert sorted(os.listdir(str(tmp_path))) == ['journal.2.bin', SNAPSHOT_FILE]
+    restored = Snapshots(str(tmp_path), FIXED_POINT).restore()
+    assert sequences(restored) == {TradingPair.BTC_USD: [1, 2, 3, 4]}
+    assert restored[TradingPair.BTC_USD][0].price == 10000
+
+
+def test_keep_the_points_held_by_the_reorder_buffers_in_the_snapshot(tmp_path):
+    store = PointStore(TradingPair.BTC_USD, capacity=2, backend=FIXED_POINT)
+    buffer = ReorderBuffer(TradingPair.BTC_USD, timedelta(hours=1))
+    store.add_many([fixed_point(sequence=1)])
+    buffer.add_many([fixed_point(sequence=3), fixed_point(sequence=2)])
+
+    snapshots = Snapshots(str(tmp_path), FIXED_POINT, interval=0)
+    snapshots.take([store], [], [buffer])
+    snapshots.close()
+
+    assert sequences(Snapshots(str(tmp_path), FIXED_POINT).restore()) == {TradingPair.BTC_USD: [1, 2, 3]}
+
+
+def test_restore_the_bars_of_the_snapshot_and_the_points_journaled_since(tmp_path):
+    store = PointStore(TradingPair.BTC_USD, capacity=1, backend=FIXED_POINT)
+    buffer = ReorderBuffer(TradingPair.BTC_USD, timedelta(hours=1))
+    rollup = BarRollup(TradingPair.BTC_USD, backend=FIXED_POINT)
+    points = [fixed_point(sequence=i) for i in (1, 2)]
+    # Large enough for the price·volume of the bars to outgrow 64 bits
+    held = FakePoint(TradingPair.BTC_USD, price=10 ** 12, quantity=10 ** 16, sequence=3, time=points[0].time)
+
+    snapshots = Snapshots(str(tmp_path), FIXED_POINT, interval=0)
+    snapshots.journal(points + [held])
+    store.add_many(points)
+    rollup.add_many(points)
+    buffer.add_many([held])
+    snapshots.take([store], [], [buffer], [rollup])
+    snapshots.journal([fixed_point(sequence=4)])
+    snapshots.close()
+
+    assert sorted(os.listdir(str(tmp_path))) == ['journal.2.bin', ROLLUPS_FILE, SNAPSHOT_FILE]
+    restored = BarRollup(TradingPair.BTC_USD, backend=FIXED_POINT)
+    Snapshots(str(tmp_path), FIXED_POINT).restore_rollups([restored, BarRollup(TradingPair.ETH_USD)])
+    bar, = restored.bars(timedelta(hours=1), points[0].time)
+    assert (bar.trades, bar.close, bar.volume) == (4, 10000, 10 ** 16 + 3 * 150000000)
+    assert bar.price_volume == 10 ** 28 + 3 * 10000 * 150000000
+
+
+def test_restore_the_bars_from_every_point_when_there_is_no_snapshot_of_them(tmp_path):
+    snapshots = Snapshots(str(tmp_path), FIXED_POINT)
+    snapshots.journal([fixed_point(sequence=i) for i in (1, 2)])
+    snapshots.close()
+
+    rollup = BarRollup(TradingPair.BTC_USD, backend=FIXED_POINT)
+    Snapshots(str(tmp_path), FIXED_POINT).restore_rollups([rollup])
+
+    assert [i.trades for i in rollup.bars(timedelta(hours=1), fixed_point(sequence=1).time)] == [2]
+
+
+def test_drop_the_points_already_restored():
+    sequence_filter = SequenceFilter({TradingPair.BTC_USD: [new_point(sequence=1), new_point(sequence=2)]})
+
+    points = sequence_filter.filter([
+        new_point(sequence=2),
+        new_point(sequence=3),
+        new_point(TradingPair.ETH_USD, sequence=1),
+    ])
+
+    assert [(i.pair, i.sequence) for i in points] == [(TradingPair.BTC_USD, 3), (TradingPair.ETH_USD, 1)]
@@ -0,0 +1,212 @@
+import random
+from decimal import Decimal
+from typing import List
+
+import pytest
+
+from application.model import TradingPair
+from application.store import FenwickTree, PointStore
+from application.vwap import VWAP
+from tests.points import new_point
+
+
+def sequences(store: PointStore) -> List[int]:
+    return [i.sequence for i in store.points]
+
+
+class TestFenwickTree:
+
+    def test_compute_prefix_and_range_sums(self):
+        tree = FenwickTree(8, zero=0)
+        for index, value in enumerate([5, 1, 4, 2, 8, 3, 7, 6]):
+            tree.update(index, value)
+
+        assert tree.prefix_sum(0) == 0
+        assert tree.prefix_sum(3) == 10
+        assert tree.prefix_sum(8) == 36
+        assert tree.range_sum(2, 6) == 17
+
+    def test_update_a_slot_with_a_negative_delta(self):
+        tree = FenwickTree(4, zero=0)
+        tree.update(1, 10)
+        tree.update(1, -3)
+
+        assert tree.range_sum(1, 2) == 7
+
+
+class TestPointStore:
+
+    def test_add_points_ensuring_the_store_remains_sorted_by_sequence(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=10)
+
+        for sequence in (3, 9, 4, 8, 1, 10, 5, 7, 2, 6):
+            store.add(new_point(sequence=sequence))
+
+        assert sequences(store) == [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+    def test_discard_the_oldest_points_when_the_store_is_full(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=4)
+
+        for sequence in (10, 30, 20, 40, 50):
+            store.add(new_point(sequence=sequence))
+        assert sequences(store) == [20, 30, 40, 50]
+
+        store.add(new_point(sequence=35))
+        assert sequences(store) == [30, 35, 40, 50]
+
+        store.add(new_point(sequence=25))
+        assert sequences(store) == [30, 35, 40, 50]
+
+    def test_compute_the_vwap_of_the_last_n_points(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=4)
+
+        store.add(new_point(quantity='1', price='100', sequence=1))
+        store.add(new_point(quantity='3', price='200', sequence=3))
+        store.add(new_point(quantity='1', price='400', sequence=4))
+        store.add(new_point(quantity='2', price='300', sequence=2))
+
+        assert store.vwap(1) == Decimal('400')
+        assert store.vwap(2) == Decimal('250')
+        assert store.vwap(3) == Decimal('1600') / Decimal('6')
+        assert store.vwap(4) == Decimal('1700') / Decimal('7')
+
+    def test_compute_the_vwap_of_all_points_when_there_are_fewer_than_the_window_size(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=10)
+
+        store.add(new_point(quantity='1', price='100', sequence=1))
+        store.add(new_point(quantity='1', price='300', sequence=2))
+
+        assert store.vwap(10) == Decimal('200')
+
+    def test_compute_the_vwap_when_the_store_is_empty(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=10)
+
+        assert store.vwap(5) == Decimal(0)
+
+    def test_match_independent_vwaps_of_every_window_size_for_an_out_of_order_stream(self):
+        window_sizes = (5, 20, 50)
+        store = PointStore(TradingPair.BTC_USD, capacity=max(window_sizes))
+        vwaps = [VWAP(TradingPair.BTC_USD, max_size=i) for i in window_sizes]
+
+        generator = random.Random(42)
+        stream = list(range(1000, 1300))
+        for i in range(0, len(stream) - 5, 3):
+            window = stream[i:i + 5]
+            generator.shuffle(window)
+            stream[i:i + 5] = window
+
+        for sequence in stream:
+            point = new_point(
+                quantity=f'{generator.randint(1, 5000) / 1000:.3f}',
+                price=f'{generator.randint(5000000, 6000000) / 100:.2f}',
+                sequence=sequence
+            )
+            store.add(point)
+            for vwap in vwaps:
+                vwap.add(point)
+
+            for size, vwap in zip(window_sizes, vwaps):
+                assert store.vwap(size) == vwap.current_value()
+
+    def test_fail_to_compute_the_vwap_of_a_window_larger_than_the_capacity(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=10)
+
+        with pytest.raises(ValueError) as e:
+            store.vwap(11)
+
+        assert str(e.value) == 'Window size must be between 1 and 10: 11'
+
+    def test_fail_when_trying_to_add_point_that_does_not_belong_to_the_store_trading_pair(self):
+        store = PointStore(TradingPair.ETH_BTC)
+
+        with pytest.raises(ValueError) as e:
+            store.add(new_point(pair='BTC-USD'))
+
+        assert str(e.value) == 'Unsupported trading pair: BTC-USD'
+
+    def test_supports_point_if_trading_pair_is_the_same(self):
+        store = PointStore(TradingPair.ETH_USD)
+
+        assert store.supports(new_point('ETH-USD')) is True
+        assert store.supports(new_point('BTC-USD')) is False
+
+    def test_return_points_as_they_were_added(self):
+        store = PointStore(TradingPair.ETH_BTC, capacity=10)
+        point = new_point(pair='ETH-BTC', quantity='0.00556364', price='0.03218', sequence=3041220340)
+
+        store.add(point)
+
+        stored, = store.points
+        assert stored.pair == point.pair
+        assert stored.quantity == point.quantity
+        assert stored.price == point.price
+        assert stored.sequence == point.sequence
+        assert stored.time == point.time
+
+    def test_fail_to_add_point_with_a_price_finer_than_the_trading_pair_tick_size(self):
+        store = PointStore(TradingPair.BTC_USD)
+
+        with pytest.raises(ValueError) as e:
+            store.add(new_point(price='59293.253'))
+
+        assert str(e.value) == 'Value has more than 2 decimal places: 59293.253'
+
+    def test_add_a_batch_of_points_with_the_same_result_as_adding_them_one_by_one(self):
+        batched = PointStore(TradingPair.BTC_USD, capacity=50)
+        sequential = PointStore(TradingPair.BTC_USD, capacity=50)
+
+        generator = random.Random(7)
+        sequences_ = list(range(1000, 1400))
+        for i in range(0, len(sequences_), 25):
+            batch = sequences_[i:i + 25] + [generator.randint(900, i + 1000)]
+            generator.shuffle(batch)
+            points = [new_point(quantity=f'{j % 9 + 1}.25', price=f'{j % 13 + 100}', sequence=j) for j in batch]
+
+            batched.add_many(points)
+            for point in points:
+                sequential.add(point)
+
+            assert sequences(batched) == sequences(sequential)
+            for size in (1, 10, 50):
+                assert batched.vwap(size) == sequential.vwap(size)
+
+    def test_add_an_empty_batch(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=10)
+        store.add(new_point(sequence=1))
+
+        store.add_many([])
+
+        assert sequences(store) == [1]
+
+    def test_count_late_evicted_and_discarded_points(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=3)
+        for sequence in (10, 30, 20, 40, 5):
+            store.add(new_point(sequence=sequence))
+
+        assert sequences(store) == [20, 30, 40]
+        assert store.late == 1
+        assert store.evicted == 1
+        assert store.discarded == 1
+
+    def test_count_late_evicted_and_discarded_points_of_a_batch(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=3)
+        store.add_many([new_point(sequence=i) for i in (10, 30)])
+
+        store.add_many([new_point(sequence=i) for i in (20, 40, 25)])
+        store.add_many([new_point(sequence=i) for i in (5, 50)])
+
+        assert sequences(store) == [30, 40, 50]
+        assert store.late == 2
+        assert store.evicted == 3
+        assert store.discarded == 1
+
+    def test_drop_points_whose_sequence_is_already_retained(self):
+        store = PointStore(TradingPair.BTC_USD, capacity=10)
+        store.add_many([new_point(sequence=i, price='100') for i in (1, 2)])
+
+        store.add_many([new_point(sequence=i, price='300') for i in (2, 3, 3)])
+        store.add(new_point(sequence=1, price='300'))
+
+        assert sequences(store) == [1, 2, 3]
+        assert store.vwap(10) == Decimal('500') / Decimal('3')
+        assert store.duplicates == 3
@@ -0,0 +1,170 @@
+import random
+from decimal import Decimal
+from typing import List
+
+import pytest
+
+from application.model import TradingPair
+from application.numeric import DECIMAL, FIXED_POINT, FLOAT
+from application.store import PointStore
+from tests.numeric_test import build_point
+from tests.points import new_point
+
+np = pytest.importorskip('numpy')
+
+from application.vectorized import ArrayPointStore  # noqa: E402
+
+
+def sequences(store: ArrayPointStore) -> List[int]:
+    return [i.sequence for i in store.points]
+
+
+def shuffled_stream(generator: random.Random, start: int, count: int) -> List[int]:
+    stream = list(range(start, start + count))
+    for i in range(0, len(stream) - 5, 3):
+        window = stream[i:i + 5]
+        generator.shuffle(window)
+        stream[i:i + 5] = window
+    return stream
+
+
+def test_add_points_ensuring_the_store_remains_sorted_by_sequence():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=10)
+
+    for sequence in (3, 9, 4, 8, 1, 10, 5, 7, 2, 6):
+        store.add(new_point(sequence=sequence))
+
+    assert sequences(store) == [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert store.late == 7
+
+
+def test_discard_the_oldest_points_when_the_store_is_full():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=4)
+
+    for sequence in (10, 30, 20, 40, 50):
+        store.add(new_point(sequence=sequence))
+    assert sequences(store) == [20, 30, 40, 50]
+
+    store.add(new_point(sequence=35))
+    assert sequences(store) == [30, 35, 40, 50]
+
+    store.add(new_point(sequence=25))
+    assert sequences(store) == [30, 35, 40, 50]
+    assert (store.evicted, store.discarded) == (2, 1)
+
+
+def test_merge_a_batch_with_the_retained_points_keeping_the_newest_ones():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=5)
+    store.add_many(new_point(sequence=i) for i in (10, 20, 30, 40))
+
+    store.add_many(new_point(sequence=i) for i in (45, 5, 25, 35, 50))
+
+    assert sequences(store) == [30, 35, 40, 45, 50]
+    assert (store.late, store.evicted, store.discarded) == (3, 4, 0)
+
+
+def test_compute_the_vwap_of_the_last_n_points():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=4)
+
+    store.add(new_point(quantity='1', price='100', sequence=1))
+    store.add(new_point(quantity='3', price='200', sequence=3))
+    store.add(new_point(quantity='1', price='400', sequence=4))
+    store.add(new_point(quantity='2', price='300', sequence=2))
+
+    assert store.vwap(1) == 400.0
+    assert store.vwap(2) == 250.0
+    assert [float(i) for i in store.vwaps([3, 4])] == pytest.approx([1600 / 6, 1700 / 7], rel=1e-12)
+
+
+def test_compute_the_vwap_when_the_store_is_empty():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=10)
+
+    assert store.vwap(5) == 0.0
+    assert store.vwaps([1, 10]) == [0.0, 0.0]
+
+
+@pytest.mark.parametrize('backend, value', [(DECIMAL, Decimal(250)), (FIXED_POINT, Decimal(250)), (FLOAT, 250.0)])
+def test_compute_the_vwap_with_the_numeric_backend(backend, value):
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=4, backend=backend)
+    store.add_many([build_point(backend, '100', '1', 1), build_point(backend, '400', '1', 2)])
+
+    assert store.vwap(2) == value
+    assert type(store.vwap(2)) is type(value)
+    assert type(ArrayPointStore(TradingPair.BTC_USD, backend=backend).vwap(1)) is type(value)
+
+
+def test_match_the_point_store_for_an_out_of_order_stream_added_in_batches():
+    window_sizes = (5, 20, 50, 200)
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=200)
+    expected = PointStore(TradingPair.BTC_USD, capacity=200)
+
+    generator = random.Random(42)
+    stream = shuffled_stream(generator, 1000, 1000)
+    for i in range(0, len(stream), 37):
+        batch = [
+            new_point(
+                quantity=f'{generator.randint(1, 5000) / 1000:.3f}',
+                price=f'{generator.randint(5000000, 6000000) / 100:.2f}',
+                sequence=sequence
+            )
+            for sequence in stream[i:i + 37]
+        ]
+        store.add_many(batch)
+        expected.add_many(batch)
+
+        assert [float(i) for i in store.vwaps(window_sizes)] == pytest.approx(
+            [float(i) for i in expected.vwaps(window_sizes)], rel=1e-12
+        )
+
+    assert [i.tolist() for i in store.columns()] == [i.tolist() for i in expected.columns()]
+    assert (store.late, store.evicted, store.discarded) == (expected.late, expected.evicted, expected.discarded)
+
+
+def test_drop_points_whose_sequence_is_already_retained():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=10)
+    store.add_many(new_point(sequence=i, price='100') for i in (1, 2))
+
+    store.add_many(new_point(sequence=i, price='300') for i in (2, 3, 3))
+    store.add(new_point(sequence=1, price='300'))
+
+    assert sequences(store) == [1, 2, 3]
+    assert float(store.vwap(10)) == pytest.approx(500 / 3, rel=1e-12)
+    assert store.duplicates == 3
+
+
+def test_keep_the_newest_points_of_a_batch_larger_than_the_capacity():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=3)
+
+    store.add_many(new_point(sequence=i) for i in (5, 1, 4, 2, 3))
+
+    assert sequences(store) == [3, 4, 5]
+    assert store.evicted == 2
+
+
+def test_fail_to_compute_the_vwap_of_a_window_larger_than_the_capacity():
+    store = ArrayPointStore(TradingPair.BTC_USD, capacity=10)
+
+    with pytest.raises(ValueError) as e:
+        store.vwaps([5, 11])
+
+    assert str(e.value) == 'Window size must be between 1 and 10: 11'
+
+
+def test_fail_when_trying_to_add_point_that_does_not_belong_to_the_store_trading_pair():
+    store = ArrayPointStore(TradingPair.ETH_BTC)
+
+    with pytest.raises(ValueError) as e:
+        store.add(new_point(pair='BTC-USD'))
+
+    assert str(e.value) == 'Unsupported trading pair: BTC-USD'
+
+
+def test_return_points_as_they_were_added():
+    store = ArrayPointStore(TradingPair.ETH_BTC, capacity=10)
+    point = new_point(pair='ETH-BTC', quantity='0.00556364', price='0.03218', sequence=3041220340)
+
+    store.add(point)
+
+    stored, = store.points
+    assert (stored.pair, stored.quantity, stored.price) == (point.pair, point.quantity, point.price)
+    assert (stored.sequence, stored.time) == (point.sequence, point.time)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from application.model import TradingPair
+from application.venues import VenueWindows
+from tests.points import new_point
+
+
+def new_windows() -> VenueWindows:
+    return VenueWindows((TradingPair.BTC_USD,), window_sizes=(2,), time_windows=(timedelta(minutes=1),))
+
+
+def test_keep_the_last_trades_per_venue_and_the_time_windows_across_venues():
+    windows = new_windows()
+
+    windows.process('a', [
+        new_point(quantity='1', price='100', sequence=1),
+        new_point(quantity='1', price='200', sequence=2),
+        new_point(quantity='1', price='300', sequence=3),
+    ])
+    # Sequences of different venues are unrelated
+    updates = windows.process('b', [new_point(quantity='2', price='400', sequence=1)])
+
+    assert {i.window: i.value for i in updates} == {'b:2': Decimal(400), 'b:60s': Decimal(400), '60s': Decimal(280)}
+    assert windows.store('a', TradingPair.BTC_USD).vwap(2) == Decimal(250)
+    assert windows.time_window_vwaps(TradingPair.BTC_USD, 'a')[0].current_value() == Decimal(200)
+    assert windows.venues == ['a', 'b']
+
+
+def test_drop_the_trades_a_venue_sends_again_after_it_reconnects():
+    windows = new_windows()
+
+    windows.process('a', [new_point(sequence=1), new_point(sequence=2)])
+    windows.process('b', [new_point(sequence=2)])
+    windows.reconnect('a')
+    windows.process('a', [new_point(sequence=2), new_point(sequence=3)])
+
+    assert [i.sequence for i in windows.store('a', TradingPair.BTC_USD).points] == [2, 3]
+    assert len(windows.time_window_vwaps(TradingPair.BTC_USD)[0].points) == 4
+
+
+def test_ignore_the_trades_of_other_pairs():
+    windows = new_windows()
+
+    assert windows.process('a', [new_point(pair='ETH-USD', sequence=1)]) == []
+
+
+def test_expire_the_time_windows_of_every_venue_and_across_them():
+    windows = new_windows()
+    now = datetime.now(timezone.utc)
+
+    windows.process('a', [new_point(quantity='1', price='100', sequence=1, time=now - timedelta(seconds=50))])
+    windows.process('b', [new_point(quantity='1', price='300', sequence=1, time=now - timedelta(seconds=10))])
+    updates = windows.expire(now + timedelta(seconds=20))
+
+    assert {i.window: i.value for i in updates} == {'a:60s': Decimal(0), '60s': Decimal(300)}
+    assert windows.expire(now + timedelta(seconds=20)) == []
+    assert windows.store('a', TradingPair.BTC_USD).vwap(2) == Decimal(100)
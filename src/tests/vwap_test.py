@@ -1,54 +1,19 @@
+import random
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import List
+from typing import List, Union
 
 import pytest
 
-from application.model import TradingPair, TradingPoint
-from application.vwap import VWAP
+from application.model import TradingPair
+from application.vwap import VWAP, TimeWindowVWAP
+from tests.points import new_point
 
 
-class FakePoint(TradingPoint):
-    def __init__(self, pair: TradingPair, price: Decimal, quantity: Decimal, sequence: int):
-        self._pair = pair
-        self._price = price
-        self._quantity = quantity
-        self._sequence = sequence
-
-    @property
-    def pair(self) -> TradingPair:
-        return self._pair
-
-    @property
-    def quantity(self) -> Decimal:
-        return self._quantity
-
-    @property
-    def price(self) -> Decimal:
-        return self._price
-
-    @property
-    def sequence(self) -> int:
-        return self._sequence
-
-
-def sequences(vwap: VWAP) -> List[int]:
+def sequences(vwap: Union[VWAP, TimeWindowVWAP]) -> List[int]:
     return [i.sequence for i in vwap.points]
 
 
-def new_point(
-        pair: str = 'BTC-USD',
-        quantity: str = '0.0245',
-        price: str = '55868.06',
-        sequence: int = 9876543210
-) -> TradingPoint:
-    return FakePoint(
-        pair=TradingPair(pair),
-        quantity=Decimal(quantity),
-        price=Decimal(price),
-        sequence=sequence,
-    )
-
-
 def test_add_points_ensuring_the_list_remains_sorted_by_sequence():
     vwap = VWAP(TradingPair.BTC_USD)
 
@@ -288,3 +253,137 @@ def test_supports_point_if_trading_pair_is_the_same():
 def test_does_not_support_point_with_different_trading_pair():
     vwap = VWAP(TradingPair.ETH_USD)
     assert vwap.supports(new_point('BTC-USD')) is False
+
+
+def test_keep_the_current_vwap_value_up_to_date_when_points_arrive_out_of_order_and_the_oldest_are_evicted():
+    vwap = VWAP(TradingPair.BTC_USD, max_size=3)
+
+    vwap.add(new_point(quantity='1.23400', price='59293.253', sequence=5))
+    vwap.add(new_point(quantity='0.09123', price='59398.973', sequence=3))
+    vwap.add(new_point(quantity='1.00083', price='59325.001', sequence=1))
+    vwap.add(new_point(quantity='0.00015', price='59327.830', sequence=2))  # <== evicts sequence 1
+    vwap.add(new_point(quantity='0.89135', price='58725.301', sequence=6))  # <== evicts sequence 2
+    vwap.add(new_point(quantity='0.00378', price='59350.030', sequence=4))  # <== evicts sequence 3
+
+    assert sequences(vwap) == [4, 5, 6]
+    assert vwap.current_value() == (
+            (
+                    (Decimal('1.23400') * Decimal('59293.253')) +
+                    (Decimal('0.89135') * Decimal('58725.301')) +
+                    (Decimal('0.00378') * Decimal('59350.030'))
+            ) / (
+                    Decimal('1.23400') +
+                    Decimal('0.89135') +
+                    Decimal('0.00378')
+            )
+    )
+
+
+def test_do_not_change_the_current_vwap_value_when_a_point_older_than_the_full_window_is_discarded():
+    vwap = VWAP(TradingPair.BTC_USD, max_size=2)
+
+    vwap.add(new_point(quantity='1.5', price='100', sequence=10))
+    vwap.add(new_point(quantity='0.5', price='200', sequence=11))
+    vwap.add(new_point(quantity='9.0', price='999', sequence=9))
+
+    assert sequences(vwap) == [10, 11]
+    assert vwap.current_value() == Decimal('125')
+
+
+@pytest.mark.parametrize('batch_size', [1, 5, 50])
+def test_add_a_batch_of_points_with_the_same_result_as_adding_them_one_by_one(batch_size):
+    batched = VWAP(TradingPair.BTC_USD, max_size=20)
+    sequential = VWAP(TradingPair.BTC_USD, max_size=20)
+
+    generator = random.Random(batch_size)
+    stream = list(range(300))
+    generator.shuffle(stream)
+
+    for i in range(0, len(stream), batch_size):
+        batch = stream[i:i + batch_size]
+        points = [new_point(quantity=f'{j % 7 + 1}', price=f'{j * 3 + 100}', sequence=j) for j in batch]
+
+        batched.add_many(points)
+        for point in points:
+            sequential.add(point)
+
+        assert sequences(batched) == sequences(sequential)
+        assert batched.current_value() == sequential.current_value()
+
+
+class TestTimeWindowVWAP:
+
+    @staticmethod
+    def at(seconds: float) -> datetime:
+        return datetime(2021, 3, 16, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+
+    def test_evict_points_older_than_the_duration_relative_to_the_newest_point(self):
+        vwap = TimeWindowVWAP(TradingPair.BTC_USD, duration=timedelta(seconds=60))
+
+        vwap.add(new_point(quantity='1', price='100', sequence=1, time=self.at(0)))
+        vwap.add(new_point(quantity='1', price='200', sequence=2, time=self.at(30)))
+        vwap.add(new_point(quantity='2', price='400', sequence=3, time=self.at(61)))
+
+        assert sequences(vwap) == [2, 3]
+        assert vwap.current_value() == Decimal('1000') / Decimal('3')
+
+    def test_insert_late_points_within_the_lateness_bound_in_time_order(self):
+        vwap = TimeWindowVWAP(TradingPair.BTC_USD, duration=timedelta(seconds=60), lateness=timedelta(seconds=5))
+
+        vwap.add(new_point(quantity='1', price='100', sequence=1, time=self.at(10)))
+        vwap.add(new_point(quantity='1', price='100', sequence=3, time=self.at(14)))
+        vwap.add(new_point(quantity='1', price='100', sequence=2, time=self.at(12)))
+        vwap.add(new_point(quantity='1', price='100', sequence=4, time=self.at(15)))
+
+        assert sequences(vwap) == [1, 2, 3, 4]
+        assert vwap.discarded == 0
+
+    def test_discard_points_later_than_the_lateness_bound(self):
+        vwap = TimeWindowVWAP(TradingPair.BTC_USD, duration=timedelta(seconds=60), lateness=timedelta(seconds=5))
+
+        vwap.add(new_point(quantity='1', price='100', sequence=2, time=self.at(20)))
+        vwap.add(new_point(quantity='1', price='500', sequence=1, time=self.at(14)))
+
+        assert sequences(vwap) == [2]
+        assert vwap.current_value() == Decimal('100')
+        assert vwap.discarded == 1
+
+    def test_expire_points_relative_to_the_current_time(self):
+        vwap = TimeWindowVWAP(TradingPair.BTC_USD, duration=timedelta(seconds=60))
+
+        vwap.add(new_point(quantity='1', price='100', sequence=1, time=self.at(0)))
+        vwap.add(new_point(quantity='1', price='300', sequence=2, time=self.at(20)))
+
+        assert vwap.expire(self.at(70)) == 1
+        assert sequences(vwap) == [2]
+        assert vwap.current_value() == Decimal('300')
+
+        assert vwap.expire(self.at(90)) == 1
+        assert vwap.expire(self.at(90)) == 0
+        assert sequences(vwap) == []
+        assert vwap.current_value() == Decimal(0)
+
+    def test_add_a_batch_of_points_in_time_order(self):
+        vwap = TimeWindowVWAP(TradingPair.BTC_USD, duration=timedelta(seconds=60), lateness=timedelta(seconds=5))
+
+        vwap.add(new_point(quantity='1', price='100', sequence=1, time=self.at(0)))
+        vwap.add_many([
+            new_point(quantity='1', price='100', sequence=4, time=self.at(70)),
+            new_point(quantity='1', price='300', sequence=2, time=self.at(30)),
+            new_point(quantity='1', price='200', sequence=3, time=self.at(50)),
+        ])
+
+        assert sequences(vwap) == [2, 3, 4]
+        assert vwap.current_value() == Decimal('200')
+        assert vwap.discarded == 0
+
+    def test_fail_when_trying_to_add_point_that_does_not_belong_to_the_vwap_trading_pair(self):
+        vwap = TimeWindowVWAP(TradingPair.ETH_BTC, duration=timedelta(minutes=1))
+
+        with pytest.raises(ValueError) as e:
+            vwap.add(new_point(pair='BTC-USD'))
+
+        assert str(e.value) == 'Unsupported trading pair: BTC-USD'
+
+    def test_to_string(self):
+        assert str(TimeWindowVWAP(TradingPair.ETH_USD, duration=timedelta(minutes=5))) == 'VWAP[ETH-USD/300s]'